@@ -9,6 +9,9 @@ load_dotenv()
 tools_dict = None
 graph = None
 
+# thread_id별 마지막 슬랙 전송 ID (UI에서 전송 상태를 조회할 때 사용, UI는 채팅 세션마다 고유한 thread_id 사용)
+last_slack_delivery_ids = {}
+
 def initialize_chatbot():
     global tools_dict, graph
     
@@ -52,11 +55,19 @@ async def run_chatbot(query, thread_id, user_name):
                 print("--- 상태 초기화 완료 ---")
 
     if answer_state:
+        if answer_state.get('slack_delivery_id'):
+            last_slack_delivery_ids[thread_id] = answer_state['slack_delivery_id']
         if answer_state.get('slack_response'):
             return answer_state.get('slack_response')
         else:
             return answer_state.get('final_answer')
         
+def get_slack_delivery_status(delivery_id):
+    """
+    슬랙 전송 상태 조회 (queued / sending / retrying / delivered / failed)
+    """
+    return slack_outbox.get_status(delivery_id)
+
 class Runner:
     @classmethod
     async def run(cls, query, thread_id, user_name):
@@ -81,6 +92,8 @@ def main():
     print("="*20 + " 테스트 : Sequential Case " + "="*20)
     result = Runner.run_sync(query, "thread-2", "user-1")
     print(result)
+    # 백그라운드 슬랙 전송이 끝난 뒤 종료
+    slack_outbox.flush(timeout=SLACK_OUTBOX_DRAIN_TIMEOUT_SEC)
 
 if __name__ == "__main__":
     try:
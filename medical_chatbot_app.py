@@ -3,8 +3,7 @@ from main import *
 from io import StringIO
 import streamlit as st
 import asyncio
-        
-thread_id = "thread-2"
+import uuid
 
 # 페이지 설정
 st.set_page_config(
@@ -270,6 +269,12 @@ else: # "chatbot" 페이지
         st.session_state.sessions = [[]]
     if "current_session_index" not in st.session_state:
         st.session_state.current_session_index = 0
+    # 채팅 세션별 LangGraph thread_id (브라우저 세션/채팅마다 달라야 동시 사용자의 대화 상태가 섞이지 않음)
+    if "thread_ids" not in st.session_state:
+        st.session_state.thread_ids = [f"thread-{uuid.uuid4().hex}" for _ in st.session_state.sessions]
+
+    def current_thread_id():
+        return st.session_state.thread_ids[st.session_state.current_session_index]
 
     def switch_session(session_index):
         st.session_state.current_session_index = session_index
@@ -281,6 +286,7 @@ else: # "chatbot" 페이지
         st.markdown("---")
         if st.button("🆕 새 채팅 시작"):
             st.session_state.sessions.append([])
+            st.session_state.thread_ids.append(f"thread-{uuid.uuid4().hex}")
             switch_session(len(st.session_state.sessions) - 1)
         st.markdown("---")
         st.markdown("#### 💬 채팅 세션 기록")
@@ -304,12 +310,47 @@ else: # "chatbot" 페이지
             ''', unsafe_allow_html=True
         )
 
+    # 슬랙 전송 상태 표시 (전송은 답변 반환 후 백그라운드에서 진행)
+    SLACK_STATUS_LABELS = {
+        "queued": ("#888888", "Slack 전송 대기 중..."),
+        "sending": ("#888888", "Slack으로 전송하는 중..."),
+        "retrying": ("#d98c00", "Slack 전송 재시도 중..."),
+        "delivered": ("#228B22", "챗봇이 Slack으로 전송을 완료하였습니다."),
+        "failed": ("#c0392b", "Slack 전송에 실패했습니다."),
+    }
+
+    def show_slack_status(status):
+        color, label = SLACK_STATUS_LABELS.get(status["status"], ("#888888", status["status"]))
+        if status["status"] == "failed" and status.get("error"):
+            label += f" ({status['error']})"
+        st.markdown(f"<div style='color:{color}; font-weight:700; margin-bottom:1em;'>{label}</div>", unsafe_allow_html=True)
+
+    @st.fragment(run_every=2)
+    def poll_slack_status(delivery_id):
+        status = get_slack_delivery_status(delivery_id)
+        if status is None:
+            return
+        show_slack_status(status)
+        if status["status"] in ("delivered", "failed"):
+            st.rerun(scope="app")
+
+    def render_slack_status(delivery_id):
+        status = get_slack_delivery_status(delivery_id)
+        if status is None:
+            return
+        if status["status"] in ("delivered", "failed"):
+            show_slack_status(status)
+        else:
+            poll_slack_status(delivery_id)
+
     current_messages = st.session_state.sessions[st.session_state.current_session_index]
     for message in current_messages:
         if message["role"] == "user":
             st.markdown(f"""<div style='display:flex; justify-content:flex-end; margin-bottom:8px;'><div style='background:#fff; color:#222; border-radius:16px 16px 4px 16px; padding:12px 18px; max-width:70%; box-shadow:0 2px 8px #0001;'>{message["content"]}</div></div>""", unsafe_allow_html=True)
         else:
             st.markdown(f"""<div style='display:flex; justify-content:flex-start; margin-bottom:8px;'><div style='background:#b3d8f6; color:#222; border-radius:16px 16px 16px 4px; padding:12px 18px; max-width:70%; box-shadow:0 2px 8px #0001;'>{message["content"]}</div></div>""", unsafe_allow_html=True)
+            if message.get("slack_delivery_id"):
+                render_slack_status(message["slack_delivery_id"])
 
     input_and_loading = st.empty()
 
@@ -411,7 +452,7 @@ else: # "chatbot" 페이지
             full_query = history + system_instruction + f"현재 질문: {user_prompt}\n"
 
             # 3. LLM에 전달
-            result = Runner.run_sync(full_query, "thread-2", user_name=user_name)
+            result = Runner.run_sync(full_query, current_thread_id(), user_name=user_name)
             st.write(f"디버깅: result = {result}")
         except Exception as e:
             st.error(f"챗봇 실행 오류: {e}")
@@ -424,9 +465,10 @@ else: # "chatbot" 페이지
             st.rerun()
         
         answer = result
+        slack_delivery_id = last_slack_delivery_ids.pop(current_thread_id(), None)
         
-        # 답변만 세션에 추가
-        st.session_state.sessions[st.session_state.current_session_index].append({"role": "assistant", "content": answer})
+        # 답변만 세션에 추가 (슬랙 전송이 있으면 상태 조회용 ID 함께 저장)
+        st.session_state.sessions[st.session_state.current_session_index].append({"role": "assistant", "content": answer, "slack_delivery_id": slack_delivery_id})
         # 답변을 바로 화면에 출력
         st.markdown(f"""
         <div style='display:flex; justify-content:flex-start; margin-bottom:8px;'>
@@ -435,9 +477,9 @@ else: # "chatbot" 페이지
             </div>
         </div>
         """, unsafe_allow_html=True)
-        # slack response일 때 전송 완료 안내 메시지 추가
-        if answer and "전달하는 메세지 입니다." in answer:
-            st.markdown("<div style='color:#228B22; font-weight:700; margin-bottom:1em;'>챗봇이 Slack으로 전송을 완료하였습니다.</div>", unsafe_allow_html=True)
+        # slack response일 때 전송 상태 안내 메시지 추가
+        if slack_delivery_id:
+            render_slack_status(slack_delivery_id)
         st.session_state["pending_prompt"] = None
         st.rerun()
 
@@ -1,7 +1,6 @@
 from typing import List, Dict, Optional
 from langchain_openai import ChatOpenAI
-from src.langgraph.state import ChatbotState
-import json, re
+import asyncio, json, re
 import pandas as pd
 
 # NIH(National Institutes of Health) 에서 제공하는 소아마취 동의어 목록을 파싱하여 사전 생성
@@ -66,69 +65,131 @@ class AdaptiveQueryOptimizer:
     1차 - 원본 쿼리 사용(한글 일시 번역만)
     2차 - 원본 기반 가벼운 최적화(용어 표준화, 동의어 추가)
     3차 - 원본 의도 보존하면서 검색 전략 변경(확장/축소/재구성)
+
+    시도 횟수, 이전 쿼리, 최고 성능 쿼리 등 요청별 상태는 인스턴스가 아닌 ChatbotState["optimizer_state"]에 저장
+    (여러 대화가 한 인스턴스를 동시에 사용해도 서로의 최적화 루프에 영향 없음)
+    각 메서드는 전달받은 상태를 변경하지 않고 갱신된 상태를 새로 반환
     """
 
     def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.1, max_attempts: int = 3):
         self.llm = ChatOpenAI(model=model_name, temperature=temperature)
-        self.attempt_count = 0
         self.max_attempts = max_attempts
         self.satisfaction_threshold = 0.4 
-        self.original_question: str = ""
-        self.original_question_en: str = ""
 
-        self.previous_queries: List[str] = []
-        self.query_evaluations: List[Dict] = []
-        
-        self.best_score = 0.0
-        self.best_query_info = {
-            "query": "",
-            "evaluation": {},
-            "attempt": 0,
-            "documents": ""  
+    @staticmethod
+    def new_state() -> Dict:
+        """
+        새 질문의 최적화 상태
+        """
+
+        return {
+            "attempt_count": 0,
+            "original_question": "",
+            "original_question_en": "",
+            "previous_queries": [],
+            "variant_attempts": [],
+            "query_evaluations": [],
+            "best_score": 0.0,
+            "best_query_info": {
+                "query": "",
+                "evaluation": {},
+                "attempt": 0,
+                "documents": []
+            },
+            "is_satisfied": False,
         }
-        
-        self.is_satisfied = False
+
+    def _copy_state(self, opt_state: Optional[Dict]) -> Dict:
+        opt_state = {**self.new_state(), **(opt_state or {})}
+        opt_state["previous_queries"] = list(opt_state["previous_queries"])
+        opt_state["query_evaluations"] = list(opt_state["query_evaluations"])
+        return opt_state
     
-    async def get_search_query(self, question: str, evaluation_result: Optional[Dict] = None, state: Optional[ChatbotState] = None) -> str:
-        if self.attempt_count == 0:
-            self.original_question = question
-            self.original_question_en = await ko2en(question) if not question.isascii() else question
-            self.is_satisfied = False
+    async def get_search_query(self, opt_state: Optional[Dict], question: str, evaluation_result: Optional[Dict] = None, translated: Optional[str] = None) -> tuple[str, Dict]:
+        """
+        다음 검색 쿼리와 갱신된 최적화 상태 반환
+        translated: 이미 번역된 질문이 있으면(추측 검색 결과 재사용 등) ko2en 호출 생략
+        """
 
-        if evaluation_result and self.attempt_count > 0:
+        opt_state = self._copy_state(opt_state)
+        if opt_state["attempt_count"] == 0:
+            opt_state["original_question"] = question
+            if translated:
+                opt_state["original_question_en"] = translated
+            else:
+                opt_state["original_question_en"] = await ko2en(question) if not question.isascii() else question
+            opt_state["is_satisfied"] = False
+
+        previous_queries = opt_state["previous_queries"]
+        if evaluation_result and opt_state["attempt_count"] > 0:
             overall_score = evaluation_result.get("overall", 0)
             if overall_score >= self.satisfaction_threshold:
                 print(f"평가 조건 충족 (점수: {overall_score:.3f} >= {self.satisfaction_threshold})")
-                self.is_satisfied = True
-                return self.previous_queries[-1] if self.previous_queries else self.original_question_en
+                opt_state["is_satisfied"] = True
+                return (previous_queries[-1] if previous_queries else opt_state["original_question_en"]), opt_state
 
-        if self.attempt_count >= self.max_attempts:
+        if opt_state["attempt_count"] >= self.max_attempts:
             print(f"최대 시도 횟수 도달 ({self.max_attempts}회)")
-            return self.previous_queries[-1] if self.previous_queries else self.original_question_en
+            return (previous_queries[-1] if previous_queries else opt_state["original_question_en"]), opt_state
 
-        self.attempt_count += 1
-        if state is not None:
-            state["loop_cnt"] = self.attempt_count
+        opt_state["attempt_count"] += 1
+        attempt_count = opt_state["attempt_count"]
 
-        print(f"쿼리 최적화 시도 {self.attempt_count}/{self.max_attempts}")
+        print(f"쿼리 최적화 시도 {attempt_count}/{self.max_attempts}")
 
-        if self.attempt_count == 1:
-            query = self.original_question_en
+        if attempt_count == 1:
+            query = opt_state["original_question_en"]
             print("1차 전략: 한글→영어 직접 번역 (의학 용어 기본 매핑)")
             print(f"실행: 소아마취 전문 번역가 프롬프트 적용")
-        elif self.attempt_count == 2:
-            query = await self._light_optimization(evaluation_result)
+        elif attempt_count == 2:
+            query = await self._light_optimization(opt_state, evaluation_result)
             print("2차 전략: 의학 용어 표준화 + NIH 동의어 사전 활용")
             print(f"실행: 소아마취 동의어 통합, 의학 표준 용어로 치환")
         else:
-            query = await self._strategic_reformulation(evaluation_result)
+            query = await self._strategic_reformulation(opt_state, evaluation_result)
             print("3차 전략: 검색 표현 방식 재구성 (키워드 순서/구조 변경)")
             print(f"실행: 문장→키워드, 동의어 활용, 단어 순서 최적화")
 
-        self.previous_queries.append(query)
-        return query
+        previous_queries.append(query)
+        return query, opt_state
+
+    async def get_search_queries(self, opt_state: Optional[Dict], question: str, translated: Optional[str] = None) -> tuple[List[str], Dict]:
+        """
+        breadth 모드: 1~max_attempts차 전략의 쿼리를 한 번에 생성하여 (중복 제거된 쿼리 리스트, 갱신된 최적화 상태) 반환
+        번역 이후 2차/3차 전략 LLM 호출은 동시에 실행하며, 모든 시도를 사용한 것으로 기록 (재시도 루프 없음)
+        각 쿼리를 만든 전략 순번은 opt_state["variant_attempts"]에 쿼리 리스트와 같은 순서로 저장
+        """
+
+        opt_state = self._copy_state(opt_state)
+        opt_state["original_question"] = question
+        if translated:
+            opt_state["original_question_en"] = translated
+        else:
+            opt_state["original_question_en"] = await ko2en(question) if not question.isascii() else question
+        opt_state["is_satisfied"] = False
+
+        strategies = [self._light_optimization, self._strategic_reformulation][:max(self.max_attempts - 1, 0)]
+        print(f"쿼리 최적화 breadth 모드: {len(strategies) + 1}개 전략 동시 생성")
+        results = await asyncio.gather(*(strategy(opt_state, None) for strategy in strategies), return_exceptions=True)
+
+        queries = [opt_state["original_question_en"]]
+        attempts = [1]
+        for attempt, (strategy, result) in enumerate(zip(strategies, results), 2):
+            if isinstance(result, Exception):
+                print(f"{strategy.__name__} 쿼리 생성 실패: {result}")
+                continue
+            if result and result not in queries:
+                queries.append(result)
+                attempts.append(attempt)
+
+        opt_state["attempt_count"] = self.max_attempts
+        opt_state["previous_queries"] = queries
+        opt_state["variant_attempts"] = attempts
+        for attempt, query in zip(attempts, queries):
+            print(f"변형 ({attempt}차 전략): {query}")
+        return queries, opt_state
     
-    async def _light_optimization(self, eval_result):
+    async def _light_optimization(self, opt_state, eval_result):
         """
         2차 방식 구현
         """
@@ -154,8 +215,8 @@ class AdaptiveQueryOptimizer:
         - "neonatal OR newborn cardiac surgery" (using OR operators)
         - "child infant baby surgery" (listing synonyms)
         
-        Original Question: {self.original_question}
-        English Translation: {self.original_question_en}
+        Original Question: {opt_state["original_question"]}
+        English Translation: {opt_state["original_question_en"]}
         Previous Search Issues: {eval_result.get('feedback', 'Low relevance') if eval_result else 'Low relevance'}
         
         Optimized Search Query:
@@ -163,7 +224,7 @@ class AdaptiveQueryOptimizer:
         return (await self.llm.ainvoke(prompt)).content.strip()
     
 
-    async def _strategic_reformulation(self, eval_result):
+    async def _strategic_reformulation(self, opt_state, eval_result):
         """
         3차 방식 구현
         """
@@ -194,8 +255,8 @@ class AdaptiveQueryOptimizer:
         - Original: "신생아 진통제 용량" → "analgesic dosing neonates"
         - Original: "소아 마취 관리" → "pediatric anesthesia management"
         
-        Original Question: {self.original_question}
-        English Translation: {self.original_question_en}
+        Original Question: {opt_state["original_question"]}
+        English Translation: {opt_state["original_question_en"]}
         Previous Search Issues: {eval_result.get('feedback', 'Previous attempts failed') if eval_result else 'Previous attempts failed'}
         
         Optimized Search Query:
@@ -203,76 +264,67 @@ class AdaptiveQueryOptimizer:
         return (await self.llm.ainvoke(prompt)).content.strip()
     
    
-    def reset(self):
-        """
-        새 질문 시작 시 리셋
-        """
-
-        self.attempt_count = 0
-        self.original_question = None
-        self.original_question_en = None
-        self.previous_queries = []
-        self.query_evaluations = []
-        self.is_satisfied = False
-        self.best_score = 0.0
-        self.best_query_info = {
-            "query": "",
-            "evaluation": {},
-            "attempt": 0,
-            "documents": ""
-        }
-    
-    def get_optimization_status(self) -> Dict:
+    def get_optimization_status(self, opt_state: Optional[Dict]) -> Dict:
         """
         현재 최적화 상태 반환
         """
 
+        opt_state = opt_state or self.new_state()
+        best_query_info = opt_state.get("best_query_info") or {}
         return {
-            "attempt_count": self.attempt_count,
+            "attempt_count": opt_state.get("attempt_count", 0),
             "max_attempts": self.max_attempts,
-            "is_satisfied": self.is_satisfied,
+            "is_satisfied": opt_state.get("is_satisfied", False),
             "satisfaction_threshold": self.satisfaction_threshold,
-            "best_score": self.best_score,
-            "best_attempt": self.best_query_info["attempt"]
+            "best_score": opt_state.get("best_score", 0.0),
+            "best_attempt": best_query_info.get("attempt", 0)
         }
     
     
-    def update_evaluation(self, query: str, evaluation: Dict, documents: str = ""):
+    def update_evaluation(self, opt_state: Optional[Dict], query: str, evaluation: Dict, documents: Optional[List[Dict]] = None, attempt: Optional[int] = None) -> Dict:
         """
-        쿼리 평가 결과 업데이트 및 최고 성능 추적
+        쿼리 평가 결과 업데이트 및 최고 성능 추적, 갱신된 최적화 상태 반환
+        attempt: breadth 모드에서 변형별 전략 순번 (기본값은 현재 시도 횟수)
         """
 
+        opt_state = self._copy_state(opt_state)
+        attempt = attempt or opt_state["attempt_count"]
         current_evaluation = {
             "query": query,
             "evaluation": evaluation,
-            "attempt": self.attempt_count,
-            "documents": documents
+            "attempt": attempt,
+            "documents": documents or []
         }
-        self.query_evaluations.append(current_evaluation)
+        opt_state["query_evaluations"].append(current_evaluation)
         
         overall_score = evaluation.get("overall", 0)
         if overall_score >= self.satisfaction_threshold:
-            self.is_satisfied = True
+            opt_state["is_satisfied"] = True
             print(f"목표 점수 달성: {overall_score:.3f} >= {self.satisfaction_threshold}")
         
         current_score = evaluation.get("overall", 0)
-        best_score = self.best_score
+        best_score = opt_state["best_score"]
         
         if current_score > best_score:
-            self.best_score = current_score
-            self.best_query_info = current_evaluation
-            print(f"신규 최고 성능: {current_score:.3f} (시도 {self.attempt_count})")
+            opt_state["best_score"] = current_score
+            opt_state["best_query_info"] = current_evaluation
+            print(f"신규 최고 성능: {current_score:.3f} (시도 {attempt})")
             print(f"개선: 이전 최고 {best_score:.3f} → 현재 {current_score:.3f} (+{current_score-best_score:.3f})")
             print(f"상태: 현재 쿼리를 최적 후보로 업데이트")
 
+        return opt_state
+
     
-    def get_final_query_and_evaluation(self) -> tuple[str, Dict, str]:
+    def get_final_query_and_evaluation(self, opt_state: Optional[Dict]) -> tuple[str, Dict, List[Dict]]:
         """
         최종적으로 사용할 쿼리, 평가 결과, 검색 결과 반환
         """
 
-        if self.is_satisfied and self.query_evaluations:
-            satisfied_info = self.query_evaluations[-1]  
+        opt_state = opt_state or self.new_state()
+        query_evaluations = opt_state.get("query_evaluations", [])
+        if opt_state.get("is_satisfied") and query_evaluations:
+            # serial 모드에서는 마지막 평가가 처음 목표를 넘긴 최고 점수 (breadth 모드는 여러 변형 중 최고 점수)
+            satisfied_info = opt_state["best_query_info"]
             satisfied_query = satisfied_info["query"]
             satisfied_eval = satisfied_info["evaluation"]
             satisfied_docs = satisfied_info["documents"]
@@ -282,27 +334,59 @@ class AdaptiveQueryOptimizer:
             print(f"전략: 추가 최적화 생략, 현재 쿼리로 확정")
             return satisfied_query, satisfied_eval, satisfied_docs
         
-        best_query = self.best_query_info["query"] if self.best_query_info["query"] else (self.original_question_en if self.original_question_en else "")
-        best_eval = self.best_query_info["evaluation"]
-        best_docs = self.best_query_info["documents"]
-        best_attempt = self.best_query_info["attempt"]
+        best_query_info = opt_state.get("best_query_info") or self.new_state()["best_query_info"]
+        best_query = best_query_info["query"] if best_query_info["query"] else (opt_state.get("original_question_en") or "")
+        best_eval = best_query_info["evaluation"]
+        best_docs = best_query_info["documents"]
+        best_attempt = best_query_info["attempt"]
         
         print(f"최고 성능 쿼리 최종 선택")
         print(f"최고점수: {best_eval.get('overall', 0):.3f} (시도 {best_attempt})")
         print(f"전략: 목표 미달성, 전체 시도 중 최우수 성능 쿼리 채택")
-        print(f"결과: {len(self.query_evaluations)}회 시도 완료 후 베스트 선택")
+        print(f"결과: {len(query_evaluations)}회 시도 완료 후 베스트 선택")
         
-        if len(self.query_evaluations) > 1:
+        if len(query_evaluations) > 1:
             print("전체 시도 성능 비교:")
-            for i, eval_info in enumerate(self.query_evaluations, 1):
+            for eval_info in query_evaluations:
+                attempt = eval_info["attempt"]
                 score = eval_info["evaluation"].get("overall", 0)
-                is_best = "최고" if eval_info["attempt"] == best_attempt else "  "
-                strategy = ["원본번역", "용어최적화", "구조재구성"][i-1] if i <= 3 else f"{i}차"
-                print(f"   {is_best} {i}차 ({strategy}): {score:.3f}")
+                is_best = "최고" if attempt == best_attempt else "  "
+                strategy = ["원본번역", "용어최적화", "구조재구성"][attempt-1] if 1 <= attempt <= 3 else f"{attempt}차"
+                print(f"   {is_best} {attempt}차 ({strategy}): {score:.3f}")
         
         return best_query, best_eval, best_docs
 
 
+# 검색 결과 평가 지표 (단건/배치 평가 프롬프트 공용)
+EVALUATION_METRICS = """
+Evaluation metrics (0-1) with detailed scoring:
+
+1. relevance – Degree of topical overlap between question and medical literature
+   - 0.9-1.0: Direct, complete topical match
+   - 0.7-0.8: Strong relevance, most concepts match
+   - 0.5-0.6: Moderate relevance, some key concepts match
+   - 0.3-0.4: Weak relevance, minimal concept overlap
+   - 0.1-0.2: Very weak relevance, distant connection
+   - 0.0: No topical relevance
+
+2. faithfulness – Factual consistency: Does the evidence really support the answer?
+   - 0.9-1.0: Completely accurate, well-supported facts
+   - 0.7-0.8: Mostly accurate, reliable information
+   - 0.5-0.6: Generally accurate with minor issues
+   - 0.3-0.4: Some inaccuracies but mostly factual
+   - 0.1-0.2: Significant inaccuracies, questionable facts
+   - 0.0: Clearly incorrect or misleading information
+
+3. completeness – Does the evidence cover all key aspects of the question?
+   - 0.9-1.0: Comprehensive coverage of all aspects
+   - 0.7-0.8: Covers most important aspects
+   - 0.5-0.6: Covers some key aspects, partial information
+   - 0.3-0.4: Limited coverage, few aspects addressed
+   - 0.1-0.2: Minimal coverage, very incomplete
+   - 0.0: No meaningful coverage of the question
+"""
+
+
 class LLMEvaluator:
     """
     LLM 기반 쿼리 및 Retrieval 평가
@@ -323,32 +407,7 @@ class LLMEvaluator:
             You are a precise evaluator for a medical information retrieval system.
             Task: Evaluate how well the retrieved medical literature address the user's medical question.
             
-            Evaluation metrics (0-1) with detailed scoring:
-            
-            1. relevance – Degree of topical overlap between question and medical literature
-               - 0.9-1.0: Direct, complete topical match
-               - 0.7-0.8: Strong relevance, most concepts match
-               - 0.5-0.6: Moderate relevance, some key concepts match
-               - 0.3-0.4: Weak relevance, minimal concept overlap
-               - 0.1-0.2: Very weak relevance, distant connection
-               - 0.0: No topical relevance
-            
-            2. faithfulness – Factual consistency: Does the evidence really support the answer?
-               - 0.9-1.0: Completely accurate, well-supported facts
-               - 0.7-0.8: Mostly accurate, reliable information
-               - 0.5-0.6: Generally accurate with minor issues
-               - 0.3-0.4: Some inaccuracies but mostly factual
-               - 0.1-0.2: Significant inaccuracies, questionable facts
-               - 0.0: Clearly incorrect or misleading information
-            
-            3. completeness – Does the evidence cover all key aspects of the question?
-               - 0.9-1.0: Comprehensive coverage of all aspects
-               - 0.7-0.8: Covers most important aspects
-               - 0.5-0.6: Covers some key aspects, partial information
-               - 0.3-0.4: Limited coverage, few aspects addressed
-               - 0.1-0.2: Minimal coverage, very incomplete
-               - 0.0: No meaningful coverage of the question
-            
+            {EVALUATION_METRICS}
             Return JSON: {{"relevance": 0.0, "faithfulness": 0.0, "completeness": 0.0, "overall": 0.0, "feedback": ""}}
             overall = 0.2 * relevance + 0.5 * faithfulness + 0.3 * completeness
             
@@ -375,10 +434,7 @@ class LLMEvaluator:
                 print(f"JSON 파싱 실패 - 원본 응답: {raw}")
                 raise ValueError("JSON 파싱 실패")
 
-            if "overall" not in data:
-                data["overall"] = round(0.2*data["relevance"] + 0.5*data["faithfulness"] + 0.3*data["completeness"], 3)
-            
-            data["recommended_threshold"] = 0.4  
+            data = self._finalize_evaluation(data)
             print(f"최종 평가 결과: overall={data['overall']}") 
             return data
 
@@ -387,6 +443,75 @@ class LLMEvaluator:
             print(f"평가 실패: {e}")
             return None
 
+    @staticmethod
+    def _finalize_evaluation(data: Dict) -> Dict:
+        if "overall" not in data:
+            data["overall"] = round(0.2*data["relevance"] + 0.5*data["faithfulness"] + 0.3*data["completeness"], 3)
+        
+        data["recommended_threshold"] = 0.4  
+        return data
+
+    async def evaluate_search_results_batch(self, candidates: List[tuple[str, List[str]]]) -> List[Optional[Dict]]:
+        """
+        여러 (쿼리, 검색 결과) 후보를 한 번의 LLM 호출로 평가 (breadth 모드)
+        결과는 후보 순서대로의 평가 리스트이며 검색 결과가 없거나 해석에 실패한 후보는 None
+        """
+
+        indexed = [(i, query, docs) for i, (query, docs) in enumerate(candidates) if docs]
+        if not indexed:
+            return [None] * len(candidates)
+
+        blocks = []
+        for n, (_, query, docs) in enumerate(indexed):
+            previews = "\n".join("            - " + d[:200].replace("\n", " ") + "…" for d in docs[:3])
+            blocks.append(f"""
+            [Candidate {n}]
+            User Question: "{query}"
+            Medical Literature Preview:
+{previews}""")
+        prompt = f"""
+            You are a precise evaluator for a medical information retrieval system.
+            Task: For each candidate below, evaluate how well the retrieved medical literature address the user's medical question.
+            Score every candidate independently with the same criteria.
+            
+            {EVALUATION_METRICS}
+            
+            Return a JSON array with one object per candidate, in candidate order:
+            [{{"candidate": 0, "relevance": 0.0, "faithfulness": 0.0, "completeness": 0.0, "overall": 0.0, "feedback": ""}}]
+            overall = 0.2 * relevance + 0.5 * faithfulness + 0.3 * completeness
+            {"".join(blocks)}
+            """
+        evaluations: List[Optional[Dict]] = [None] * len(candidates)
+        try:
+            raw = str((await self.judge.ainvoke(prompt)).content).strip()
+            print(f"LLM 배치 평가 응답: {raw[:500]}...")
+
+            json_match = re.search(r"\[.*\]", raw, re.S)
+            if not json_match:
+                raise ValueError("JSON 파싱 실패")
+            items = json.loads(json_match.group())
+
+            for n, item in enumerate(items):
+                if not isinstance(item, dict):
+                    continue
+                position = item.get("candidate", n)
+                if not isinstance(position, int) or not 0 <= position < len(indexed):
+                    continue
+                if any(k not in item for k in ("relevance", "faithfulness", "completeness")):
+                    continue
+                evaluations[indexed[position][0]] = self._finalize_evaluation(item)
+        except Exception as e:
+            print(f"배치 평가 실패: {e}")
+
+        # 배치 응답에서 빠진 후보만 단건 평가로 동시 보완
+        missing = [i for i, _, _ in indexed if evaluations[i] is None]
+        if missing:
+            print(f"배치 평가 누락 {len(missing)}건 단건 평가")
+            results = await asyncio.gather(*(self.evaluate_search_results(*candidates[i]) for i in missing))
+            for i, result in zip(missing, results):
+                evaluations[i] = result
+        return evaluations
+
     async def should_retry_search(self, evaluation_result: Dict, current_attempt: int, max_attempts: int = 3) -> bool:
         """
         평가 결과를 바탕으로 재시도가 필요한지 판단
@@ -5,6 +5,28 @@ from src.langgraph.state import *
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import MemorySaver
 
+def create_vector_flow_graph():
+    # VectorDB 쿼리 최적화 → 검색 → 평가 루프 (부모 그래프에서는 노드 하나, 한 단계로 실행)
+    workflow = StateGraph(ChatbotState, output=VectorFlowState)
+
+    workflow.add_node("adaptive_query_rewriter", adaptive_query_rewriter_node)
+    workflow.add_node("vector_retrieval", vector_retrieval_node)
+    workflow.add_node("llm_evaluation_node", llm_evaluation_node)
+
+    workflow.add_edge(START, "adaptive_query_rewriter")
+    workflow.add_edge("adaptive_query_rewriter", "vector_retrieval")
+    workflow.add_edge("vector_retrieval", "llm_evaluation_node")
+    workflow.add_conditional_edges(
+        "llm_evaluation_node",
+        route_after_evaluation,
+        {
+            "retry_rewrite": "adaptive_query_rewriter",
+            "generate_answer": END,
+        }
+    )
+
+    return workflow.compile()
+
 def create_chatbot_graph():
     workflow = StateGraph(ChatbotState)
     memory = MemorySaver()
@@ -12,10 +34,9 @@ def create_chatbot_graph():
     workflow.add_node("router_agent", router_agent)
     workflow.add_node("decision_slack_node", decision_slack)
     workflow.add_node("neo4j_db", neo4j_db)
+    workflow.add_node("neo4j_db_parallel", neo4j_db)
     workflow.add_node("generate_vector_query", generate_vector_query_node)
-    workflow.add_node("adaptive_query_rewriter", adaptive_query_rewriter_node)
-    workflow.add_node("vector_retrieval", vector_retrieval_node)
-    workflow.add_node("llm_evaluation_node", llm_evaluation_node)
+    workflow.add_node("vector_flow", create_vector_flow_graph())
     workflow.add_node("merge_and_respond", merge_and_respond_node)
     workflow.add_node("reset_state_node", reset_state_node)
 
@@ -26,8 +47,9 @@ def create_chatbot_graph():
         route_after_router, 
         {
             "neo4j_only": "neo4j_db",
-            "vector_db_only": "adaptive_query_rewriter", 
-            "parallel": "neo4j_db",                 
+            "vector_db_only": "vector_flow", 
+            "parallel_neo4j": "neo4j_db_parallel",
+            "parallel_vector": "vector_flow",
             "sequential": "neo4j_db",
         }
     )
@@ -37,20 +59,13 @@ def create_chatbot_graph():
         {
             "go_to_merge": "merge_and_respond",            
             "generate_vector_query": "generate_vector_query",
-            "start_vector_db_flow": "adaptive_query_rewriter"  
-        }
-    )
-    workflow.add_edge("generate_vector_query", "adaptive_query_rewriter")
-    workflow.add_edge("adaptive_query_rewriter", "vector_retrieval")
-    workflow.add_edge("vector_retrieval", "llm_evaluation_node")
-    workflow.add_conditional_edges(
-        "llm_evaluation_node",
-        route_after_evaluation,
-        {
-            "retry_rewrite": "adaptive_query_rewriter",
-            "generate_answer": "merge_and_respond",
         }
     )
+    workflow.add_edge("generate_vector_query", "vector_flow")
+    # 병렬 흐름: VectorDB 루프 전체가 노드 하나이므로 Neo4j 노드와 같은 단계에서 동시에 실행되고,
+    # 단계가 끝나면(두 노드 중 긴 쪽 완료 시) merge_and_respond가 한 번 실행됨
+    workflow.add_edge("vector_flow", "merge_and_respond")
+    workflow.add_edge("neo4j_db_parallel", "merge_and_respond")
     workflow.add_edge("merge_and_respond", "reset_state_node")
     workflow.add_edge("reset_state_node", END)
 
@@ -58,4 +73,3 @@ def create_chatbot_graph():
     print("최종 그래프 컴파일 완료.")
 
     return graph
-
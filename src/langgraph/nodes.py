@@ -1,21 +1,42 @@
 from src.evaluator.query_rewrite_llm_evaluator import *
-from mcp_client import *
+from src.mcp_client import *
 from utils import *
+from slack_directory import *
+from slack_outbox import *
 from agent import *
 from prompt import *
 from src.langgraph.state import *
 
 from langchain_core.messages import AIMessage, HumanMessage
 from dotenv import load_dotenv
-import os, re, json
+import asyncio, os, re, json
 
 load_dotenv()
 
 # MCP 클라이언트 도구 설정
 tools_dict = setup_mcp_client_sync()
 
+# 슬랙 수신인 조회용 사용자 디렉터리 캐시
+slack_directory = SlackUserDirectory(lambda: tools_dict.get("slack_get_users"))
+
+# 답변 반환과 분리된 슬랙 전송 큐
+slack_outbox = SlackOutbox(lambda: tools_dict.get("slack_post_message"), slack_directory)
+
+# Neo4j 컨텍스트 모드 (generate: 서버에서 LLM 답변 생성(기본), raw: 그래프 컨텍스트만 반환)
+NEO4J_CONTEXT_MODE = os.getenv("NEO4J_CONTEXT_MODE", "generate")
+NEO4J_CONTEXT_TOKEN_BUDGET = int(os.getenv("NEO4J_CONTEXT_TOKEN_BUDGET", "2000"))
+
+# 추측 검색 (라우터 실행과 동시에 원본 질문 번역 + VectorDB 검색을 태스크로 시작, vector_db_only 흐름에서만 결과를 기다리고 나머지 흐름은 취소)
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+
+# 쿼리 최적화 방식 (serial: 전략별 재작성→검색→평가를 순차 반복, breadth: 전략 변형을 한 번에 생성/배치 검색/배치 평가 후 최고 점수 선택)
+OPTIMIZER_MODES = ("serial", "breadth")
+OPTIMIZER_MODE = os.getenv("OPTIMIZER_MODE", "serial")
+if OPTIMIZER_MODE not in OPTIMIZER_MODES:
+    raise ValueError(f"지원하지 않는 OPTIMIZER_MODE입니다: {OPTIMIZER_MODE} (사용 가능: {', '.join(OPTIMIZER_MODES)})")
+
 # 전역 인스턴스 생성
-adaptive_optimizer = AdaptiveQueryOptimizer(max_attempts=3)  # 최대 3회 시도
+adaptive_optimizer = AdaptiveQueryOptimizer(max_attempts=3)  # 최대 3회 시도 (질문별 상태는 ChatbotState.optimizer_state)
 llm_evaluator = LLMEvaluator()
 
 
@@ -23,13 +44,43 @@ llm_evaluator = LLMEvaluator()
 async def router_agent(state: ChatbotState) -> ChatbotState:
     print("\n--- [Node] Router Agent ---")
     question = state["question"]
-    model_with_tools = model.with_structured_output(tool_router_schema) # tool_router_schema는 아래 셀에서 정의
-    response = await model_with_tools.ainvoke([HumanMessage(content=ROUTER_PROMPT), HumanMessage(content=question)])
-    print(f"Flow Type: {response.get('flow_type')}")
-    return ChatbotState(
-        flow_type=response.get("flow_type"),
-        tools_query=[response.get("neo4j_query", ""), response.get("vector_db_query", "")]
-    )
+    source_question = extract_current_question(question)
+    speculative_task = asyncio.create_task(speculative_retrieval(source_question)) if SPECULATIVE_RETRIEVAL else None
+    try:
+        model_with_tools = model.with_structured_output(tool_router_schema) # tool_router_schema는 아래 셀에서 정의
+        response = await model_with_tools.ainvoke([HumanMessage(content=ROUTER_PROMPT), HumanMessage(content=question)])
+    except BaseException:
+        if speculative_task:
+            speculative_task.cancel()
+        raise
+    flow_type = response.get("flow_type")
+    tools_query = [response.get("neo4j_query", ""), response.get("vector_db_query", "")]
+    print(f"Flow Type: {flow_type}")
+
+    update = ChatbotState(flow_type=flow_type, tools_query=tools_query, speculative_query="", speculative_documents=[])
+    if speculative_task:
+        # 추측 검색은 라우터가 원본 질문과 같은 VectorDB 쿼리를 준 vector_db_only 흐름에서만 사용
+        if flow_type == "vector_db_only" and is_same_query(tools_query[1], source_question):
+            speculative_query, speculative_documents = await speculative_task
+            update["speculative_query"] = speculative_query
+            update["speculative_documents"] = speculative_documents
+        else:
+            speculative_task.cancel()
+    return update
+
+# 추측 검색 (router_agent에서 라우터 LLM 호출과 동시에 태스크로 실행, (번역 쿼리, 문서 리스트) 반환)
+async def speculative_retrieval(question: str):
+    try:
+        query = await ko2en(question) if not question.isascii() else question
+        vectordb_tool = tools_dict.get("VectorDB_retriever")
+        if not vectordb_tool:
+            raise ValueError("VectorDB_retriever 도구를 찾을 수 없습니다.")
+        documents = parse_vector_documents(await vectordb_tool.ainvoke({"query": query}))
+    except Exception as e:
+        print(f"추측 검색 중 오류 발생: {e}")
+        return "", []
+    print(f"추측 검색 쿼리: {query} ({len(documents)}개 문서)")
+    return query, documents
 
 # 슬랙 사용 여부 판단 노드(간단한 규칙 기반으로 슬랙 사용 여부를 1차 판단하는 헬퍼 함수)
 def determine_slack_usage(query: str) -> str:
@@ -58,10 +109,17 @@ async def neo4j_db(state: ChatbotState) -> ChatbotState:
     if not query:
         return ChatbotState(neo4j_documents=["Neo4j 쿼리가 제공되지 않았습니다."])
     try:
-        neo4j_tool = tools_dict.get("run_contextual_rag")
-        raw_result = await neo4j_tool.ainvoke({"query_text": query})
-        print("Neo4j MCP 반환값:", raw_result)
-        result = raw_result[0] if isinstance(raw_result, (list, tuple)) else raw_result
+        if NEO4J_CONTEXT_MODE == "raw":
+            # 서버 측 LLM 생성 없이 구조화된 그래프 컨텍스트만 받아 최종 답변 생성에 사용
+            neo4j_tool = tools_dict.get("get_graph_context")
+            raw_result = await neo4j_tool.ainvoke({"query_text": query, "token_budget": NEO4J_CONTEXT_TOKEN_BUDGET})
+            print("Neo4j MCP 반환값:", raw_result)
+            result = format_graph_context(raw_result)
+        else:
+            neo4j_tool = tools_dict.get("run_contextual_rag")
+            raw_result = await neo4j_tool.ainvoke({"query_text": query})
+            print("Neo4j MCP 반환값:", raw_result)
+            result = raw_result[0] if isinstance(raw_result, (list, tuple)) else raw_result
     except Exception as e:
         result = [f"Neo4j 도구 실행 중 오류: {e}"]
     print(f"Neo4j 결과: {result}")
@@ -85,6 +143,7 @@ async def adaptive_query_rewriter_node(state: ChatbotState) -> ChatbotState:
     
     question = state["tools_query"][1]
     prev_eval = state.get("llm_evaluation", {})
+    opt_state = state.get("optimizer_state") or adaptive_optimizer.new_state()
     
     if prev_eval:
         print(f"이전 평가 결과: {prev_eval.get('overall', 0):.3f}/1.0")
@@ -92,39 +151,124 @@ async def adaptive_query_rewriter_node(state: ChatbotState) -> ChatbotState:
     else:
         print("최초 시도: 이전 평가 결과 없음")
     
+    # vector_db_only 흐름의 1차 시도는 추측 검색의 번역 쿼리/결과를 그대로 사용 (router_agent에서 같은 질문일 때만 저장)
+    speculative_query = state.get("speculative_query", "")
+    use_speculative = (
+        state.get("flow_type") == "vector_db_only"
+        and opt_state["attempt_count"] == 0
+        and bool(speculative_query)
+        and bool(state.get("speculative_documents"))
+    )
+    if use_speculative:
+        print(f"추측 검색 결과 재사용: {speculative_query}")
+
+    if OPTIMIZER_MODE == "breadth":
+        # 모든 전략 변형을 한 번에 생성 (검색/평가도 한 번에 하고 재시도 없이 최고 점수 변형 선택)
+        queries, opt_state = await adaptive_optimizer.get_search_queries(
+            opt_state,
+            question,
+            translated=speculative_query if use_speculative else None
+        )
+        print(f"다음 단계: {len(queries)}개 변형 배치 검색 및 배치 평가 진행")
+        return ChatbotState(
+            current_query=queries[0],
+            query_variants=queries,
+            loop_cnt=opt_state["attempt_count"],
+            optimizer_state=opt_state
+        )
+
     # 조건부 쿼리 생성(평가 결과에 따라 조기 종료 가능)
-    query = await adaptive_optimizer.get_search_query(
+    query, opt_state = await adaptive_optimizer.get_search_query(
+        opt_state,
         question,
         evaluation_result=prev_eval,
-        state=state
+        translated=speculative_query if use_speculative else None
     )
-    state["current_query"] = query
     
     # 만족스러운 결과를 얻었거나 최대 시도에 도달했는지 확인
-    optimization_status = adaptive_optimizer.get_optimization_status()
+    optimization_status = adaptive_optimizer.get_optimization_status(opt_state)
     print(f"최적화 현황:")
     print(f"진행: {optimization_status['attempt_count']}/{optimization_status['max_attempts']}회")
     print(f"목표점수: {optimization_status['satisfaction_threshold']}")
     print(f"현재최고: {optimization_status['best_score']:.3f} (시도 {optimization_status['best_attempt']})")
     print(f"만족여부: {'달성' if optimization_status['is_satisfied'] else '진행중'}")
     
-    # 상태 정보 저장(최종 완료 판단은 llm_evaluation_node에서)
-    state["loop_cnt"] = adaptive_optimizer.attempt_count
-    
     print(f"다음 단계: 벡터 검색 및 평가 진행")
     print(f"생성된 쿼리: {query}")
     
-    return state
+    # 상태 정보 저장(최종 완료 판단은 llm_evaluation_node에서)
+    # 병렬 흐름에서는 Neo4j 분기와 같은 단계에서 실행되므로 변경한 필드만 반환
+    return ChatbotState(current_query=query, loop_cnt=opt_state["attempt_count"], optimizer_state=opt_state)
+
+# breadth 모드: 쿼리 변형들을 VectorDB_retriever_batch 한 번으로 검색 ({query, documents} 리스트 반환)
+async def retrieve_query_variants(queries: List[str], speculative_query: str = "", speculative_documents: Optional[List[Dict]] = None) -> List[Dict]:
+    known = {speculative_query: speculative_documents} if speculative_query and speculative_documents else {}
+    pending = [q for q in queries if q not in known]
+    if known and len(pending) < len(queries):
+        print(f"추측 검색 결과 사용: {speculative_query}")
+
+    batch_tool = tools_dict.get("VectorDB_retriever_batch")
+    if pending and batch_tool:
+        try:
+            # 결과 리스트의 각 항목은 {query, documents} 형태
+            results = parse_vector_documents(await batch_tool.ainvoke({"queries": pending}))
+            known.update({r.get("query"): r.get("documents") or [] for r in results if isinstance(r, dict)})
+        except Exception as e:
+            print(f"VectorDB 배치 검색 실패, 쿼리별 검색으로 대체합니다: {e}")
+        pending = [q for q in pending if q not in known]
+
+    if pending:
+        # 배치 도구가 없거나 실패/누락된 쿼리만 VectorDB_retriever로 동시에 검색 (실패한 쿼리만 빈 결과)
+        vectordb_tool = tools_dict.get("VectorDB_retriever")
+        if not vectordb_tool:
+            raise ValueError("VectorDB_retriever 도구를 찾을 수 없습니다.")
+        results = await asyncio.gather(*(vectordb_tool.ainvoke({"query": q}) for q in pending), return_exceptions=True)
+        for q, r in zip(pending, results):
+            if isinstance(r, Exception):
+                print(f"VectorDB 검색 중 오류 발생 ({q[:60]}): {r}")
+                continue
+            known[q] = parse_vector_documents(r)
+
+    return [{"query": q, "documents": known.get(q) or []} for q in queries]
 
 # VectorDB에서 문서를 검색하는 노드
 async def vector_retrieval_node(state: ChatbotState) -> ChatbotState:
     print(f"\n--- [Node] VectorDB Retriever ---")
     current_query = state.get("current_query")
     optimization_completed = state.get("optimization_completed", False)
+
+    query_variants = state.get("query_variants") or []
+    if OPTIMIZER_MODE == "breadth" and query_variants:
+        print(f"쿼리 변형 배치 검색: {len(query_variants)}개")
+        try:
+            candidates = await retrieve_query_variants(
+                query_variants,
+                state.get("speculative_query", ""),
+                state.get("speculative_documents")
+            )
+        except Exception as e:
+            print(f"VectorDB 배치 검색 중 오류 발생: {e}")
+            # 이미 받아 둔 추측 검색 결과는 유지
+            speculative_query = state.get("speculative_query", "")
+            speculative_documents = state.get("speculative_documents") or []
+            candidates = [{"query": q, "documents": speculative_documents if q == speculative_query else []} for q in query_variants]
+        for candidate in candidates:
+            print(f"  {candidate['query'][:60]}: {len(candidate['documents'])}개 문서")
+        return ChatbotState(
+            vector_candidates=candidates,
+            vector_documents=candidates[0]["documents"],
+            speculative_documents=[]
+        )
     
     print(f"현재 쿼리: {current_query}")
     print(f"최적화 완료 상태: {optimization_completed}")
 
+    # 추측 검색과 같은 쿼리면 이미 받아 둔 결과를 사용하고, 재시도 시 다시 쓰지 않도록 비움
+    speculative_documents = state.get("speculative_documents") or []
+    if speculative_documents and current_query == state.get("speculative_query"):
+        print(f"추측 검색 결과 사용: {len(speculative_documents)}개 문서")
+        return ChatbotState(vector_documents=speculative_documents, speculative_documents=[])
+
     try:
         # 도구 딕셔너리에서 VectorDB 리트리버 도구를 가져옴
         vectordb_tool = tools_dict.get("VectorDB_retriever")
@@ -132,10 +276,10 @@ async def vector_retrieval_node(state: ChatbotState) -> ChatbotState:
             raise ValueError("VectorDB_retriever 도구를 찾을 수 없습니다.")
 
         # MCP 도구를 비동기적으로 호출
-        # MCP 도구의 결과는 (content, artifact) 튜플 형태일 수 있으므로 첫 번째 요소(content)를 사용
+        # 결과는 {id, score, text, source} 문서 리스트의 JSON (MCP (content, artifact) 튜플일 수 있음)
         response_tuple = await vectordb_tool.ainvoke({"query": current_query})
-        result_text = response_tuple[0] if isinstance(response_tuple, tuple) else str(response_tuple)
-        print(f"VectorDB 검색 결과 길이: {len(result_text)} 문자")
+        documents = parse_vector_documents(response_tuple)
+        print(f"VectorDB 검색 결과: {len(documents)}개 문서")
         
         # 최적화가 완료된 경우 추가 정보 출력
         if optimization_completed:
@@ -143,26 +287,29 @@ async def vector_retrieval_node(state: ChatbotState) -> ChatbotState:
         
     except Exception as e:
         print(f"VectorDB 검색 중 오류 발생: {e}")
-        result_text = f"VectorDB 검색에 실패했습니다: {e}"
+        documents = []
 
-    return ChatbotState(vector_documents=result_text)
+    return ChatbotState(vector_documents=documents)
 
 # 검색 결과 품질 평가 노드
 async def llm_evaluation_node(state: ChatbotState) -> ChatbotState:
     loop_cnt = state.get('loop_cnt', 0)
     print(f"\n--- [Node] LLM Evaluation (시도 {loop_cnt}) ---")
     
+    vector_candidates = state.get("vector_candidates") or []
+    if vector_candidates:
+        return await evaluate_query_variants(state, vector_candidates)
+
     # 검색 결과와 쿼리 가져오기
     current_query = state.get("current_query", "")
-    vector_documents = state.get("vector_documents", "")
+    vector_documents = state.get("vector_documents", [])
     
     if not vector_documents:
         print("검색 결과가 없습니다.")
-        state["llm_evaluation"] = {"overall": 0, "feedback": "검색 결과 없음"}
-        return state
+        return ChatbotState(llm_evaluation={"overall": 0, "feedback": "검색 결과 없음"})
     
-    # 문서 리스트로 변환
-    docs_list = [d.strip() for d in vector_documents.split("\n\n") if d.strip()]
+    # 평가용 본문 리스트 (리랭커 점수 순)
+    docs_list = [d["text"] for d in sorted(vector_documents, key=lambda d: d.get("score") or 0, reverse=True) if d.get("text")]
     
     # LLM 평가 수행
     evaluation = await llm_evaluator.evaluate_search_results(current_query, docs_list)
@@ -170,7 +317,7 @@ async def llm_evaluation_node(state: ChatbotState) -> ChatbotState:
         evaluation = {"overall": 0, "feedback": "평가 실패"}
     
     # 평가 결과를 AdaptiveQueryOptimizer에 업데이트
-    adaptive_optimizer.update_evaluation(current_query, evaluation, vector_documents)
+    opt_state = adaptive_optimizer.update_evaluation(state.get("optimizer_state"), current_query, evaluation, vector_documents)
     
     # 평가 결과 출력
     overall_score = evaluation.get("overall", 0)
@@ -181,48 +328,86 @@ async def llm_evaluation_node(state: ChatbotState) -> ChatbotState:
     # 재시도 필요성 판단
     should_retry = await llm_evaluator.should_retry_search(
         evaluation, 
-        adaptive_optimizer.attempt_count, 
+        opt_state["attempt_count"], 
         adaptive_optimizer.max_attempts
     )
     
     # 최적화 완료 여부 재확인 (평가 점수 포함)
-    optimization_status = adaptive_optimizer.get_optimization_status()
+    optimization_status = adaptive_optimizer.get_optimization_status(opt_state)
     optimization_completed = (
         optimization_status["is_satisfied"] or 
-        adaptive_optimizer.attempt_count >= adaptive_optimizer.max_attempts or
+        opt_state["attempt_count"] >= adaptive_optimizer.max_attempts or
         overall_score >= adaptive_optimizer.satisfaction_threshold
     )
     
+    # 상태 업데이트 (변경한 필드만 반환)
+    update = ChatbotState(
+        should_retry_optimization=should_retry and not optimization_completed,
+        optimization_completed=optimization_completed,
+        optimizer_state=opt_state,
+    )
+
     # 최적화가 완료된 경우 최고 성능 쿼리로 최종 설정
     if optimization_completed:
-        final_query, final_evaluation, final_documents = adaptive_optimizer.get_final_query_and_evaluation()
-        state["current_query"] = final_query
-        state["llm_evaluation"] = final_evaluation
-        state["vector_documents"] = final_documents  # 최고 성능 쿼리의 검색 결과로 업데이트
+        final_query, final_evaluation, final_documents = adaptive_optimizer.get_final_query_and_evaluation(opt_state)
+        update["current_query"] = final_query
+        update["llm_evaluation"] = final_evaluation
+        update["vector_documents"] = final_documents  # 최고 성능 쿼리의 검색 결과로 업데이트
         print(f"최종 확정:")
         print(f"선택쿼리: {final_query[:80]}...")
         print(f"확정점수: {final_evaluation.get('overall', 0):.3f}")
-        print(f"선택문서: {len(final_documents)} 문자")
+        print(f"선택문서: {len(final_documents)}개")
     else:
-        state["llm_evaluation"] = evaluation
-    
-    # 상태 업데이트
-    state["should_retry_optimization"] = should_retry and not optimization_completed
-    state["optimization_completed"] = optimization_completed
+        update["llm_evaluation"] = evaluation
     
     next_action = "추가 최적화 시도" if should_retry and not optimization_completed else "답변 생성"
     print(f"다음 단계: {next_action}")
     print(f"최적화 상태: {'완료' if optimization_completed else '진행중'}")
     print(f"재시도 여부: {'예' if should_retry and not optimization_completed else '아니오'}")
     
-    return state
+    return update
+
+# breadth 모드: 변형별 검색 결과를 한 번에 평가하고 최고 점수 변형으로 확정 (재시도 없음)
+async def evaluate_query_variants(state: ChatbotState, candidates: List[Dict]) -> ChatbotState:
+    def ranked_texts(documents):
+        return [d["text"] for d in sorted(documents, key=lambda d: d.get("score") or 0, reverse=True) if d.get("text")]
+
+    evaluations = await llm_evaluator.evaluate_search_results_batch(
+        [(c["query"], ranked_texts(c["documents"])) for c in candidates]
+    )
+
+    opt_state = state.get("optimizer_state")
+    # 변형 위치가 아니라 변형을 만든 전략 순번으로 기록 (실패/중복 변형이 빠지면 둘이 달라짐)
+    attempts = (opt_state or {}).get("variant_attempts") or list(range(1, len(candidates) + 1))
+    for attempt, candidate, evaluation in zip(attempts, candidates, evaluations):
+        if not evaluation:
+            evaluation = {"overall": 0, "feedback": "검색 결과 없음" if not candidate["documents"] else "평가 실패"}
+        print(f"변형 ({attempt}차 전략) 평가: {evaluation.get('overall', 0):.3f} ({candidate['query'][:60]})")
+        opt_state = adaptive_optimizer.update_evaluation(opt_state, candidate["query"], evaluation, candidate["documents"], attempt=attempt)
+
+    final_query, final_evaluation, final_documents = adaptive_optimizer.get_final_query_and_evaluation(opt_state)
+    print(f"최종 확정:")
+    print(f"선택쿼리: {final_query[:80]}...")
+    print(f"확정점수: {final_evaluation.get('overall', 0):.3f}")
+    print(f"선택문서: {len(final_documents)}개")
 
-# 최종 답변을 생성하고, 동적으로 사용자 ID를 찾아 @멘션하여 슬랙으로 전송하는 노드
+    return ChatbotState(
+        current_query=final_query,
+        llm_evaluation=final_evaluation,
+        vector_documents=final_documents,
+        vector_candidates=[],
+        optimizer_state=opt_state,
+        should_retry_optimization=False,
+        optimization_completed=True,
+    )
+
+# 최종 답변을 생성하고, @멘션 슬랙 메시지를 전송 큐(outbox)에 넣는 노드
 async def merge_and_respond_node(state: ChatbotState) -> ChatbotState:
     print("\n--- [Node] Merge and Respond ---")
     question = state.get("question", "")
     final_answer = ""
     slack_response_text = ""
+    slack_delivery_id = ""
     source_response = None
 
     try:
@@ -236,7 +421,7 @@ async def merge_and_respond_node(state: ChatbotState) -> ChatbotState:
         
         # Neo4j와 VectorDB 정보 미리 가져오기
         neo4j_info = state.get("patient_info", "")
-        vectordb_info = state.get("vector_documents", "")
+        vectordb_info = format_vector_documents(state.get("vector_documents", []))
         
         # Neo4j only 플로우는 평가 없이 바로 정상 답변 생성
         if flow_type == "neo4j_only":
@@ -339,50 +524,14 @@ async def merge_and_respond_node(state: ChatbotState) -> ChatbotState:
                 raise ValueError("질문에서 수신인 이름을 찾을 수 없습니다. (예: 'OOO에게')")
             print(f"Recipient Name Extracted: {recipient_name}")
 
-            # 사용자 ID를 안전하게 조회하고 올바르게 파싱
-            users_tool = tools_dict.get("slack_get_users")
-            if not users_tool:
-                raise ValueError("slack_get_users 도구를 찾을 수 없습니다.")
-            
-            raw_users_response = await users_tool.ainvoke({})
-            users_response_str = str(raw_users_response[0]) if isinstance(raw_users_response, tuple) else str(raw_users_response)
-            
-            # JSON 문자열을 딕셔너리로 파싱
-            response_data = json.loads(users_response_str)
-            
-            # 응답이 성공적이고 'members' 키가 있는지 확인 후, 실제 사용자 리스트를 가져옴
-            if response_data.get("ok"):
-                users_list = response_data.get("members", [])
-            else:
-                raise ValueError(f"슬랙 사용자 목록을 가져오는 데 실패했습니다: {response_data.get('error', 'Unknown error')}")
-
-            user_id_to_mention = None
-            for user in users_list:
-                # user가 이제 딕셔너리이므로 .get() 메소드 정상 작동
-                if recipient_name in user.get('real_name', '') or recipient_name in user.get('name', ''):
-                    user_id_to_mention = user.get('id')
-                    break
-            
-            if not user_id_to_mention:
-                raise ValueError(f"'{recipient_name}'님을 슬랙 사용자로 찾을 수 없습니다.")
-            print(f"User ID Found: {user_id_to_mention}")
-
-            # @멘션을 포함한 최종 메시지 텍스트 생성
+            # @멘션 자리를 남긴 메시지 텍스트 생성 (수신인 조회와 전송은 outbox에서 처리)
             user_name = state.get("user_name", "사용자")
             source_content = source_response.content if source_response else "검색 결과 추출을 건너뛰었습니다."
-            text_to_send = f"{user_name}님이 전달하는 메세지입니다.\n<@{user_id_to_mention}> 님의 업무 보조를 위해 전송된 정보입니다.\n\n- {final_answer}\n\n [정답 근거] \n\n{source_content}"
+            text_to_send = f"{user_name}님이 전달하는 메세지입니다.\n{MENTION_PLACEHOLDER} 님의 업무 보조를 위해 전송된 정보입니다.\n\n- {final_answer}\n\n [정답 근거] \n\n{source_content}"
 
-            # slack_post_message 도구를 안전하게 호출
-            slack_tool = tools_dict.get("slack_post_message")
-            if not slack_tool:
-                raise ValueError("slack_post_message 도구를 찾을 수 없습니다.")
-            
-            tool_input = {"channel_id": target_channel_id, "text": text_to_send}
-            
-            raw_slack_response = await slack_tool.ainvoke(tool_input)
-            slack_response_text = str(raw_slack_response[0]) if isinstance(raw_slack_response, tuple) else str(raw_slack_response)
-            
-            print(f"Slack Direct Call Response: {slack_response_text}")
+            # 답변 반환을 기다리게 하지 않도록 슬랙 전송은 백그라운드 outbox에 넣고 상태 ID만 보관
+            slack_delivery_id = slack_outbox.enqueue(target_channel_id, recipient_name, text_to_send)
+            print(f"Slack Delivery Queued: {slack_delivery_id}")
 
     except Exception as e:
         error_message = f"슬랙 전송 또는 답변 생성 중 오류 발생: {e}"
@@ -399,13 +548,13 @@ async def merge_and_respond_node(state: ChatbotState) -> ChatbotState:
     return ChatbotState(
         final_answer=final_answer_source,
         slack_response=slack_response,
+        slack_delivery_id=slack_delivery_id,
         messages=[HumanMessage(content=question), AIMessage(content=final_answer)]
     )
 
 # 상태 초기화 노드(한 사이클 종료 후 ChatbotState의 모든 필드를 기본값으로 초기화)
 async def reset_state_node(state: ChatbotState) -> ChatbotState:
     print("\n--- [Node] Reset State ---")
-    adaptive_optimizer.reset()  # 전역 optimizer 상태도 초기화
     return ChatbotState(
         question="",
         flow_type="",
@@ -414,11 +563,16 @@ async def reset_state_node(state: ChatbotState) -> ChatbotState:
         tools_query=["", ""],
         final_answer="",
         slack_response="",
+        slack_delivery_id="",
         messages=state["messages"],  # 이전 messages 유지
         current_query="",
         query_variants=[],
-        vector_documents="",
+        vector_documents=[],
+        vector_candidates=[],
         llm_evaluation={},
+        speculative_query="",
+        speculative_documents=[],
+        optimizer_state={},
         loop_cnt=0,
         optimization_completed=False,
         should_retry_optimization=False
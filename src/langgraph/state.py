@@ -9,12 +9,33 @@ class ChatbotState(TypedDict):
     tools_query: Annotated[List[str], "각 DB에 전달할 쿼리 리스트"]
     final_answer: Annotated[str, "최종 답변"]
     slack_response: Annotated[str, "슬랙 전송 결과"]
+    slack_delivery_id: Annotated[str, "슬랙 outbox 전송 상태 조회 ID"]
     messages: List[BaseMessage]
     user_name: Annotated[str, "사용자 이름"]
     current_query: Annotated[str, "현재 VectorDB 검색에 사용되는 쿼리"]
     query_variants: Annotated[List[str], "생성된 쿼리 변형 목록"]
-    vector_documents: Annotated[str, "VectorDB 검색 결과 텍스트"]
+    vector_documents: Annotated[List[Dict], "VectorDB 검색 결과 문서 리스트 ({id, score, text, source})"]
+    vector_candidates: Annotated[List[Dict], "breadth 모드 쿼리 변형별 검색 결과 리스트 ({query, documents})"]
     llm_evaluation: Annotated[Dict, "LLM 평가 결과"]
+    speculative_query: Annotated[str, "라우팅과 동시에 원본 질문을 번역한 추측 검색 쿼리 (VectorDB 쿼리가 원본 질문과 같을 때만 저장)"]
+    speculative_documents: Annotated[List[Dict], "추측 검색 쿼리의 VectorDB 검색 결과"]
+    optimizer_state: Annotated[Dict, "AdaptiveQueryOptimizer 질문별 상태 (시도 횟수, 이전 쿼리, 최고 성능 쿼리 등)"]
+    loop_cnt: Annotated[int, "재시도 루프 카운트"]
+    optimization_completed: Annotated[bool, "쿼리 최적화 완료 여부"]
+    should_retry_optimization: Annotated[bool, "최적화 재시도 필요 여부"]
+
+class VectorFlowState(TypedDict):
+    """
+    VectorDB 최적화/검색/평가 서브그래프가 부모 그래프에 반환하는 필드
+    (병렬 흐름에서 Neo4j 노드와 같은 단계에 기록되므로 Neo4j 노드가 쓰는 필드는 포함하지 않음)
+    """
+    current_query: Annotated[str, "현재 VectorDB 검색에 사용되는 쿼리"]
+    query_variants: Annotated[List[str], "생성된 쿼리 변형 목록"]
+    vector_documents: Annotated[List[Dict], "VectorDB 검색 결과 문서 리스트 ({id, score, text, source})"]
+    vector_candidates: Annotated[List[Dict], "breadth 모드 쿼리 변형별 검색 결과 리스트 ({query, documents})"]
+    llm_evaluation: Annotated[Dict, "LLM 평가 결과"]
+    speculative_documents: Annotated[List[Dict], "추측 검색 쿼리의 VectorDB 검색 결과"]
+    optimizer_state: Annotated[Dict, "AdaptiveQueryOptimizer 질문별 상태 (시도 횟수, 이전 쿼리, 최고 성능 쿼리 등)"]
     loop_cnt: Annotated[int, "재시도 루프 카운트"]
     optimization_completed: Annotated[bool, "쿼리 최적화 완료 여부"]
     should_retry_optimization: Annotated[bool, "최적화 재시도 필요 여부"]
\ No newline at end of file
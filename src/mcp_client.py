@@ -1,56 +1,416 @@
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from typing import Dict, Any
+from langchain_mcp_adapters.tools import load_mcp_tools
+from langchain_core.tools import StructuredTool, ToolException
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
+from pydantic import BaseModel
 import os
+import sys
 import asyncio
+import atexit
+import functools
+import importlib
+import inspect
+import json
+import statistics
+import threading
+import time
 
 load_dotenv()
 
-async def setup_mcp_client():
-    mcp_client = MultiServerMCPClient(
-        {
-        "neo4j_retriever": {
-            "command": "본인 로컬 PYTHON 경로",
-            "args": ["neo4j_server.py"],
-            "transport": "stdio",
-        },
-        "VectorDB_retriever": {
-            "command": "본인 로컬 PYTHON 경로",
-            "args": ["pinecone_server.py"],
-            "transport": "stdio",
-        },
+# MCP 세션 모드 (persistent: 서버별 세션을 한 번 열어 재사용, per_call: tool 호출마다 새 세션)
+MCP_SESSION_MODE = os.getenv("MCP_SESSION_MODE", "persistent")
+MCP_SESSION_START_TIMEOUT = float(os.getenv("MCP_SESSION_START_TIMEOUT", "120"))
+MCP_SESSION_MAX_RESTART_BACKOFF = float(os.getenv("MCP_SESSION_MAX_RESTART_BACKOFF", "30"))
+
+
+# 리트리버 MCP 서버 URL (설정하면 stdio로 프로세스를 띄우지 않고 상시 실행 중인 HTTP 서버에 연결)
+# 예: NEO4J_MCP_URL=http://retriever-host:8006/mcp, PINECONE_MCP_URL=http://retriever-host:8005/mcp
+NEO4J_MCP_URL = os.getenv("NEO4J_MCP_URL")
+PINECONE_MCP_URL = os.getenv("PINECONE_MCP_URL")
+
+
+# MCP를 거치지 않고 현재 프로세스에서 직접 실행할 tool 이름 (쉼표 구분)
+# 서버 단위로 지정해야 하며 해당 서버의 검색 tool을 모두 나열 (예: get_graph_context,run_contextual_rag)
+# 일부만 지정하면 stdio 서버와 프로세스 내 모듈이 리랭커/임베더/드라이버를 중복 로드하므로 오류 처리
+# 챗봇과 리트리버가 같은 호스트에 있을 때 JSON-RPC 직렬화/IPC 비용 제거용
+INPROCESS_TOOLS = [t.strip() for t in os.getenv("INPROCESS_TOOLS", "").split(",") if t.strip()]
+
+# 프로세스 내 실행을 지원하는 서버별 (모듈, tool 목록)
+INPROCESS_SERVERS = {
+    "neo4j_retriever": ("src.server.neo4j_server", ["get_graph_context", "run_contextual_rag"]),
+    "VectorDB_retriever": ("src.server.pinecone_server", ["VectorDB_retriever", "VectorDB_retriever_batch"]),
+}
+
+
+def check_inprocess_tools(tool_names: List[str]) -> List[str]:
+    """
+    INPROCESS_TOOLS 검증 후 프로세스 내에서 실행할 서버 이름 목록 반환
+    서버의 tool 목록 중 일부만 지정했거나 지원하지 않는 tool이 있으면 ValueError
+    """
+
+    unknown = [name for name in tool_names if not any(name in tools for _, tools in INPROCESS_SERVERS.values())]
+    if unknown:
+        raise ValueError(f"프로세스 내 실행을 지원하지 않는 tool입니다: {', '.join(unknown)}")
+
+    servers = []
+    for server, (_, server_tools) in INPROCESS_SERVERS.items():
+        selected = [name for name in server_tools if name in tool_names]
+        if not selected:
+            continue
+        if len(selected) < len(server_tools):
+            missing = [name for name in server_tools if name not in selected]
+            raise ValueError(
+                f"INPROCESS_TOOLS는 서버 단위로 지정해야 합니다. '{server}' 서버의 tool을 모두 포함해주세요 "
+                f"(누락: {', '.join(missing)})"
+            )
+        servers.append(server)
+    return servers
+
+
+INPROCESS_SERVER_NAMES = check_inprocess_tools(INPROCESS_TOOLS)
+
+
+def _retriever_connection(url: Optional[str], script: str) -> Dict[str, Any]:
+    if url:
+        return {"url": url, "transport": "streamable_http"}
+    return {
+        "command": "본인 로컬 PYTHON 경로",
+        "args": [script],
+        "transport": "stdio",
+    }
+
+
+def get_mcp_connections() -> Dict[str, Dict[str, Any]]:
+    connections = {
+        "neo4j_retriever": _retriever_connection(NEO4J_MCP_URL, "neo4j_server.py"),
+        "VectorDB_retriever": _retriever_connection(PINECONE_MCP_URL, "pinecone_server.py"),
         "slack": {
             "command": "npx",
             "args": [
                 "-y",
                 "@modelcontextprotocol/server-slack"
             ],
-            "transport": "stdio", 
+            "transport": "stdio",
             "env": {
                 "SLACK_BOT_TOKEN": os.getenv("SLACK_BOT_TOKEN"),
                 "SLACK_TEAM_ID": os.getenv("SLACK_TEAM_ID"),
             }
         }
     }
-)
-    
+    # 프로세스 내에서 실행하는 서버는 띄우지 않음
+    for server in INPROCESS_SERVER_NAMES:
+        connections.pop(server, None)
+    return connections
+
+
+async def setup_mcp_client():
+    mcp_client = MultiServerMCPClient(get_mcp_connections())
+
     mcp_tools = await mcp_client.get_tools()
     tools_dict = {tool.name: tool for tool in mcp_tools}
     return tools_dict
 
 
+class MCPSessionManager:
+    """
+    MCP 서버별 세션을 프로세스 수명 동안 유지하는 관리자
+    백그라운드 스레드의 이벤트 루프에서 서버마다 세션을 한 번 열고, 동시 tool 호출은 같은 세션으로 다중화
+    세션이 끊기면(서버 프로세스 종료 등) 지수 백오프로 다시 시작
+
+    Args:
+        connections (dict): MultiServerMCPClient 연결 설정
+        max_latency_samples (int): 서버별로 보관할 최근 호출 지연 시간 수
+    """
+
+    def __init__(self, connections: Dict[str, Dict[str, Any]], max_latency_samples: int = 1000):
+        self.client = MultiServerMCPClient(connections)
+        self.server_names = list(connections)
+        self.max_latency_samples = max_latency_samples
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-session-manager", daemon=True)
+        self._lock = threading.Lock()
+        self._closing = False
+
+        self._tools: Dict[str, Dict[str, Any]] = {}
+        self._ready: Dict[str, asyncio.Event] = {}
+        self._restart: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Future] = []
+
+        self._latencies: Dict[str, List[float]] = {name: [] for name in self.server_names}
+        self._calls = {name: 0 for name in self.server_names}
+        self._errors = {name: 0 for name in self.server_names}
+        self._restarts = {name: 0 for name in self.server_names}
+
+    def start(self, timeout: float = MCP_SESSION_START_TIMEOUT) -> Dict[str, StructuredTool]:
+        """
+        모든 서버 세션을 열고 tool 이름 → 래퍼 tool 사전 반환 (시작하지 못한 서버의 tool은 제외)
+        """
+
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_all(), self._loop).result()
+
+        deadline = time.time() + timeout
+        for name in self.server_names:
+            remaining = max(0.0, deadline - time.time())
+            ready = asyncio.run_coroutine_threadsafe(self._wait_ready(name, remaining), self._loop)
+            if not ready.result():
+                print(f"MCP 서버 '{name}' 세션을 {timeout:.0f}초 안에 열지 못했습니다.", file=sys.stderr)
+        return self.tools_dict()
+
+    async def _start_all(self):
+        for name in self.server_names:
+            self._ready[name] = asyncio.Event()
+            self._restart[name] = asyncio.Event()
+            self._tasks.append(asyncio.ensure_future(self._serve(name)))
+
+    async def _wait_ready(self, name: str, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready[name].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _serve(self, name: str):
+        backoff = 1.0
+        while not self._closing:
+            started = False
+            try:
+                async with self.client.session(name) as session:
+                    tools = await load_mcp_tools(session)
+                    self._tools[name] = {tool.name: tool for tool in tools}
+                    self._restart[name].clear()
+                    self._ready[name].set()
+                    print(f"MCP 서버 '{name}' 세션 시작 (tool {len(tools)}개)", file=sys.stderr)
+                    started = True
+                    backoff = 1.0
+                    await self._restart[name].wait()
+            except Exception as e:
+                print(f"MCP 서버 '{name}' 세션 오류: {e}", file=sys.stderr)
+
+            self._ready[name].clear()
+            if self._closing:
+                break
+            self._restarts[name] += 1
+            if started:
+                # 정상 동작하던 세션이 끊긴 경우(tool 호출 실패로 재시작 요청) 재시도 중인 호출이 기다리지 않도록 바로 재시작
+                print(f"MCP 서버 '{name}' 세션 재시작", file=sys.stderr)
+                continue
+            print(f"MCP 서버 '{name}' {backoff:.0f}초 후 재시작", file=sys.stderr)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MCP_SESSION_MAX_RESTART_BACKOFF)
+
+    async def _call(self, server: str, tool_name: str, arguments: Dict[str, Any]):
+        for attempt in range(2):
+            if not await self._wait_ready(server, MCP_SESSION_START_TIMEOUT):
+                raise ToolException(f"MCP 서버 '{server}' 세션을 사용할 수 없습니다.")
+            tool = self._tools[server][tool_name]
+            started = time.perf_counter()
+            try:
+                result = await tool.ainvoke(arguments)
+            except ToolException:
+                # tool 자체가 반환한 오류는 세션 문제가 아니므로 그대로 전달
+                self._record(server, time.perf_counter() - started, error=True)
+                raise
+            except Exception as e:
+                self._record(server, time.perf_counter() - started, error=True)
+                if attempt == 1 or self._closing:
+                    raise
+                # 세션이 끊긴 것으로 보고 서버를 재시작한 뒤 새 세션에서 한 번 재시도 (사용자 요청은 실패하지 않음)
+                print(f"MCP 서버 '{server}' 호출 실패, 세션 재시작 후 재시도: {e}", file=sys.stderr)
+                self._ready[server].clear()
+                self._restart[server].set()
+                continue
+            self._record(server, time.perf_counter() - started)
+            return result
+
+    def _record(self, server: str, latency: float, error: bool = False):
+        with self._lock:
+            self._calls[server] += 1
+            if error:
+                self._errors[server] += 1
+            latencies = self._latencies[server]
+            latencies.append(latency)
+            if len(latencies) > self.max_latency_samples:
+                del latencies[:len(latencies) - self.max_latency_samples]
+
+    def _wrap(self, server: str, tool: Any) -> StructuredTool:
+        async def call(**arguments):
+            future = asyncio.run_coroutine_threadsafe(self._call(server, tool.name, arguments), self._loop)
+            return await asyncio.wrap_future(future)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=call,
+        )
+
+    def tools_dict(self) -> Dict[str, StructuredTool]:
+        """
+        호출하는 쪽의 이벤트 루프와 무관하게 사용할 수 있는 래퍼 tool 사전
+        """
+
+        return {
+            tool_name: self._wrap(server, tool)
+            for server, tools in self._tools.items()
+            for tool_name, tool in tools.items()
+        }
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        서버별 세션 상태, 호출 수, 오류 수, 재시작 횟수, 호출 지연 통계 반환
+        """
+
+        stats = {}
+        with self._lock:
+            for name in self.server_names:
+                latencies = sorted(self._latencies[name])
+                server_stats = {
+                    "ready": name in self._ready and self._ready[name].is_set(),
+                    "call_count": self._calls[name],
+                    "error_count": self._errors[name],
+                    "restart_count": self._restarts[name],
+                }
+                if latencies:
+                    server_stats.update({
+                        "latency_mean_sec": statistics.mean(latencies),
+                        "latency_p50_sec": latencies[len(latencies) // 2],
+                        "latency_p95_sec": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                        "latency_max_sec": latencies[-1],
+                    })
+                stats[name] = server_stats
+        return stats
+
+    def close(self, timeout: float = 10):
+        """
+        모든 세션을 닫고 백그라운드 이벤트 루프 종료
+        """
+
+        if self._closing or not self._thread.is_alive():
+            return
+        self._closing = True
+
+        async def _shutdown():
+            for event in self._restart.values():
+                event.set()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), self._loop).result(timeout)
+        except Exception as e:
+            print(f"MCP 세션 종료 중 오류: {e}", file=sys.stderr)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+
+
+class InProcessToolAdapter:
+    """
+    리트리버 서버 모듈의 tool 함수를 직접 import하여 MCP tool과 같은 이름/인터페이스로 제공
+    서버 모듈의 상태(Neo4j 드라이버, 리랭커 배치 큐 등)가 한 이벤트 루프에 묶이도록 백그라운드 스레드의 루프에서 실행
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="inprocess-tools", daemon=True)
+        self._thread.start()
+
+    def load_tools(self, servers: List[str]) -> Dict[str, StructuredTool]:
+        tools = {}
+        for server in servers:
+            module_path, selected = INPROCESS_SERVERS[server]
+            module = importlib.import_module(module_path)
+            # 서버 단독 실행 시와 같이 리트리버를 미리 로드
+            preload = getattr(module, "preload_retriever", None)
+            if preload is not None:
+                preload()
+            for name in selected:
+                tools[name] = self._wrap(getattr(module, name))
+            print(f"'{server}' tool을 프로세스 내에서 실행: {', '.join(selected)}", file=sys.stderr)
+        return tools
+
+    @staticmethod
+    def serialize_result(result: Any) -> str:
+        """
+        MCP 경로와 같은 텍스트 결과로 변환 (str은 그대로, 그 외는 JSON 문자열)
+        INPROCESS_TOOLS 설정 여부와 관계없이 호출하는 쪽이 같은 타입을 받도록 함
+        """
+
+        if isinstance(result, str):
+            return result
+        if isinstance(result, BaseModel):
+            result = result.model_dump(mode="json")
+        return json.dumps(result, ensure_ascii=False, default=str)
+
+    def _wrap(self, fn) -> StructuredTool:
+        @functools.wraps(fn)
+        async def call(**arguments):
+            future = asyncio.run_coroutine_threadsafe(fn(**arguments), self._loop)
+            return self.serialize_result(await asyncio.wrap_future(future))
+
+        return StructuredTool.from_function(
+            coroutine=call,
+            name=fn.__name__,
+            description=inspect.getdoc(fn) or fn.__name__,
+        )
+
+
+_inprocess_tools: Optional[Dict[str, StructuredTool]] = None
+_inprocess_tools_lock = threading.Lock()
+
+
+def get_inprocess_tools() -> Dict[str, StructuredTool]:
+    """
+    INPROCESS_TOOLS에 지정된 tool의 프로세스 내 실행 버전 반환 (최초 호출 시 서버 모듈 로드)
+    """
+
+    global _inprocess_tools
+    if not INPROCESS_SERVER_NAMES:
+        return {}
+    with _inprocess_tools_lock:
+        if _inprocess_tools is None:
+            _inprocess_tools = InProcessToolAdapter().load_tools(INPROCESS_SERVER_NAMES)
+        return dict(_inprocess_tools)
+
+
+_session_manager: Optional[MCPSessionManager] = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> MCPSessionManager:
+    """
+    프로세스 공용 세션 관리자 반환 (최초 호출 시 모든 MCP 서버 세션 시작)
+    """
+
+    global _session_manager
+    with _session_manager_lock:
+        if _session_manager is None:
+            _session_manager = MCPSessionManager(get_mcp_connections())
+            _session_manager.start()
+            atexit.register(_session_manager.close)
+        return _session_manager
+
+
 def setup_mcp_client_sync() -> Dict[str, Any]:
     """
     MCP 툴 설정 동기화
     """
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, setup_mcp_client())
-                return future.result()
-        else:
-            return loop.run_until_complete(setup_mcp_client())
-    except RuntimeError:
-        return asyncio.run(setup_mcp_client())
\ No newline at end of file
+    if MCP_SESSION_MODE == "persistent":
+        tools_dict = get_session_manager().tools_dict()
+    else:
+        try:
+            loop = asyncio.get_event_loop()
+            if loop.is_running():
+                import concurrent.futures
+                with concurrent.futures.ThreadPoolExecutor() as executor:
+                    future = executor.submit(asyncio.run, setup_mcp_client())
+                    tools_dict = future.result()
+            else:
+                tools_dict = loop.run_until_complete(setup_mcp_client())
+        except RuntimeError:
+            tools_dict = asyncio.run(setup_mcp_client())
+
+    # 같은 이름의 MCP tool을 프로세스 내 실행 버전으로 교체
+    tools_dict.update(get_inprocess_tools())
+    return tools_dict
@@ -1,15 +1,29 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from neo4j_graphrag.embeddings.base import Embedder
+from src.server.embedding_cache import EmbeddingCache, get_shared_embedding_cache
 import abc
+import asyncio
+import os
+import random
+import sys
+import time
 
 if TYPE_CHECKING:
     import openai
 
+# 동시 aembed_query 요청을 모으는 대기 시간(ms)과 한 번의 API 호출에 담을 최대 입력 수
+EMBEDDING_COALESCE_MS = float(os.getenv("EMBEDDING_COALESCE_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "256"))
+# 429(RateLimit) 응답 시 재시도 횟수와 지수 백오프 기본 대기 시간(초)
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+EMBEDDING_RETRY_BASE_SEC = float(os.getenv("EMBEDDING_RETRY_BASE_SEC", "0.5"))
+
 class BaseOpenAIEmbeddings(Embedder, abc.ABC):
     client: openai.OpenAI
+    async_client: openai.AsyncOpenAI
 
-    def __init__(self, model: str = "text-embedding-3-large", dimensions: int = 256, **kwargs: Any) -> None:
+    def __init__(self, model: str = "text-embedding-3-large", dimensions: int = 256, cache: Optional[EmbeddingCache] = None, **kwargs: Any) -> None:
         try:
             import openai
         except ImportError:
@@ -20,7 +34,17 @@ class BaseOpenAIEmbeddings(Embedder, abc.ABC):
         self.openai = openai
         self.model = model
         self.dimensions = dimensions
+        self.cache = cache
+        # 429 재시도는 _create/_acreate에서 직접 처리하므로 클라이언트 내장 재시도는 끔 (중복 재시도 방지)
+        kwargs.setdefault("max_retries", 0)
         self.client = self._initialize_client(**kwargs)
+        self.async_client = self._initialize_async_client(**kwargs)
+
+        # aembed_query 요청 병합용 대기열 (차원별, 이벤트 루프별)
+        self._pending: Dict[Optional[int], Tuple[List[Tuple[str, asyncio.Future]], asyncio.TimerHandle]] = {}
+        self._pending_loop = None
+        # 실행 중인 배치 task 참조 (완료 전 GC로 사라지지 않도록 보관)
+        self._batch_tasks: set = set()
 
     @abc.abstractmethod
     def _initialize_client(self, **kwargs: Any) -> Any:
@@ -30,22 +54,178 @@ class BaseOpenAIEmbeddings(Embedder, abc.ABC):
         """
         pass
 
+    @abc.abstractmethod
+    def _initialize_async_client(self, **kwargs: Any) -> Any:
+        """
+        OpenAI 비동기 클라이언트를 초기화
+        하위 클래스에서 구현
+        """
+        pass
+
+    def _dimensions(self, kwargs: Dict[str, Any]) -> Optional[int]:
+        return kwargs.get("dimensions", self.dimensions)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        # 서버가 Retry-After를 주면 그 값을, 아니면 지수 백오프 + jitter
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return EMBEDDING_RETRY_BASE_SEC * (2 ** attempt) * (0.5 + random.random())
+
+    def _create(self, texts: List[str], dimensions: Optional[int]) -> List[List[float]]:
+        kwargs = {"dimensions": dimensions} if dimensions is not None else {}
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                response = self.client.embeddings.create(input=texts, model=self.model, **kwargs)
+                return [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
+            except self.openai.RateLimitError as e:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                print(f"임베딩 API 429 - {delay:.2f}초 후 재시도 ({attempt + 1}/{EMBEDDING_MAX_RETRIES})", file=sys.stderr)
+                time.sleep(delay)
+
+    async def _acreate(self, texts: List[str], dimensions: Optional[int]) -> List[List[float]]:
+        kwargs = {"dimensions": dimensions} if dimensions is not None else {}
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                response = await self.async_client.embeddings.create(input=texts, model=self.model, **kwargs)
+                return [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
+            except self.openai.RateLimitError as e:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                print(f"임베딩 API 429 - {delay:.2f}초 후 재시도 ({attempt + 1}/{EMBEDDING_MAX_RETRIES})", file=sys.stderr)
+                await asyncio.sleep(delay)
+
+    def _cached(self, texts: List[str], dimensions: Optional[int]) -> List[Optional[List[float]]]:
+        if self.cache is None:
+            return [None] * len(texts)
+        return [self.cache.get(self.model, dimensions, t) for t in texts]
+
+    async def _acached(self, texts: List[str], dimensions: Optional[int]) -> List[Optional[List[float]]]:
+        # SQLite 디스크 캐시 조회가 이벤트 루프를 막지 않도록 스레드에서 실행
+        if self.cache is None:
+            return [None] * len(texts)
+        return await asyncio.to_thread(self._cached, texts, dimensions)
+
+    def _store(self, text: str, dimensions: Optional[int], vector: List[float]):
+        if self.cache is not None:
+            self.cache.put(self.model, dimensions, text, vector)
+
+    async def _astore(self, items: List[Tuple[str, List[float]]], dimensions: Optional[int]):
+        # SQLite 저장/정리도 이벤트 루프를 막지 않도록 스레드에서 한 트랜잭션으로 실행
+        if self.cache is not None and items:
+            await asyncio.to_thread(self.cache.put_many, self.model, dimensions, items)
+
     def embed_query(self, text: str, **kwargs: Any) -> list[float]:
-        if "dimensions" not in kwargs and self.dimensions is not None:
-            kwargs["dimensions"] = self.dimensions
-        response = self.client.embeddings.create(input=text, model=self.model, **kwargs)
-        embedding: list[float] = response.data[0].embedding
-        return embedding
+        return self.embed_documents([text], **kwargs)[0]
+
+    def embed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        """
+        여러 텍스트를 EMBEDDING_MAX_BATCH 단위 API 호출로 임베딩 (캐시에 있는 텍스트는 제외)
+        """
+
+        dimensions = self._dimensions(kwargs)
+        vectors = self._cached(texts, dimensions)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        for start in range(0, len(missing), EMBEDDING_MAX_BATCH):
+            chunk = missing[start:start + EMBEDDING_MAX_BATCH]
+            computed = self._create([texts[i] for i in chunk], dimensions)
+            for i, vector in zip(chunk, computed):
+                self._store(texts[i], dimensions, vector)
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        dimensions = self._dimensions(kwargs)
+        vectors = await self._acached(texts, dimensions)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        chunks = [missing[start:start + EMBEDDING_MAX_BATCH] for start in range(0, len(missing), EMBEDDING_MAX_BATCH)]
+        results = await asyncio.gather(*(self._acreate([texts[i] for i in chunk], dimensions) for chunk in chunks))
+        for chunk, computed in zip(chunks, results):
+            for i, vector in zip(chunk, computed):
+                vectors[i] = vector
+        await self._astore([(texts[i], vectors[i]) for i in missing], dimensions)
+        return vectors
+
+    async def aembed_query(self, text: str, **kwargs: Any) -> list[float]:
+        """
+        단일 텍스트 비동기 임베딩
+        EMBEDDING_COALESCE_MS 안에 들어온 다른 요청과 합쳐 한 번의 API 호출로 처리
+        """
+
+        dimensions = self._dimensions(kwargs)
+        cached = (await self._acached([text], dimensions))[0]
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        if self._pending_loop is not loop:
+            self._pending_loop = loop
+            self._pending = {}
+
+        future = loop.create_future()
+        if dimensions in self._pending:
+            requests, _ = self._pending[dimensions]
+            requests.append((text, future))
+            if len(requests) >= EMBEDDING_MAX_BATCH:
+                self._flush(dimensions)
+        else:
+            handle = loop.call_later(EMBEDDING_COALESCE_MS / 1000, self._flush, dimensions)
+            self._pending[dimensions] = ([(text, future)], handle)
+        return await future
+
+    def _flush(self, dimensions: Optional[int]):
+        item = self._pending.pop(dimensions, None)
+        if item is None:
+            return
+        requests, handle = item
+        handle.cancel()
+        task = asyncio.get_running_loop().create_task(self._run_batch(requests, dimensions))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task):
+        self._batch_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"임베딩 배치 처리 실패: {task.exception()}", file=sys.stderr)
+
+    async def _run_batch(self, requests: List[Tuple[str, asyncio.Future]], dimensions: Optional[int]):
+        # 같은 텍스트가 여러 번 들어오면 한 번만 요청
+        texts = list(dict.fromkeys(text for text, _ in requests))
+        try:
+            computed = await self._acreate(texts, dimensions)
+        except Exception as e:
+            for _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        vectors = dict(zip(texts, computed))
+        for text, future in requests:
+            if not future.done():
+                future.set_result(vectors[text])
+        # 대기 중인 요청에 먼저 결과를 돌려준 뒤 캐시에 저장
+        await self._astore(list(vectors.items()), dimensions)
 
 class SMCEmbeddings(BaseOpenAIEmbeddings):
     """
     OpenAI 임베딩 클래스
     이 클래스는 OpenAI python client를 사용하여 텍스트 데이터의 임베딩을 생성
+    embed_documents/aembed_documents는 배치 호출, aembed_query는 동시 요청을 모아 배치 호출하며
+    429 응답은 지수 백오프로 재시도
 
     Args:
         model (str): 사용할 OpenAI 임베딩 모델의 이름. 기본값은 "text-embedding-ada-002"
-        kwargs: 기타 모든 매개변수는 openai.OpenAI 초기화에 전달
+        cache (EmbeddingCache): 임베딩 캐시. 지정하면 같은 (모델, 차원, 텍스트)는 API를 다시 호출하지 않음
+        kwargs: 기타 모든 매개변수는 openai.OpenAI / openai.AsyncOpenAI 초기화에 전달
     """
 
     def _initialize_client(self, **kwargs: Any) -> Any:
-        return self.openai.OpenAI(**kwargs) 
\ No newline at end of file
+        return self.openai.OpenAI(**kwargs)
+
+    def _initialize_async_client(self, **kwargs: Any) -> Any:
+        return self.openai.AsyncOpenAI(**kwargs)
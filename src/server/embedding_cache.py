@@ -0,0 +1,236 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from array import array
+from langchain_core.embeddings import Embeddings
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def normalize_text(text: str) -> str:
+    """
+    캐시 키용 텍스트 정규화 (유니코드 NFC + 공백 정리)
+    """
+
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_cache_key(model: str, dimensions: Optional[int], text: str) -> str:
+    raw = f"{model}\x00{dimensions or ''}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    (model, dimensions, 정규화 텍스트) 기반 content-addressed 임베딩 캐시
+    1단계: 프로세스 내 LRU, 2단계: SQLite 디스크 캐시 (여러 MCP 서버 프로세스가 공유)
+
+    Args:
+        path (str): SQLite 파일 경로. None이면 메모리 캐시만 사용
+        memory_max_items (int): 메모리 LRU 최대 항목 수
+        disk_max_bytes (int): 디스크 캐시 최대 크기(byte), 초과 시 오래 사용하지 않은 항목부터 삭제
+            (여러 프로세스가 같은 파일을 쓰므로 크기는 프로세스별 집계가 아니라 SQLite 파일의 사용 중 페이지로 계산)
+    """
+
+    def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH, memory_max_items: int = EMBEDDING_CACHE_MEMORY_ITEMS, disk_max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.path = path
+        self.memory_max_items = memory_max_items
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory_bytes = 0
+
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, nbytes INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+            self._conn.commit()
+
+    def _remember(self, key: str, vector: List[float]):
+        if key in self._memory:
+            self.memory_bytes -= len(self._memory.pop(key)) * 4
+        self._memory[key] = vector
+        self.memory_bytes += len(vector) * 4
+        while len(self._memory) > self.memory_max_items:
+            _, evicted = self._memory.popitem(last=False)
+            self.memory_bytes -= len(evicted) * 4
+
+    def get(self, model: str, dimensions: Optional[int], text: str) -> Optional[List[float]]:
+        key = make_cache_key(model, dimensions, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE embeddings SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, dimensions: Optional[int], text: str, vector: List[float]):
+        self.put_many(model, dimensions, [(text, vector)])
+
+    def put_many(self, model: str, dimensions: Optional[int], items: List[Tuple[str, List[float]]]):
+        """
+        (텍스트, 벡터) 목록을 한 트랜잭션으로 저장 (비동기 경로에서는 asyncio.to_thread로 호출)
+        """
+
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, vector in items:
+                key = make_cache_key(model, dimensions, text)
+                self._remember(key, list(vector))
+                blob = array("f", vector).tobytes()
+                rows.append((key, blob, len(blob), now))
+            if self._conn is None or not rows:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, nbytes, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            if self._disk_bytes() > self.disk_max_bytes:
+                self._evict()
+
+    def _disk_bytes(self) -> int:
+        """
+        SQLite 파일에서 실제 사용 중인 크기(byte) (다른 프로세스가 쓴 항목 포함, 삭제 후 빈 페이지는 제외)
+        """
+
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def _evict(self):
+        """
+        디스크 캐시가 최대 크기를 넘으면 최근 사용이 오래된 항목부터 90% 수준까지 삭제
+        """
+
+        target = int(self.disk_max_bytes * 0.9)
+        while self._disk_bytes() > target:
+            rows = self._conn.execute("SELECT key FROM embeddings ORDER BY last_access LIMIT 50").fetchall()
+            if not rows:
+                break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", rows)
+            self.evictions += len(rows)
+        self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_items": len(self._memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_path": self.path,
+                "disk_bytes": self._disk_bytes() if self._conn is not None else 0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    프로세스 공용 캐시 반환 (EMBEDDING_CACHE_ENABLED=false면 None)
+    Pinecone/Neo4j MCP 서버가 같은 EMBEDDING_CACHE_PATH를 사용하면 디스크 캐시를 공유
+    """
+
+    global _shared_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings 래퍼, 이미 계산한 임베딩은 EmbeddingCache에서 반환
+
+    Args:
+        embeddings (Embeddings): 실제 임베딩 모델
+        model (str): 캐시 키에 사용할 모델 이름
+        dimensions (int): 캐시 키에 사용할 차원 수 (모델 기본 차원이면 None)
+        cache (EmbeddingCache): 사용할 캐시
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache, dimensions: Optional[int] = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.dimensions = dimensions
+        self.cache = cache
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model, self.dimensions, text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(self.model, self.dimensions, text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # SQLite 조회가 이벤트 루프를 막지 않도록 스레드에서 실행
+        vector = await asyncio.to_thread(self.cache.get, self.model, self.dimensions, text)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self.cache.put, self.model, self.dimensions, text, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self.cache.get(self.model, self.dimensions, t) for t in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                self.cache.put(self.model, self.dimensions, texts[i], vector)
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await asyncio.to_thread(lambda: [self.cache.get(self.model, self.dimensions, t) for t in texts])
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            computed = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+            await asyncio.to_thread(self.cache.put_many, self.model, self.dimensions, [(texts[i], vectors[i]) for i in missing])
+        return vectors
@@ -0,0 +1,94 @@
+from __future__ import annotations
+from typing import Any, List, Optional
+from langchain_core.embeddings import Embeddings
+import argparse
+import hashlib
+import json
+import math
+import os
+import unicodedata
+
+# 서버별 임베딩 백엔드 (openai: OpenAI API, hashing: API 없이 동작하는 결정적 로컬 임베딩)
+EMBEDDING_BACKENDS = ("openai", "hashing")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    feature hashing 기반 결정적 로컬 임베딩 (OpenAI API 없이 검색 경로 부하 테스트/프로파일링용)
+    단어 + 문자 n-gram을 해시하여 고정 차원 벡터를 만들고 L2 정규화
+    의미 검색 품질은 없으므로 같은 백엔드로 만든 인덱스에서만 의미 있는 결과가 나옴
+
+    Args:
+        dimensions (int): 출력 차원 (Neo4j는 256, ada-002 Pinecone 인덱스는 1536)
+        ngram_range (tuple): 사용할 문자 n-gram 길이 범위
+    """
+
+    def __init__(self, dimensions: int = 1536, ngram_range: tuple = (2, 3)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        self.model = f"hashing-{dimensions}"
+        # 계산 비용이 작아 캐시를 쓰지 않음 (Neo4j 서버의 neo4j_embedding_cache_stats 호환용)
+        self.cache = None
+
+    def _features(self, text: str) -> List[str]:
+        normalized = " ".join(unicodedata.normalize("NFC", text).lower().split())
+        features = [f"w:{word}" for word in normalized.split()]
+        padded = f" {normalized} "
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            features.extend(f"c{n}:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return features
+
+    def _embed(self, text: str, dimensions: Optional[int] = None) -> List[float]:
+        dimensions = dimensions or self.dimensions
+        vector = [0.0] * dimensions
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # 하위 비트로 차원, 최상위 비트로 부호를 정해 해시 충돌의 편향을 줄임
+            vector[value % dimensions] += -1.0 if value >> 63 else 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_query(self, text: str, **kwargs: Any) -> List[float]:
+        return self._embed(text, kwargs.get("dimensions"))
+
+    def embed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        return [self._embed(text, kwargs.get("dimensions")) for text in texts]
+
+    async def aembed_query(self, text: str, **kwargs: Any) -> List[float]:
+        return self.embed_query(text, **kwargs)
+
+    async def aembed_documents(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        return self.embed_documents(texts, **kwargs)
+
+
+def check_embedding_backend(backend: str) -> str:
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {backend} (사용 가능: {', '.join(EMBEDDING_BACKENDS)})")
+    return backend
+
+
+if __name__ == "__main__":
+    from src.server.local_vectorstore import DOCUMENTS_FILE, build_local_index
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="로컬 인덱스의 문서를 해싱 임베딩으로 다시 인덱싱 (오프라인 부하 테스트용)")
+    parser.add_argument("--source-dir", default=os.getenv("LOCAL_VECTOR_STORE_DIR", "local_index"))
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.source_dir, DOCUMENTS_FILE), encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+
+    embeddings = HashingEmbeddings(dimensions=args.dimensions)
+    texts = [r["page_content"] for r in records]
+    build_local_index(
+        args.output_dir,
+        [r["id"] for r in records],
+        np.asarray(embeddings.embed_documents(texts), dtype=np.float32),
+        texts,
+        [r.get("metadata") or {} for r in records],
+        dtype=args.dtype,
+    )
@@ -0,0 +1,268 @@
+from __future__ import annotations
+from typing import Any, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+import numpy as np
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+IVF_FILE = "ivf.npz"
+META_FILE = "meta.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """
+    IVF 리스트 중심점 학습 (코사인 유사도 기반 spherical k-means)
+    """
+
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assignments == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def build_local_index(
+    output_dir: str,
+    ids: List[str],
+    vectors: np.ndarray,
+    texts: List[str],
+    metadatas: Optional[List[dict]] = None,
+    nlist: Optional[int] = None,
+    dtype: str = "float16",
+) -> str:
+    """
+    임베딩 행렬, 문서, IVF 인덱스를 output_dir에 저장
+    임베딩은 L2 정규화 후 float16/float32 .npy로 저장하여 mmap으로 로드 가능
+    """
+
+    vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+    metadatas = metadatas or [{} for _ in ids]
+
+    nlist = nlist or max(1, int(np.sqrt(len(vectors))))
+    nlist = min(nlist, len(vectors))
+    centroids = _train_centroids(vectors, nlist)
+    records = [{"id": doc_id, "page_content": text, "metadata": metadata} for doc_id, text, metadata in zip(ids, texts, metadatas)]
+    _write_index(output_dir, vectors, centroids, records, dtype)
+
+    print(f"로컬 벡터 인덱스 저장 완료: {output_dir} (문서 {len(ids)}개, 리스트 {nlist}개)")
+    return output_dir
+
+
+def _write_index(output_dir: str, vectors: np.ndarray, centroids: np.ndarray, records: List[dict], dtype: str):
+    """
+    정규화된 임베딩을 중심점에 배정하여 IVF 리스트를 만들고 인덱스 파일 저장
+    기존 인덱스를 mmap으로 열어 둔 상태에서도 안전하도록 임시 파일에 쓴 뒤 교체
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    nlist = len(centroids)
+    assignments = _assign(vectors, centroids)
+
+    # 리스트별 row 번호를 CSR 형태로 저장
+    order = np.argsort(assignments, kind="stable").astype(np.int64)
+    counts = np.bincount(assignments, minlength=nlist)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def replace(file_name: str, write):
+        path = os.path.join(output_dir, file_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    replace(EMBEDDINGS_FILE, lambda f: np.save(f, vectors.astype(dtype)))
+    replace(IVF_FILE, lambda f: np.savez(f, centroids=centroids.astype(np.float32), offsets=offsets, rows=order))
+    replace(DOCUMENTS_FILE, lambda f: f.writelines(
+        (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records
+    ))
+    meta = {"count": len(records), "dimensions": int(vectors.shape[1]), "dtype": dtype, "nlist": nlist, "metric": "cosine"}
+    replace(META_FILE, lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+
+class LocalVectorStore(VectorStore):
+    """
+    메모리 매핑된 임베딩 행렬 + IVF 인덱스 기반 로컬 벡터스토어 (Pinecone 대체용)
+    add_texts는 기존 중심점에 새 벡터를 배정해 IVF 리스트를 다시 만들고 디렉토리를 갱신
+    (중심점은 다시 학습하지 않으므로 문서가 크게 늘면 build_local_index로 재생성 권장)
+
+    Args:
+        index_dir (str): build_local_index / export_pinecone_index로 생성한 디렉토리
+        embedding (Embeddings): 쿼리 임베딩 모델 (인덱스 생성 시와 같은 모델)
+        nprobe (int): 검색 시 탐색할 IVF 리스트 수 (클수록 정확, 느림)
+    """
+
+    def __init__(self, index_dir: str, embedding: Embeddings, nprobe: int = 8):
+        self.index_dir = index_dir
+        self.embedding = embedding
+        self.nprobe = nprobe
+        self._load()
+
+    def _load(self):
+        index_dir = self.index_dir
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        ivf = np.load(os.path.join(index_dir, IVF_FILE))
+        self.centroids = ivf["centroids"]
+        self.offsets = ivf["offsets"]
+        self.rows = ivf["rows"]
+        with open(os.path.join(index_dir, DOCUMENTS_FILE), encoding="utf-8") as f:
+            self.documents = [json.loads(line) for line in f]
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _search(self, query_vector: List[float], k: int) -> List[Tuple[int, float]]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= (np.linalg.norm(query) or 1.0)
+
+        # 가까운 nprobe개 리스트의 후보만 정확 계산
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+        if len(candidates) == 0:
+            return []
+        candidates.sort()
+        scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def _to_document(self, row: int) -> Document:
+        record = self.documents[row]
+        metadata = dict(record.get("metadata") or {})
+        metadata["id"] = record["id"]
+        return Document(id=record["id"], page_content=record["page_content"], metadata=metadata)
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return [(self._to_document(row), score) for row, score in self._search(embedding, k)]
+
+    async def asimilarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        # mmap 읽기 + 행렬 곱이 이벤트 루프를 막지 않도록 스레드에서 실행
+        return await asyncio.to_thread(self.similarity_search_by_vector_with_score, embedding, k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+
+        new_vectors = _normalize(np.asarray(self.embedding.embed_documents(texts), dtype=np.float32))
+        if new_vectors.shape[1] != self.vectors.shape[1]:
+            raise ValueError(f"임베딩 차원이 인덱스와 다릅니다: {new_vectors.shape[1]} != {self.vectors.shape[1]}")
+
+        vectors = np.concatenate([np.asarray(self.vectors, dtype=np.float32), new_vectors])
+        records = self.documents + [
+            {"id": doc_id, "page_content": text, "metadata": metadata}
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+        _write_index(self.index_dir, vectors, self.centroids, records, self.meta["dtype"])
+        self._load()
+        return ids
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        index_dir: str = "local_index",
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        texts = list(texts)
+        ids = ids or [str(i) for i in range(len(texts))]
+        vectors = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+        build_local_index(index_dir, ids, vectors, texts, metadatas)
+        return cls(index_dir, embedding, **kwargs)
+
+
+def export_pinecone_index(index: Any, output_dir: str, text_key: str = "page_content", namespace: str = "", batch_size: int = 100, dtype: str = "float16", nlist: Optional[int] = None) -> str:
+    """
+    기존 Pinecone 인덱스의 벡터/문서를 모두 가져와 로컬 인덱스로 스냅샷 저장
+    """
+
+    ids, vectors, texts, metadatas = [], [], [], []
+    start = time.time()
+    for id_batch in index.list(namespace=namespace, limit=batch_size):
+        fetched = index.fetch(ids=list(id_batch), namespace=namespace)
+        for vector_id, vector in fetched.vectors.items():
+            metadata = dict(vector.metadata or {})
+            ids.append(vector_id)
+            vectors.append(vector.values)
+            texts.append(str(metadata.pop(text_key, "")))
+            metadatas.append(metadata)
+        print(f"Pinecone 벡터 {len(ids)}개 가져옴 - 경과 {time.time() - start:.1f}초")
+
+    if not ids:
+        raise ValueError("Pinecone 인덱스에서 가져온 벡터가 없습니다.")
+    return build_local_index(output_dir, ids, np.asarray(vectors, dtype=np.float32), texts, metadatas, nlist=nlist, dtype=dtype)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from pinecone import Pinecone
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Pinecone 인덱스를 로컬 IVF 인덱스로 스냅샷")
+    parser.add_argument("--output-dir", default=os.getenv("LOCAL_VECTOR_STORE_DIR", "local_index"))
+    parser.add_argument("--namespace", default="")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+
+    pc = Pinecone(api_key=os.environ["PINECONE_API_KEY"])
+    export_pinecone_index(
+        pc.Index(os.environ["pinecone_index_name"]),
+        args.output_dir,
+        namespace=args.namespace,
+        dtype=args.dtype,
+        nlist=args.nlist,
+    )
@@ -0,0 +1,36 @@
+from typing import List
+import threading
+
+
+class Histogram:
+    """
+    고정 버킷 기반의 간단한 히스토그램 (배치 크기, 대기 시간 분포 관측용)
+    """
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = {f"le_{bound:g}": c for bound, c in zip(self.buckets, self.counts)}
+            buckets["le_inf"] = self.counts[-1]
+            return {
+                "count": self.count,
+                "mean": self.total / self.count if self.count else 0.0,
+                "buckets": buckets,
+            }
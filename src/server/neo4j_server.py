@@ -1,134 +1,815 @@
 from src.server.embedder import *
 
-from neo4j import GraphDatabase
+from src.server.metrics import Histogram
+from src.server.subgraph_cache import SubgraphCache, SUBGRAPH_CACHE_ENABLED, normalize_vector, rank_neighbors
+from src.server.patient_directory import PatientDirectory
+from src.server.local_embeddings import HashingEmbeddings, check_embedding_backend
+from src.server.transport import MCP_HOST, MCP_STATELESS_HTTP, MCP_TRANSPORT, run_mcp_server
+
+from neo4j import AsyncGraphDatabase, GraphDatabase
 from neo4j_graphrag.llm import OpenAILLM
-from neo4j_graphrag.retrievers import VectorRetriever
 from mcp.server.fastmcp import FastMCP
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
+import re
+import sys
 import time
 
 load_dotenv()
 
-embedder = SMCEmbeddings(model="text-embedding-3-large", 
-                         dimensions=256, 
-                         api_key=os.getenv("OPENAI_API_KEY"))
+# 임베딩 백엔드 설정 (openai: text-embedding-3-large, hashing: 오프라인 부하 테스트용 로컬 해싱 임베딩)
+NEO4J_EMBEDDING_BACKEND = check_embedding_backend(os.getenv("NEO4J_EMBEDDING_BACKEND", "openai"))
+
+if NEO4J_EMBEDDING_BACKEND == "hashing":
+    embedder = HashingEmbeddings(dimensions=256)
+else:
+    embedder = SMCEmbeddings(model="text-embedding-3-large", 
+                             dimensions=256, 
+                             cache=get_shared_embedding_cache(),
+                             api_key=os.getenv("OPENAI_API_KEY"))
 
 NEO4J_URI = os.getenv("NEO4J_URI")
 AUTH = (os.getenv("DATABASE"), os.getenv("AUTH_LINK"))
 DATABASE = os.getenv("DATABASE")
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=AUTH)
+# HTTP 모드 포트 (Pinecone 서버와 겹치지 않도록 분리)
+NEO4J_MCP_PORT = int(os.getenv("NEO4J_MCP_PORT", "8006"))
+
+# 커넥션 풀 설정 (동시 tool 호출 수에 맞춰 조정)
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+
+driver = AsyncGraphDatabase.driver(
+    NEO4J_URI,
+    auth=AUTH,
+    max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+    connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+)
+
+
+class PoolMetrics:
+    """
+    세션(커넥션) 사용 현황 집계 - 피크 시간대 풀 크기 산정용
+    """
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.total_sessions = 0
+        self.saturated_sessions = 0
+        self.session_ms_histogram = Histogram([5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+
+    def acquire(self):
+        self.in_use += 1
+        self.total_sessions += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        if self.in_use > self.max_pool_size:
+            self.saturated_sessions += 1
+
+    def release(self, elapsed_ms: float):
+        self.in_use -= 1
+        self.session_ms_histogram.observe(elapsed_ms)
+
+    def get_stats(self) -> dict:
+        return {
+            "max_pool_size": self.max_pool_size,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "total_sessions": self.total_sessions,
+            "saturated_sessions": self.saturated_sessions,
+            "session_ms": self.session_ms_histogram.snapshot(),
+        }
+
+
+pool_metrics = PoolMetrics(NEO4J_MAX_POOL_SIZE)
+
+
+@asynccontextmanager
+async def pooled_session(driver):
+    """
+    풀에서 세션을 빌려 쓰고 사용 현황을 pool_metrics에 기록
+    """
+
+    pool_metrics.acquire()
+    start = time.perf_counter()
+    try:
+        async with driver.session() as session:
+            yield session
+    finally:
+        pool_metrics.release((time.perf_counter() - start) * 1000)
 
 llm = OpenAILLM(model_name="gpt-4o-mini", 
                 model_params={"temperature": 0.1})
 
-retriever = VectorRetriever(
-    driver,
-    index_name="entity_vector",
-    embedder=embedder,
-    return_properties=["name"],
-)
+VECTOR_INDEX_NAME = "entity_vector"
+
+# 이웃 확장 fan-out 제한 (고차수 노드가 수천 개 이웃/수 MB 텍스트를 반환하지 않도록)
+# 관계/라벨별 개별 제한은 JSON으로 지정, 예: NEO4J_RELATION_FANOUT='{"HAS_NOTE": 3}'
+NEO4J_MAX_NEIGHBORS_PER_RELATION = int(os.getenv("NEO4J_MAX_NEIGHBORS_PER_RELATION", "10"))
+NEO4J_MAX_NEIGHBORS_PER_LABEL = int(os.getenv("NEO4J_MAX_NEIGHBORS_PER_LABEL", "10"))
+NEO4J_MAX_NEIGHBORS = int(os.getenv("NEO4J_MAX_NEIGHBORS", "30"))
+NEO4J_RELATION_FANOUT = json.loads(os.getenv("NEO4J_RELATION_FANOUT", "{}"))
+NEO4J_LABEL_FANOUT = json.loads(os.getenv("NEO4J_LABEL_FANOUT", "{}"))
+NEO4J_MAX_CHUNK_CHARS = int(os.getenv("NEO4J_MAX_CHUNK_CHARS", "1000"))
+
+# 환자 직접 조회 설정 (이름/ID가 질문에 있으면 벡터 검색 없이 바로 조회)
+NEO4J_LOOKUP_MODE = os.getenv("NEO4J_LOOKUP_MODE", "auto")
+PATIENT_LABEL = os.getenv("NEO4J_PATIENT_LABEL", "Person")
+PATIENT_ID_PROPERTY = os.getenv("NEO4J_PATIENT_ID_PROPERTY", "patient_id")
+PATIENT_FULLTEXT_INDEX = os.getenv("NEO4J_PATIENT_FULLTEXT_INDEX", "patient_name_fulltext")
+PATIENT_FULLTEXT_MIN_SCORE = float(os.getenv("NEO4J_PATIENT_FULLTEXT_MIN_SCORE", "1.0"))
+PARTICLE_SUFFIX_PATTERN = re.compile(r"(의|은|는|이|가|을|를|에게|님)$")
+PATIENT_NAME_PATTERN = re.compile(r"환자\s*([가-힣A-Za-z0-9]{2,})|([가-힣A-Za-z0-9]{2,}?)\s*환자")
+
+patient_directory = PatientDirectory(refresh_sec=float(os.getenv("NEO4J_PATIENT_DIRECTORY_REFRESH_SEC", "600")))
+patient_directory_lock = asyncio.Lock()
+# full-text 인덱스 사용 가능 여부 (None: 서버 시작 시 확인 전, False: 생성/조회 실패 → CONTAINS 검색으로 대체)
+patient_fulltext_available = None
+
+# 다중 hop 확장 설정 (hop별 fan-out 상한, 관계 타입 허용 목록, 시작 노드별 반환 경로 수 상한)
+NEO4J_MAX_HOPS = int(os.getenv("NEO4J_MAX_HOPS", "1"))
+NEO4J_HOP_LIMIT = 4
+NEO4J_HOP_FANOUT = int(os.getenv("NEO4J_HOP_FANOUT", "5"))
+NEO4J_HOP_RELATION_TYPES = [t.strip() for t in os.getenv("NEO4J_HOP_RELATION_TYPES", "").split(",") if t.strip()] or None
+NEO4J_MAX_PATHS = int(os.getenv("NEO4J_MAX_PATHS", "50"))
+
+# get_graph_context의 token_budget 계산용 토크나이저
+try:
+    import tiktoken
+    token_encoder = tiktoken.get_encoding("o200k_base")
+except Exception:
+    token_encoder = None
+
+# elementId별 확장 결과 캐시 (SUBGRAPH_CACHE_ENABLED=false면 사용하지 않음)
+# 시작 노드마다 쿼리와 무관하게 최대 SUBGRAPH_CACHE_MAX_NEIGHBORS개 이웃(임베딩 포함)을 저장하고, 조회 시 쿼리별로 순위/fan-out 적용
+subgraph_cache = SubgraphCache() if SUBGRAPH_CACHE_ENABLED else None
+SUBGRAPH_CACHE_MAX_NEIGHBORS = int(os.getenv("SUBGRAPH_CACHE_MAX_NEIGHBORS", "200"))
 
 mcp = FastMCP(
     "Neo4j_Retriever",
     instructions="A Retriever that can retrieve information from the Neo4j database.",
-    host="0.0.0.0",
-    port=8005,
+    host=MCP_HOST,
+    port=NEO4J_MCP_PORT,
+    stateless_http=MCP_STATELESS_HTTP,
 )
 
-def get_node_with_neighbors(driver, element_id):
+# 시작 노드 n에 대해 fan-out이 제한된 1-hop 이웃 목록(neighbors)을 만드는 서브쿼리
+EXPANSION_SUBQUERY = """
+    CALL {
+      WITH n
+      OPTIONAL MATCH (n)-[r]-(m)
+      WITH n, r, m,
+        CASE WHEN m.embedding IS NOT NULL AND size(m.embedding) = size($query_vector)
+             THEN vector.similarity.cosine(m.embedding, $query_vector) ELSE 0.0 END AS similarity
+      ORDER BY similarity DESC
+      WITH type(r) AS relation, collect({
+        neighbor_name: m.name,
+        text: left(m.text, $max_chunk_chars),
+        neighbor_labels: labels(m),
+        label_key: head([l IN labels(m) WHERE NOT l IN ['__KGBuilder__', '__Entity__']]),
+        relation: type(r),
+        direction: CASE WHEN startNode(r) = n THEN 'out' ELSE 'in' END,
+        similarity: similarity
+      }) AS relation_neighbors
+      UNWIND relation_neighbors[..coalesce($relation_fanout[relation], $max_per_relation)] AS neighbor
+      WITH neighbor ORDER BY neighbor.similarity DESC
+      WITH neighbor.label_key AS label_key, collect(neighbor) AS label_neighbors
+      UNWIND label_neighbors[..coalesce($label_fanout[label_key], $max_per_label)] AS neighbor
+      WITH neighbor ORDER BY neighbor.similarity DESC
+      RETURN collect(DISTINCT neighbor)[..$max_neighbors] AS neighbors
+    }
+"""
+
+
+# 캐시용: 시작 노드 n의 이웃을 쿼리와 무관하게 가져오는 서브쿼리 (이미 캐시에 있는 노드는 건너뜀)
+RAW_EXPANSION_SUBQUERY = """
+    CALL {
+      WITH n
+      WITH n WHERE NOT elementId(n) IN $cached_ids
+      OPTIONAL MATCH (n)-[r]-(m)
+      WITH n, r, m LIMIT $max_raw_neighbors
+      RETURN collect(CASE WHEN r IS NULL THEN null ELSE {
+        neighbor_name: m.name,
+        text: left(m.text, $max_chunk_chars),
+        neighbor_labels: labels(m),
+        label_key: head([l IN labels(m) WHERE NOT l IN ['__KGBuilder__', '__Entity__']]),
+        relation: type(r),
+        direction: CASE WHEN startNode(r) = n THEN 'out' ELSE 'in' END,
+        embedding: m.embedding
+      } END) AS raw_neighbors
+    }
+"""
+
+
+def _expansion_params(query_vector: list[float]) -> dict:
+    return {
+        "query_vector": query_vector,
+        "max_per_relation": NEO4J_MAX_NEIGHBORS_PER_RELATION,
+        "max_per_label": NEO4J_MAX_NEIGHBORS_PER_LABEL,
+        "max_neighbors": NEO4J_MAX_NEIGHBORS,
+        "relation_fanout": NEO4J_RELATION_FANOUT,
+        "label_fanout": NEO4J_LABEL_FANOUT,
+        "max_chunk_chars": NEO4J_MAX_CHUNK_CHARS,
+    }
+
+
+async def search_and_expand(driver, query_vector: list[float], top_k: int = 5):
     """
-    elementId로 1-hop 연결 정보 가져오는 함수
+    벡터 인덱스 검색 + 1-hop 이웃 확장을 한 번의 Cypher 쿼리로 수행
+    (검색된 노드마다 세션을 열어 따로 조회하던 N+1 왕복 제거)
+    이웃은 쿼리 임베딩과의 유사도 순으로 관계별/라벨별/전체 개수를 제한하고,
+    Chunk 텍스트는 서버에서 잘라서 반환
     """
     query = """
-    MATCH (n) WHERE elementId(n) = $elementId
-    OPTIONAL MATCH (n)-[r]-(m)
+    CALL db.index.vector.queryNodes($index_name, $top_k, $query_vector) YIELD node AS n, score
+    """ + EXPANSION_SUBQUERY + """
     RETURN 
+      elementId(n) AS element_id,
+      score,
       n {.name, labels: labels(n)} AS starting_node,
-      collect({
-        neighbor_name: m.name,
-        text: m.text,
-        neighbor_labels: labels(m),
-        relation: type(r),
-        direction: CASE WHEN startNode(r) = n THEN 'out' ELSE 'in' END
-      }) AS neighbors
+      neighbors
+    ORDER BY score DESC
     """
-    with driver.session() as session:
-        result = session.run(query, elementId=element_id)
-        return result.single()
+    async with pooled_session(driver) as session:
+        result = await session.run(query, index_name=VECTOR_INDEX_NAME, top_k=top_k, **_expansion_params(query_vector))
+        return [dict(record) async for record in result]
 
 
-def build_context_from_vector(driver, query_text: str, top_k: int = 5) -> str:
+async def expand_nodes(driver, element_ids: list[str], query_vector: list[float]):
     """
-    context 생성 함수
+    여러 elementId의 1-hop 이웃을 UNWIND로 한 번에 확장
+    """
+    if not element_ids:
+        return []
+    query = """
+    UNWIND $element_ids AS element_id
+    MATCH (n) WHERE elementId(n) = element_id
+    """ + EXPANSION_SUBQUERY + """
+    RETURN 
+      element_id,
+      n {.name, labels: labels(n)} AS starting_node,
+      neighbors
+    """
+    async with pooled_session(driver) as session:
+        result = await session.run(query, element_ids=element_ids, **_expansion_params(query_vector))
+        return [dict(record) async for record in result]
+
+
+def _cache_key(element_id: str) -> tuple:
+    # hop 수와 확장 제한 파라미터를 키에 포함 (설정이 바뀌면 다른 항목)
+    return (element_id, 1, SUBGRAPH_CACHE_MAX_NEIGHBORS, NEO4J_MAX_CHUNK_CHARS)
+
+
+def _cache_entry(record) -> dict:
     """
+    RAW_EXPANSION_SUBQUERY 결과를 캐시 항목으로 변환 (이웃 임베딩은 정규화된 float32 배열로 보관)
+    """
+    neighbors = []
+    for neighbor in record['raw_neighbors']:
+        neighbor = dict(neighbor)
+        neighbor['vector'] = normalize_vector(neighbor.pop('embedding', None))
+        neighbors.append(neighbor)
+    return {'starting_node': record['starting_node'], 'neighbors': neighbors}
 
-    query_vector = embedder.embed_query(query_text, dimensions=256)
 
-    retriever_result = retriever.search(query_vector=query_vector, top_k=top_k)
+def _context_from_entry(element_id: str, entry: dict, query_vector: list[float], score: float | None = None) -> dict:
+    """
+    캐시 항목에 쿼리별 이웃 순위/fan-out을 적용하여 컨텍스트 생성 (search_and_expand 결과와 같은 형식)
+    """
+    ctx = {
+        'element_id': element_id,
+        'starting_node': entry['starting_node'],
+        'neighbors': rank_neighbors(
+            entry['neighbors'],
+            query_vector,
+            NEO4J_MAX_NEIGHBORS_PER_RELATION,
+            NEO4J_MAX_NEIGHBORS_PER_LABEL,
+            NEO4J_MAX_NEIGHBORS,
+            NEO4J_RELATION_FANOUT,
+            NEO4J_LABEL_FANOUT,
+        ),
+    }
+    if score is not None:
+        ctx['score'] = score
+    ctx['lines'] = format_node_lines(ctx)
+    return ctx
 
-    for i, item in enumerate(retriever_result.items):
-        element_id = item.metadata.get('id', 'Unknown')
 
-    expanded_contexts = []
+async def fetch_cache_entries(driver, element_ids: list[str]) -> dict:
+    """
+    캐시에 없는 노드들의 이웃을 한 번의 쿼리로 가져와 캐시에 저장 (elementId → 캐시 항목)
+    """
+    if not element_ids:
+        return {}
+    query = """
+    UNWIND $element_ids AS element_id
+    MATCH (n) WHERE elementId(n) = element_id
+    """ + RAW_EXPANSION_SUBQUERY + """
+    RETURN element_id, n {.name, labels: labels(n)} AS starting_node, raw_neighbors
+    """
+    async with pooled_session(driver) as session:
+        result = await session.run(
+            query,
+            element_ids=element_ids,
+            cached_ids=[],
+            max_raw_neighbors=SUBGRAPH_CACHE_MAX_NEIGHBORS,
+            max_chunk_chars=NEO4J_MAX_CHUNK_CHARS,
+        )
+        records = [record async for record in result]
 
-    for i, item in enumerate(retriever_result.items):
-        element_id = item.metadata['id']
-        
-        node_start = time.time()
-        node_info = get_node_with_neighbors(driver, element_id)
-        node_time = time.time() - node_start
-        
-        if node_info:
-            neighbors_count = len(node_info['neighbors'])
-            expanded_contexts.append(node_info)
+    entries = {}
+    for record in records:
+        entry = _cache_entry(record)
+        subgraph_cache.put(_cache_key(record['element_id']), entry, [record['element_id']])
+        entries[record['element_id']] = entry
+    return entries
+
+
+async def get_nodes_with_neighbors(driver, query_vector: list[float], top_k: int = 5):
+    """
+    시작 노드 + 이웃 컨텍스트 조회 (벡터 검색 + 확장을 한 번의 쿼리로 수행)
+    캐시 사용 시 이미 캐시에 있는 시작 노드는 이웃을 다시 가져오지 않고(다른 질문에서 캐시된 노드 포함),
+    캐시에 없는 노드의 이웃만 같은 쿼리에서 함께 가져옴 (이웃 순위/fan-out은 쿼리마다 Python에서 적용)
+    """
+    if subgraph_cache is None:
+        contexts = await search_and_expand(driver, query_vector, top_k=top_k)
+        for ctx in contexts:
+            ctx['lines'] = format_node_lines(ctx)
+        return contexts
+
+    cached_ids = [key[0] for key in subgraph_cache.keys()]
+    query = """
+    CALL db.index.vector.queryNodes($index_name, $top_k, $query_vector) YIELD node AS n, score
+    """ + RAW_EXPANSION_SUBQUERY + """
+    RETURN
+      elementId(n) AS element_id,
+      score,
+      n {.name, labels: labels(n)} AS starting_node,
+      raw_neighbors
+    ORDER BY score DESC
+    """
+    async with pooled_session(driver) as session:
+        result = await session.run(
+            query,
+            index_name=VECTOR_INDEX_NAME,
+            top_k=top_k,
+            query_vector=query_vector,
+            cached_ids=cached_ids,
+            max_raw_neighbors=SUBGRAPH_CACHE_MAX_NEIGHBORS,
+            max_chunk_chars=NEO4J_MAX_CHUNK_CHARS,
+        )
+        records = [record async for record in result]
+
+    cached = set(cached_ids)
+    entries = {}
+    expired = []
+    for record in records:
+        element_id = record['element_id']
+        entry = subgraph_cache.get(_cache_key(element_id))
+        if entry is None and element_id in cached:
+            # 쿼리 실행 중 만료/무효화되어 이웃을 받지 못한 노드는 다시 조회
+            expired.append(element_id)
+            continue
+        if entry is None:
+            entry = _cache_entry(record)
+            subgraph_cache.put(_cache_key(element_id), entry, [element_id])
+        entries[element_id] = entry
+    entries.update(await fetch_cache_entries(driver, expired))
+
+    return [
+        _context_from_entry(record['element_id'], entries[record['element_id']], query_vector, record['score'])
+        for record in records if record['element_id'] in entries
+    ]
+
+
+async def get_contexts_for_element_ids(driver, element_ids: list[str], query_vector: list[float]):
+    """
+    elementId 목록의 이웃 컨텍스트 조회 (캐시에 없는 노드만 한 번에 확장, 입력 순서 유지)
+    """
+    if subgraph_cache is None:
+        contexts = {}
+        for ctx in await expand_nodes(driver, element_ids, query_vector):
+            ctx['lines'] = format_node_lines(ctx)
+            contexts[ctx['element_id']] = ctx
+        return [contexts[element_id] for element_id in element_ids if element_id in contexts]
+
+    entries = {}
+    missing = []
+    for element_id in element_ids:
+        entry = subgraph_cache.get(_cache_key(element_id))
+        if entry is not None:
+            entries[element_id] = entry
         else:
-            print(f"노드 정보를 찾을 수 없음 - 시간: {node_time:.2f}초")
+            missing.append(element_id)
+    entries.update(await fetch_cache_entries(driver, missing))
 
-    context_lines = []
-    total_neighbors = 0
-    
-    for ctx_idx, ctx in enumerate(expanded_contexts):
-        start = ctx['starting_node']
-        start_name = start.get('name', 'Unknown')
-        start_labels = [l for l in start.get('labels', []) if l not in {'__KGBuilder__', '__Entity__'}]
-        context_lines.append(f"starting_node: {start_name} ({', '.join(start_labels)})")
-        
-        neighbors_count = len(ctx['neighbors'])
-        total_neighbors += neighbors_count
+    return [_context_from_entry(element_id, entries[element_id], query_vector) for element_id in element_ids if element_id in entries]
+
+
+def _similarity(node: str) -> str:
+    return (
+        f"CASE WHEN {node}.embedding IS NOT NULL AND size({node}.embedding) = size($query_vector) "
+        f"THEN vector.similarity.cosine({node}.embedding, $query_vector) ELSE 0.0 END"
+    )
+
+
+def build_multi_hop_query(hops: int, from_element_ids: bool = False) -> str:
+    """
+    k-hop 확장 Cypher 생성
+    hop마다 CALL 서브쿼리에서 (관계 타입 허용 목록 적용 후) 쿼리 임베딩 유사도 상위 $fanout개 이웃만 남기고,
+    시작 노드마다 경로 점수(경로상 노드 유사도 평균) 상위 $max_paths개 경로만 반환
+    """
+
+    if from_element_ids:
+        start = """
+    UNWIND $element_ids AS element_id
+    MATCH (n0) WHERE elementId(n0) = element_id
+    WITH n0, 1.0 AS score
+    """
+    else:
+        start = """
+    CALL db.index.vector.queryNodes($index_name, $top_k, $query_vector) YIELD node AS n0, score
+    """
+
+    hop_clauses = []
+    for i in range(1, hops + 1):
+        previous = [f"n{j}" for j in range(i)]
+        hop_clauses.append(f"""
+      CALL {{
+        WITH {', '.join(previous)}
+        OPTIONAL MATCH (n{i - 1})-[r{i}]-(n{i})
+        WHERE NOT n{i} IN [{', '.join(previous)}]
+          AND ($relation_types IS NULL OR type(r{i}) IN $relation_types)
+        WITH r{i}, n{i}, {_similarity(f"n{i}")} AS s{i}
+        ORDER BY s{i} DESC
+        LIMIT $fanout
+        RETURN r{i}, n{i}, s{i}
+      }}""")
+
+    # 경로 수 상한은 시작 노드별로 적용 (상위 시작 노드가 전체 예산을 모두 쓰지 않도록)
+    steps = ", ".join(f"[r{i}, n{i}, s{i}, n{i - 1}]" for i in range(1, hops + 1))
+    return start + """
+    CALL {
+      WITH n0""" + "".join(hop_clauses) + f"""
+      WITH n0, [step IN [{steps}] WHERE step[1] IS NOT NULL] AS steps
+      WITH steps,
+        CASE WHEN size(steps) = 0 THEN 0.0
+             ELSE reduce(total = 0.0, step IN steps | total + step[2]) / size(steps) END AS path_score
+      ORDER BY path_score DESC
+      LIMIT $max_paths
+      RETURN steps, path_score
+    }}
+    WITH n0, score, steps, path_score
+    ORDER BY score DESC, path_score DESC
+    RETURN
+      elementId(n0) AS element_id,
+      score,
+      n0 {{.name, labels: labels(n0)}} AS starting_node,
+      path_score,
+      [step IN steps | {{
+        source_name: step[3].name,
+        neighbor_name: step[1].name,
+        text: left(step[1].text, $max_chunk_chars),
+        neighbor_labels: labels(step[1]),
+        relation: type(step[0]),
+        direction: CASE WHEN startNode(step[0]) = step[3] THEN 'out' ELSE 'in' END,
+        similarity: step[2]
+      }}] AS path
+    """
+
+
+async def expand_multi_hop(driver, query_vector: list[float], hops: int, top_k: int = 5, element_ids: list[str] | None = None):
+    """
+    벡터 검색(또는 지정한 elementId) 시작 노드에서 k-hop까지 가지치기된 서브그래프를 한 번의 쿼리로 조회
+    반환 형식은 1-hop 컨텍스트와 같고, 각 이웃에는 경로상 직전 노드 이름(source_name)이 포함됨
+    """
+    hops = max(1, min(hops, NEO4J_HOP_LIMIT))
+    query = build_multi_hop_query(hops, from_element_ids=element_ids is not None)
+    async with pooled_session(driver) as session:
+        result = await session.run(
+            query,
+            index_name=VECTOR_INDEX_NAME,
+            top_k=top_k,
+            element_ids=element_ids or [],
+            query_vector=query_vector,
+            relation_types=NEO4J_HOP_RELATION_TYPES,
+            fanout=NEO4J_HOP_FANOUT,
+            max_paths=NEO4J_MAX_PATHS,
+            max_chunk_chars=NEO4J_MAX_CHUNK_CHARS,
+        )
+        records = [record async for record in result]
+
+    # 시작 노드별로 경로의 간선을 모으고 중복 간선 제거
+    contexts = {}
+    for record in records:
+        ctx = contexts.setdefault(record['element_id'], {
+            'element_id': record['element_id'],
+            'starting_node': record['starting_node'],
+            'neighbors': [],
+            '_seen': set(),
+        })
+        for edge in record['path']:
+            key = (edge['source_name'], edge['relation'], edge['neighbor_name'], edge['text'], edge['direction'])
+            if key not in ctx['_seen']:
+                ctx['_seen'].add(key)
+                ctx['neighbors'].append(edge)
+    for ctx in contexts.values():
+        del ctx['_seen']
+        ctx['lines'] = format_node_lines(ctx)
+    return list(contexts.values())
+
+
+def format_node_lines(ctx) -> list[tuple[str, str | None]]:
+    """
+    시작 노드 하나의 이웃 정보를 (triple 라인, Chunk 텍스트 또는 None) 목록으로 변환
+    """
 
-        for neighbor in ctx['neighbors']:
-            labels = [l for l in neighbor.get('neighbor_labels', []) if l not in {'__KGBuilder__', '__Entity__'}]
-            label_str = f"[{', '.join(labels)}]" if labels else "[Unknown]"
+    lines = []
+    start = ctx['starting_node']
+    start_name = start.get('name', 'Unknown')
+    start_labels = [l for l in start.get('labels', []) if l not in {'__KGBuilder__', '__Entity__'}]
+    lines.append((f"starting_node: {start_name} ({', '.join(start_labels)})", None))
 
-            if 'Chunk' in neighbor.get('neighbor_labels', []):
-                neighbor_value = neighbor.get('text', 'None')
-            else:
-                neighbor_value = neighbor.get('neighbor_name', 'None')
+    for neighbor in ctx['neighbors']:
+        if neighbor.get('relation') is None:
+            continue
+        labels = [l for l in neighbor.get('neighbor_labels', []) if l not in {'__KGBuilder__', '__Entity__'}]
+        label_str = f"[{', '.join(labels)}]" if labels else "[Unknown]"
+
+        chunk_text = None
+        if 'Chunk' in neighbor.get('neighbor_labels', []):
+            neighbor_value = neighbor.get('text', 'None')
+            chunk_text = neighbor_value
+        else:
+            neighbor_value = neighbor.get('neighbor_name', 'None')
+
+        relation = neighbor.get('relation', 'UNKNOWN_RELATION')
+        direction = neighbor.get('direction', 'out')
+
+        # 다중 hop 간선은 경로상 직전 노드(source_name)를 기준으로 표시
+        source_name = neighbor.get('source_name') or start_name
+        if direction == 'out':
+            triple = f"({source_name}, {relation}, {neighbor_value})"
+        else:
+            triple = f"({neighbor_value}, {relation}, {source_name})"
 
-            relation = neighbor.get('relation', 'UNKNOWN_RELATION')
-            direction = neighbor.get('direction', 'out')
+        lines.append((f"{label_str} : \"{neighbor_value}\" {triple}", chunk_text))
 
-            if direction == 'out':
-                triple = f"({start_name}, {relation}, {neighbor_value})"
-            else:
-                triple = f"({neighbor_value}, {relation}, {start_name})"
+    return lines
+
+
+def format_context(expanded_contexts) -> str:
+    """
+    시작 노드 + 이웃 정보를 LLM 입력용 triple 라인으로 변환
+    """
+
+    context_lines = []
+    seen_chunks = set()
 
-            context_lines.append(f"{label_str} : \"{neighbor_value}\" {triple}")
+    for ctx in expanded_contexts:
+        for line, chunk_text in ctx.get('lines') or format_node_lines(ctx):
+            # 여러 시작 노드에 연결된 같은 Chunk는 한 번만 포함
+            if chunk_text is not None:
+                if chunk_text in seen_chunks:
+                    continue
+                seen_chunks.add(chunk_text)
+            context_lines.append(line)
 
     return "\n".join(context_lines)
 
+
+def ensure_patient_fulltext_index() -> bool:
+    """
+    환자 이름/ID 전문(full-text) 인덱스 생성 (서버 시작 시 한 번 실행, 요청 경로에서는 스키마 변경을 하지 않음)
+    서버 시작 시점에는 이벤트 루프가 없거나(stdio) 다른 루프(in-process, uvicorn)일 수 있으므로 단기 동기 드라이버 사용
+    읽기 전용/최소 권한 계정이면 생성에 실패하므로 경고만 남기고 CONTAINS 검색으로 대체
+    """
+    global patient_fulltext_available
+    try:
+        # 자동 재시도하는 execute_query 대신 auto-commit으로 한 번만 실행 (DB가 내려가 있어도 시작이 지연되지 않도록)
+        with GraphDatabase.driver(NEO4J_URI, auth=AUTH) as sync_driver, sync_driver.session() as session:
+            session.run(
+                f"CREATE FULLTEXT INDEX {PATIENT_FULLTEXT_INDEX} IF NOT EXISTS "
+                f"FOR (n:`{PATIENT_LABEL}`) ON EACH [n.name, n.`{PATIENT_ID_PROPERTY}`]"
+            ).consume()
+        patient_fulltext_available = True
+    except Exception as e:
+        print(f"환자 full-text 인덱스 생성 실패, CONTAINS 검색으로 대체: {e}", file=sys.stderr)
+        patient_fulltext_available = False
+    return patient_fulltext_available
+
+
+async def load_patient_directory(driver):
+    """
+    환자 이름/ID 사전 로드
+    """
+    async with patient_directory_lock:
+        if not patient_directory.is_stale():
+            return
+        async with pooled_session(driver) as session:
+            result = await session.run(
+                f"MATCH (n:`{PATIENT_LABEL}`) "
+                f"RETURN elementId(n) AS element_id, [n.name, toString(n.`{PATIENT_ID_PROPERTY}`)] AS keys"
+            )
+            entries = [(record['element_id'], record['keys']) async for record in result]
+        patient_directory.load(entries)
+        print(f"환자 사전 로드 완료: {len(patient_directory)}개 키", file=sys.stderr)
+
+
+async def lookup_patients(driver, query_text: str) -> list[str]:
+    """
+    질문에 포함된 환자 이름/ID로 환자 노드 elementId 조회
+    1) 메모리 사전 매칭 2) 사전에 없으면(최근 추가된 환자 등) full-text 인덱스 조회
+    같은 이름이 여러 환자에 해당하는 등 모호하면 빈 목록 반환 (벡터 검색으로 대체)
+    """
+    if patient_directory.is_stale():
+        await load_patient_directory(driver)
+
+    element_ids, ambiguous = patient_directory.match(query_text)
+    if ambiguous:
+        print(f"환자 이름/ID가 여러 환자에 해당하여 직접 조회 생략: {len(element_ids)}명", file=sys.stderr)
+        return []
+    if element_ids:
+        return element_ids
+
+    candidates = PATIENT_NAME_PATTERN.findall(query_text)
+    names = [PARTICLE_SUFFIX_PATTERN.sub("", name) for pair in candidates for name in pair if name]
+    names = list(dict.fromkeys(name for name in names if len(name) >= 2 and not name.isdigit()))
+    if not names:
+        return []
+    matches = await search_patient_names(driver, names)
+    if any(len(ids) > 1 for ids in matches):
+        print("full-text 조회 결과가 여러 환자에 해당하여 직접 조회 생략", file=sys.stderr)
+        return []
+    return list(dict.fromkeys(e for ids in matches for e in ids))
+
+
+async def search_patient_names(driver, names: list[str]) -> list[list[str]]:
+    """
+    이름별 환자 노드 elementId 목록 조회
+    full-text 인덱스를 사용할 수 없으면(생성 실패/조회 오류) 환자 라벨 노드의 CONTAINS 검색으로 대체
+    """
+    global patient_fulltext_available
+    if patient_fulltext_available is not False:
+        query = """
+        UNWIND $names AS name
+        CALL db.index.fulltext.queryNodes($index_name, name) YIELD node, score
+        WHERE score >= $min_score
+        RETURN name, collect(DISTINCT elementId(node)) AS element_ids
+        """
+        try:
+            async with pooled_session(driver) as session:
+                result = await session.run(
+                    query,
+                    names=[f'"{name}"' for name in names],
+                    index_name=PATIENT_FULLTEXT_INDEX,
+                    min_score=PATIENT_FULLTEXT_MIN_SCORE,
+                )
+                return [record['element_ids'] async for record in result]
+        except Exception as e:
+            print(f"환자 full-text 조회 실패, CONTAINS 검색으로 대체: {e}", file=sys.stderr)
+            patient_fulltext_available = False
+
+    query = f"""
+    UNWIND $names AS name
+    MATCH (n:`{PATIENT_LABEL}`) WHERE n.name CONTAINS name OR toString(n.`{PATIENT_ID_PROPERTY}`) = name
+    RETURN name, collect(DISTINCT elementId(n)) AS element_ids
+    """
+    async with pooled_session(driver) as session:
+        result = await session.run(query, names=names)
+        return [record['element_ids'] async for record in result]
+
+
+async def collect_contexts_from_vector(driver, query_text: str, top_k: int = 5):
+    """
+    벡터 검색 기반 시작 노드 + 이웃 컨텍스트 조회
+    """
+
+    # 동시에 들어온 tool 호출의 임베딩 요청은 embedder에서 한 번의 API 호출로 병합됨
+    query_vector = await embedder.aembed_query(query_text, dimensions=256)
+    return await get_nodes_with_neighbors(driver, query_vector, top_k=top_k)
+
+
+async def build_context_from_vector(driver, query_text: str, top_k: int = 5) -> str:
+    """
+    context 생성 함수
+    """
+
+    return format_context(await collect_contexts_from_vector(driver, query_text, top_k=top_k))
+
+
+async def collect_contexts(driver, query_text: str, top_k: int = 5, lookup_mode: str = "auto", hops: int = 1):
+    """
+    lookup_mode
+      - auto: 환자 이름/ID가 하나의 환자로 확인되면 해당 노드를 바로 확장, 없거나 모호하거나 조회 오류면 벡터 검색
+      - exact: 환자 이름/ID 조회만 수행
+      - vector: 항상 벡터 검색
+    hops: 2 이상이면 시작 노드에서 k-hop까지 확장 (경로 점수 계산을 위해 쿼리 임베딩 사용)
+    """
+    element_ids = None
+    if lookup_mode in ("auto", "exact"):
+        try:
+            element_ids = await lookup_patients(driver, query_text) or None
+        except Exception as e:
+            # 사전 로드/full-text 조회 실패 시에도 검색이 끊기지 않도록 벡터 검색으로 대체
+            print(f"환자 직접 조회 실패, 벡터 검색으로 대체: {e}", file=sys.stderr)
+            element_ids = None
+        if element_ids:
+            print(f"환자 직접 조회: {len(element_ids)}명", file=sys.stderr)
+            if hops <= 1:
+                return await get_contexts_for_element_ids(driver, element_ids, [])
+        elif lookup_mode == "exact":
+            return []
+
+    if hops <= 1:
+        return await collect_contexts_from_vector(driver, query_text, top_k=top_k)
+
+    query_vector = await embedder.aembed_query(query_text, dimensions=256)
+    return await expand_multi_hop(driver, query_vector, hops, top_k=top_k, element_ids=element_ids)
+
+
+async def build_context(driver, query_text: str, top_k: int = 5, lookup_mode: str = "auto", hops: int = 1) -> str:
+    return format_context(await collect_contexts(driver, query_text, top_k=top_k, lookup_mode=lookup_mode, hops=hops))
+
+
+def count_tokens(text: str) -> int:
+    """
+    토큰 수 계산 (tiktoken이 없으면 문자 수 기반 근사)
+    """
+    if token_encoder is None:
+        return len(text) // 2 + 1
+    return len(token_encoder.encode(text))
+
+
+def structure_contexts(contexts, token_budget: int | None = None) -> dict:
+    """
+    컨텍스트를 LLM 생성 없이 {nodes, triples, chunks} 구조로 변환
+    nodes/triples는 format_node_lines의 라인 문자열(라벨 포함), chunks는 중복 제거된 Chunk 텍스트
+    token_budget이 주어지면 시작 노드 → triple → chunk 순으로 예산 안에서만 포함
+    """
+
+    nodes, triples, chunks = [], [], []
+    seen_chunks = set()
+    for ctx in contexts:
+        # triple/라벨 표기는 format_node_lines와 동일 (첫 줄은 시작 노드)
+        node_line, *neighbor_lines = ctx.get('lines') or format_node_lines(ctx)
+        nodes.append(node_line[0])
+        for line, chunk_text in neighbor_lines:
+            if chunk_text is None:
+                triples.append(line)
+            elif chunk_text not in seen_chunks:
+                seen_chunks.add(chunk_text)
+                chunks.append(chunk_text)
+
+    truncated = False
+    if token_budget is not None:
+        used = 0
+        kept = {"nodes": [], "triples": [], "chunks": []}
+        for key, items in (("nodes", nodes), ("triples", triples), ("chunks", chunks)):
+            for item in items:
+                cost = count_tokens(json.dumps(item, ensure_ascii=False))
+                if used + cost > token_budget:
+                    truncated = True
+                    break
+                used += cost
+                kept[key].append(item)
+            if truncated:
+                break
+        nodes, triples, chunks = kept["nodes"], kept["triples"], kept["chunks"]
+
+    return {"nodes": nodes, "triples": triples, "chunks": chunks, "truncated": truncated}
+
+@mcp.tool()
+async def get_graph_context(query_text: str, token_budget: int | None = None, lookup_mode: str = NEO4J_LOOKUP_MODE, hops: int = NEO4J_MAX_HOPS):
+    """
+    Neo4j 그래프 컨텍스트(시작 노드, triple, chunk)를 LLM 생성 없이 구조화하여 반환
+    token_budget: 반환 컨텍스트의 최대 토큰 수 (None이면 제한 없음)
+    hops: 확장 깊이 (예: 환자 → 수술 → 약물은 2)
+    """
+    try:
+        contexts = await collect_contexts(driver, query_text, top_k=2, lookup_mode=lookup_mode, hops=hops)
+        return json.dumps(structure_contexts(contexts, token_budget=token_budget), ensure_ascii=False)
+    except Exception as e:
+        error_msg = f"오류가 발생했습니다: {str(e)}"
+        print(error_msg, file=sys.stderr)
+        return json.dumps({"error": error_msg}, ensure_ascii=False)
+
 @mcp.tool()
-def run_contextual_rag(query_text: str):
+async def run_contextual_rag(query_text: str, lookup_mode: str = NEO4J_LOOKUP_MODE, hops: int = NEO4J_MAX_HOPS):
     """
     Neo4j 데이터베이스에서 컨텍스트를 검색하고 LLM으로 답변을 생성
+    lookup_mode: auto(환자 이름/ID 직접 조회 후 없으면 벡터 검색), exact, vector
+    hops: 확장 깊이 (1이면 기존 1-hop 확장)
     """
     try:
-        context = build_context_from_vector(driver, query_text, top_k=2)
+        context = await build_context(driver, query_text, top_k=2, lookup_mode=lookup_mode, hops=hops)
 
         prompt = f"context: {context}\n\n질문: {query_text}"
-        response = llm.invoke(prompt)
+        response = await llm.ainvoke(prompt)
 
         print(response)
         
@@ -139,5 +820,85 @@ def run_contextual_rag(query_text: str):
         print(error_msg)
         return error_msg
 
+async def invalidate_patient_cache(element_ids: list[str] | None = None, name: str | None = None) -> int:
+    """
+    환자 기록 갱신 시 호출하는 캐시 무효화 훅
+    지정한 노드(elementId 또는 name)와 그 1-hop 이웃의 캐시 항목을 제거
+    (이웃 노드의 캐시에도 갱신된 노드 정보가 포함되어 있으므로 함께 제거)
+    """
+    if subgraph_cache is None:
+        return 0
+    # elementId 조회와 환자 라벨 + name 조회를 나눠 전체 노드 스캔을 피함
+    query = f"""
+    CALL {{
+      UNWIND $element_ids AS element_id
+      MATCH (n) WHERE elementId(n) = element_id
+      RETURN n
+      UNION
+      MATCH (n:`{PATIENT_LABEL}`) WHERE $name IS NOT NULL AND n.name = $name
+      RETURN n
+    }}
+    OPTIONAL MATCH (n)--(m)
+    RETURN elementId(n) AS element_id, collect(DISTINCT elementId(m)) AS neighbor_ids
+    """
+    # 환자 이름/ID가 바뀌었을 수 있으므로 다음 조회 시 환자 사전 재로딩
+    patient_directory.mark_stale()
+    targets = set(element_ids or [])
+    async with pooled_session(driver) as session:
+        result = await session.run(query, element_ids=list(targets), name=name)
+        async for record in result:
+            targets.add(record['element_id'])
+            targets.update(record['neighbor_ids'])
+    return subgraph_cache.invalidate(targets)
+
+@mcp.tool()
+async def invalidate_subgraph_cache(element_ids: list[str] | None = None, name: str | None = None, clear_all: bool = False):
+    """
+    환자/엔티티 기록이 갱신되었을 때 서브그래프 캐시 무효화
+    """
+    if subgraph_cache is None:
+        return {"enabled": False}
+    if clear_all:
+        removed = subgraph_cache.invalidate()
+    else:
+        removed = await invalidate_patient_cache(element_ids=element_ids, name=name)
+    return {"removed": removed}
+
+@mcp.tool()
+async def subgraph_cache_stats():
+    """
+    서브그래프 캐시 적중/미스 통계 조회
+    """
+    return subgraph_cache.get_stats() if subgraph_cache else {"enabled": False}
+
+@mcp.tool()
+async def neo4j_pool_stats():
+    """
+    Neo4j 세션 풀 사용 현황 조회 (피크 동시 사용량, 세션 사용 시간 분포)
+    """
+    return pool_metrics.get_stats()
+
+@mcp.tool()
+async def neo4j_embedding_cache_stats():
+    """
+    쿼리 임베딩 캐시 적중률 및 사용량 조회
+    """
+    return embedder.cache.get_stats() if embedder.cache else {"enabled": False}
+
+def preload_retriever():
+    # 서버 시작 시 준비 작업 (환자 full-text 인덱스를 요청 경로가 아닌 시작 시점에 한 번 생성)
+    ensure_patient_fulltext_index()
+
+
+def create_http_app():
+    """
+    streamable HTTP 앱 생성 (uvicorn 워커마다 호출)
+    """
+    preload_retriever()
+    return mcp.streamable_http_app()
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    if MCP_TRANSPORT == "stdio":
+        preload_retriever()
+    run_mcp_server(mcp, "src.server.neo4j_server:create_http_app", create_http_app, NEO4J_MCP_PORT)
\ No newline at end of file
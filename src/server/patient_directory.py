@@ -0,0 +1,138 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+import threading
+import time
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# 이름 바로 뒤에 붙을 수 있는 조사/호칭 (긴 것부터 제거 시도)
+NAME_SUFFIXES = ("님에게", "에게", "님의", "환자", "님", "씨", "의", "은", "는", "이", "가", "을", "를", "와", "과", "도")
+
+# 숫자로만 된 환자 ID는 바로 앞에 이 표현이 있을 때만 매칭 (예: "환자번호 10", "ID 12")
+ID_CONTEXT_TOKENS = {"id", "환자번호", "등록번호", "번호", "mrn", "no"}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    이름 매칭용 토큰화 (유니코드 NFC, 소문자, 공백/문장부호 기준 분리)
+    """
+
+    return TOKEN_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def normalize_name(text: str) -> str:
+    """
+    이름 매칭용 정규화 (토큰을 공백 없이 이어 붙임)
+    """
+
+    return "".join(tokenize(text))
+
+
+class PatientDirectory:
+    """
+    환자 이름/ID → elementId 사전 (서버 시작 후 최초 조회 시 Neo4j에서 로드)
+    질문을 토큰 단위로 나눠 토큰 경계에서 시작/끝나는 이름만 매칭 (일반 단어 안의 부분 문자열은 무시)
+    숫자로만 된 ID는 '환자번호', 'ID' 등 바로 뒤에 올 때만 매칭 (용량 '10mg' 등 오탐 방지)
+
+    Args:
+        min_key_length (int): 매칭에 사용할 최소 이름 길이 (한 글자 이름의 오탐 방지)
+        refresh_sec (float): 사전 재로딩 주기(초)
+    """
+
+    def __init__(self, min_key_length: int = 2, refresh_sec: float = 600):
+        self.min_key_length = min_key_length
+        self.refresh_sec = refresh_sec
+        self._names: Dict[Tuple[str, ...], List[str]] = {}
+        self._ids: Dict[str, List[str]] = {}
+        self._max_tokens = 0
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.time() - self.loaded_at > self.refresh_sec
+
+    def mark_stale(self):
+        self.loaded_at = None
+
+    def load(self, entries: Iterable[Tuple[str, List[Optional[str]]]]):
+        """
+        entries: (elementId, [이름, 환자 ID, ...]) 목록
+        """
+
+        names: Dict[Tuple[str, ...], List[str]] = {}
+        ids: Dict[str, List[str]] = {}
+        for element_id, keys in entries:
+            for key in keys:
+                if key is None:
+                    continue
+                tokens = tuple(tokenize(str(key)))
+                if not tokens:
+                    continue
+                if all(token.isdigit() for token in tokens):
+                    target, normalized = ids, "".join(tokens)
+                elif len("".join(tokens)) >= self.min_key_length:
+                    target, normalized = names, tokens
+                else:
+                    continue
+                target.setdefault(normalized, [])
+                if element_id not in target[normalized]:
+                    target[normalized].append(element_id)
+        with self._lock:
+            self._names = names
+            self._ids = ids
+            self._max_tokens = max((len(k) for k in names), default=0)
+            self.loaded_at = time.time()
+
+    @staticmethod
+    def _candidates(window: List[str]) -> List[Tuple[str, ...]]:
+        # 마지막 토큰에 붙은 조사/호칭을 뗀 형태도 후보로 사용 (예: '김민수의' → '김민수')
+        candidates = [tuple(window)]
+        last = window[-1]
+        for suffix in NAME_SUFFIXES:
+            if last.endswith(suffix) and len(last) > len(suffix):
+                candidates.append(tuple(window[:-1]) + (last[:-len(suffix)],))
+        return candidates
+
+    def match(self, text: str) -> Tuple[List[str], bool]:
+        """
+        질문에 포함된 환자 이름/ID의 (elementId 목록, 모호 여부) 반환
+        같은 이름/ID가 여러 환자에 해당하면 모호한 것으로 표시 (호출 측에서 벡터 검색으로 대체)
+        """
+
+        tokens = tokenize(text)
+        with self._lock:
+            names, ids, max_tokens = self._names, self._ids, self._max_tokens
+
+        found: List[str] = []
+        ambiguous = False
+        i = 0
+        while i < len(tokens):
+            matched = None
+            if tokens[i].isdigit():
+                previous = tokens[i - 1] if i > 0 else ""
+                if previous in ID_CONTEXT_TOKENS or previous.endswith("번호"):
+                    matched = (1, ids.get(tokens[i]))
+            else:
+                # 여러 토큰으로 된 이름(예: 'Kim Min Su')은 긴 것부터 확인
+                for length in range(min(max_tokens, len(tokens) - i), 0, -1):
+                    for candidate in self._candidates(tokens[i:i + length]):
+                        element_ids = names.get(candidate)
+                        if element_ids:
+                            matched = (length, element_ids)
+                            break
+                    if matched:
+                        break
+
+            if matched and matched[1]:
+                length, element_ids = matched
+                if len(element_ids) > 1:
+                    ambiguous = True
+                found.extend(e for e in element_ids if e not in found)
+                i += length
+            else:
+                i += 1
+        return found, ambiguous
+
+    def __len__(self) -> int:
+        return len(self._names) + len(self._ids)
@@ -1,72 +1,324 @@
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import CrossEncoderReranker
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
 from mcp.server.fastmcp import FastMCP
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone
+from src.server.rerank_batcher import RerankBatcher
+from src.server.reranker import load_reranker_model
+from src.server.local_vectorstore import LocalVectorStore
+from src.server.embedding_cache import CachedEmbeddings, get_shared_embedding_cache
+from src.server.local_embeddings import HashingEmbeddings, check_embedding_backend
+from src.server.transport import MCP_HOST, MCP_STATELESS_HTTP, MCP_TRANSPORT, run_mcp_server
 import os
+import sys
+import json
+import asyncio
+import time
+import threading
+import statistics
 
 # 환경변수 설정
 load_dotenv()
 
-openai_api_key = os.environ["OPENAI_API_KEY"]
-pinecone_api_key = os.environ["PINECONE_API_KEY"]
-pinecone_index_name = os.environ['pinecone_index_name']
+openai_api_key = os.getenv("OPENAI_API_KEY")
+pinecone_api_key = os.getenv("PINECONE_API_KEY")
+pinecone_index_name = os.getenv('pinecone_index_name')
+
+# 임베딩 백엔드 설정 (openai: ada-002, hashing: 오프라인 부하 테스트용 로컬 해싱 임베딩)
+PINECONE_EMBEDDING_BACKEND = check_embedding_backend(os.getenv("PINECONE_EMBEDDING_BACKEND", "openai"))
+PINECONE_EMBEDDING_DIMENSIONS = 1536
+
+# HTTP 모드 포트 (Neo4j 서버와 겹치지 않도록 분리)
+PINECONE_MCP_PORT = int(os.getenv("PINECONE_MCP_PORT", "8005"))
+
+# 벡터스토어 백엔드 설정 (pinecone: 원격 Pinecone, local: 로컬 mmap + IVF 인덱스)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "local_index")
+LOCAL_VECTOR_STORE_NPROBE = int(os.getenv("LOCAL_VECTOR_STORE_NPROBE", "8"))
+
+# 서버 시작 시 더미 쿼리로 한 번 추론해 임베딩/리랭커를 미리 데워둘지 여부
+RETRIEVER_WARMUP = os.getenv("RETRIEVER_WARMUP", "true").lower() == "true"
+RETRIEVER_WARMUP_QUERY = os.getenv("RETRIEVER_WARMUP_QUERY", "pediatric anesthesia")
+
+# 리랭커 마이크로 배치 설정 (대기 윈도우 동안 동시 요청의 (query, passage) 쌍을 모아 한 번에 추론)
+RERANK_MAX_BATCH_PAIRS = int(os.getenv("RERANK_MAX_BATCH_PAIRS", "64"))
+RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", "10"))
+
+# 리랭커 백엔드 설정 (torch: fp32 PyTorch, onnx-int8: int8 양자화 ONNX Runtime)
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch")
+RERANKER_ONNX_DIR = os.getenv("RERANKER_ONNX_DIR", "models/medcpt-onnx")
+RERANKER_NUM_THREADS = int(os.getenv("RERANKER_NUM_THREADS", "0"))
 
 # 리트리버 생성 함수
 def create_retriever():
     # 임베딩 모델
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-ada-002",
-        api_key=openai_api_key
-    )
+    if PINECONE_EMBEDDING_BACKEND == "hashing":
+        # ada-002와 같은 차원의 로컬 임베딩 (local_embeddings.py로 다시 인덱싱한 로컬 인덱스와 함께 사용)
+        embeddings = HashingEmbeddings(dimensions=PINECONE_EMBEDDING_DIMENSIONS)
+    else:
+        embeddings = OpenAIEmbeddings(
+            model="text-embedding-ada-002",
+            api_key=openai_api_key
+        )
+        # 동일 쿼리 재임베딩 방지용 캐시 (Neo4j 서버와 디스크 캐시 공유)
+        embedding_cache = get_shared_embedding_cache()
+        if embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, model="text-embedding-ada-002", cache=embedding_cache)
 
-    # Pinecone 클라이언트 및 인덱스 로드
-    pc = Pinecone(api_key=pinecone_api_key)
-    index = pc.Index(pinecone_index_name)
+    if VECTOR_STORE_BACKEND == "local":
+        # 로컬 스냅샷 인덱스 로드 (src/server/local_vectorstore.py로 Pinecone에서 export)
+        vectorstore = LocalVectorStore(
+            index_dir=LOCAL_VECTOR_STORE_DIR,
+            embedding=embeddings,
+            nprobe=LOCAL_VECTOR_STORE_NPROBE
+        )
+    else:
+        # Pinecone 클라이언트 및 인덱스 로드
+        pc = Pinecone(api_key=pinecone_api_key)
+        index = pc.Index(pinecone_index_name)
 
-    # LangChain VectorStore로 래핑
-    vectorstore = PineconeVectorStore(
-        index=index,
-        embedding=embeddings,
-        text_key="page_content"
-    )
+        # LangChain VectorStore로 래핑
+        vectorstore = PineconeVectorStore(
+            index=index,
+            embedding=embeddings,
+            text_key="page_content"
+        )
 
-    # CrossEncoder reranker 설정
-    reranker_model = HuggingFaceCrossEncoder(model_name="ncbi/MedCPT-Cross-Encoder")
-    compressor_retriever = CrossEncoderReranker(
+    # CrossEncoder reranker 설정 (동시 요청을 묶어서 처리하는 배치 스케줄러로 감싸기)
+    reranker_model = load_reranker_model(
+        backend=RERANKER_BACKEND,
+        model_name="ncbi/MedCPT-Cross-Encoder",
+        onnx_dir=RERANKER_ONNX_DIR,
+        num_threads=RERANKER_NUM_THREADS
+    )
+    reranker = RerankBatcher(
         model=reranker_model,
-        top_n=3
+        max_batch_pairs=RERANK_MAX_BATCH_PAIRS,
+        max_wait_ms=RERANK_MAX_WAIT_MS
     )
-    # 기본 검색기 → 압축된 Retriever로 감싸기
-    base_retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
-    retriever = ContextualCompressionRetriever(
-        base_retriever=base_retriever,
-        base_compressor=compressor_retriever
+    # 기본 검색기 → 리랭킹 Retriever로 감싸기
+    retriever = RerankingRetriever(
+        vectorstore=vectorstore,
+        reranker=reranker,
+        k=10,
+        top_n=3
     )
 
     return retriever
 
+
+class RerankingRetriever:
+    """
+    기본 검색기(k=10) 결과를 RerankBatcher로 재정렬하여 상위 top_n 문서를 반환하는 검색기
+    """
+
+    def __init__(self, vectorstore, reranker: RerankBatcher, k: int = 10, top_n: int = 3):
+        self.vectorstore = vectorstore
+        self.base_retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+        self.reranker = reranker
+        self.k = k
+        self.top_n = top_n
+
+    async def ainvoke(self, query: str):
+        docs = await self.base_retriever.ainvoke(query)
+        return await self.reranker.rerank(query, docs, top_n=self.top_n)
+
+    async def abatch_invoke(self, queries: list[str]):
+        """
+        여러 쿼리를 한 번에 검색
+        1) 임베딩 한 번의 배치 요청 2) 벡터 검색 동시 실행 3) 전체 후보를 한 번의 리랭커 배치로 재정렬
+        벡터 검색은 Pinecone/로컬 백엔드가 모두 제공하는 asimilarity_search_by_vector_with_score 사용 (점수는 버림)
+        """
+
+        if not queries:
+            return []
+        vectors = await self.vectorstore.embeddings.aembed_documents(queries)
+        results = await asyncio.gather(*[
+            self.vectorstore.asimilarity_search_by_vector_with_score(vector, k=self.k)
+            for vector in vectors
+        ])
+        candidates = [[doc for doc, _ in docs_and_scores] for docs_and_scores in results]
+        return await self.reranker.rerank_many(
+            [(query, docs) for query, docs in zip(queries, candidates)],
+            top_n=self.top_n
+        )
+
+    def invoke(self, query: str):
+        docs = self.base_retriever.invoke(query)
+        return self.reranker.rerank_sync(query, docs, top_n=self.top_n)
+
+
+class RetrieverManager:
+    """
+    프로세스 수명 동안 하나의 리트리버를 유지하는 관리자
+    임베딩 클라이언트, Pinecone 인덱스 핸들, CrossEncoder 모델을 최초 1회만 로드하고
+    동시에 들어오는 tool 호출이 같은 인스턴스를 공유하도록 함
+    """
+
+    def __init__(self, max_latency_samples: int = 1000):
+        self._retriever = None
+        self._lock = threading.Lock()
+        self.load_time = None
+        self.warmup_time = None
+        self.call_count = 0
+        self.max_latency_samples = max_latency_samples
+        self._latencies = []
+
+    def get(self):
+        """
+        리트리버 반환(아직 없으면 생성), 생성은 lock으로 한 번만 수행
+        """
+
+        if self._retriever is None:
+            with self._lock:
+                if self._retriever is None:
+                    start = time.time()
+                    retriever = create_retriever()
+                    self.load_time = time.time() - start
+                    print(f"리트리버 로드 완료 - 시간: {self.load_time:.2f}초", file=sys.stderr)
+                    self._retriever = retriever
+        return self._retriever
+
+    def warmup(self, query: str = RETRIEVER_WARMUP_QUERY):
+        """
+        더미 쿼리로 한 번 추론하여 첫 요청의 지연을 제거
+        """
+
+        retriever = self.get()
+        start = time.time()
+        retriever.invoke(query)
+        self.warmup_time = time.time() - start
+        print(f"리트리버 워밍업 완료 - 시간: {self.warmup_time:.2f}초", file=sys.stderr)
+
+    def record_latency(self, latency: float):
+        with self._lock:
+            self.call_count += 1
+            self._latencies.append(latency)
+            if len(self._latencies) > self.max_latency_samples:
+                self._latencies = self._latencies[-self.max_latency_samples:]
+
+    def get_stats(self) -> dict:
+        """
+        로드 시간 및 호출별 지연 통계 반환
+        """
+
+        with self._lock:
+            latencies = sorted(self._latencies)
+        stats = {
+            "loaded": self._retriever is not None,
+            "vector_store_backend": VECTOR_STORE_BACKEND,
+            "reranker_backend": RERANKER_BACKEND,
+            "load_time_sec": self.load_time,
+            "warmup_time_sec": self.warmup_time,
+            "call_count": self.call_count,
+        }
+        if latencies:
+            stats.update({
+                "latency_mean_sec": statistics.mean(latencies),
+                "latency_p50_sec": latencies[len(latencies) // 2],
+                "latency_p95_sec": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "latency_max_sec": latencies[-1],
+            })
+        return stats
+
+
+retriever_manager = RetrieverManager()
+
 # MCP 서버 정의
 mcp = FastMCP(
     "VectorDB_Retriever",
     instructions="A Retriever that can retrieve information from the Pinecone VectorDB.",
-    host="0.0.0.0",
-    port=8005
+    host=MCP_HOST,
+    port=PINECONE_MCP_PORT,
+    stateless_http=MCP_STATELESS_HTTP,
 )
 
+def serialize_documents(docs) -> list[dict]:
+    """
+    검색 문서를 {id, score, text, source} 형태의 간결한 구조로 변환
+    """
+
+    results = []
+    for doc in docs:
+        metadata = dict(doc.metadata or {})
+        score = metadata.pop("relevance_score", None)
+        doc_id = getattr(doc, "id", None) or metadata.pop("id", None)
+        metadata.pop("id", None)
+        results.append({
+            "id": doc_id,
+            "score": round(float(score), 4) if score is not None else None,
+            "text": doc.page_content,
+            "source": metadata,
+        })
+    return results
+
 # MCP tool 함수 정의
 @mcp.tool()
 async def VectorDB_retriever(query: str):
-    retriever = create_retriever()
-    retrieved_docs = retriever.invoke(query)
-    return "\n".join([doc.page_content for doc in retrieved_docs])
+    retriever = retriever_manager.get()
+    start = time.time()
+    retrieved_docs = await retriever.ainvoke(query)
+    retriever_manager.record_latency(time.time() - start)
+    return json.dumps(serialize_documents(retrieved_docs), ensure_ascii=False)
+
+@mcp.tool()
+async def VectorDB_retriever_batch(queries: list[str]):
+    """
+    여러 쿼리(예: 쿼리 재작성 변형들)를 한 번의 호출로 검색하여 쿼리별 결과 반환
+    """
+    retriever = retriever_manager.get()
+    start = time.time()
+    results = await retriever.abatch_invoke(queries)
+    retriever_manager.record_latency(time.time() - start)
+    return json.dumps([
+        {"query": query, "documents": serialize_documents(docs)}
+        for query, docs in zip(queries, results)
+    ], ensure_ascii=False)
+
+@mcp.tool()
+async def VectorDB_retriever_stats():
+    """
+    리트리버 로드 시간 및 호출 지연 통계 조회
+    """
+    return retriever_manager.get_stats()
+
+@mcp.tool()
+async def VectorDB_reranker_stats():
+    """
+    리랭커 배치 크기 및 큐 대기 시간 히스토그램 조회
+    """
+    return retriever_manager.get().reranker.get_stats()
+
+@mcp.tool()
+async def VectorDB_embedding_cache_stats():
+    """
+    쿼리 임베딩 캐시 적중률 및 사용량 조회
+    """
+    embedding_cache = get_shared_embedding_cache()
+    return embedding_cache.get_stats() if embedding_cache else {"enabled": False}
+
+def preload_retriever():
+    # 서버 시작 시점에 리트리버를 미리 로드 (첫 tool 호출의 콜드 스타트 제거)
+    # 로드/워밍업이 실패해도 서버는 띄우고, 첫 tool 호출 때 다시 지연 로드
+    try:
+        retriever_manager.get()
+        if RETRIEVER_WARMUP:
+            retriever_manager.warmup()
+    except Exception as e:
+        print(f"리트리버 사전 로드 실패, 첫 호출 시 다시 로드합니다: {e}", file=sys.stderr)
+
+
+def create_http_app():
+    """
+    streamable HTTP 앱 생성 (uvicorn 워커마다 호출되어 워커별 리트리버를 미리 로드)
+    """
+    preload_retriever()
+    return mcp.streamable_http_app()
 
 # 실행
 if __name__ == "__main__":
-    print("MCP server is running on port 8005...")
-    mcp.run(transport="stdio")
-
+    if MCP_TRANSPORT == "stdio":
+        preload_retriever()
+        print("VectorDB MCP server is running on stdio...", file=sys.stderr)
+    run_mcp_server(mcp, "src.server.pinecone_server:create_http_app", create_http_app, PINECONE_MCP_PORT)
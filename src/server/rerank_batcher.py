@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+from src.server.metrics import Histogram
+import asyncio
+import time
+
+
+@dataclass
+class _RerankRequest:
+    query: str
+    documents: List[Any]
+    top_n: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class RerankBatcher:
+    """
+    동시에 들어온 rerank 요청들의 (query, passage) 쌍을 모아 한 번의 CrossEncoder 호출로 처리하는 스케줄러
+
+    Args:
+        model: score(text_pairs) 메서드를 가진 CrossEncoder (예: HuggingFaceCrossEncoder)
+        max_batch_pairs (int): 한 배치에 담을 최대 (query, passage) 쌍 수
+        max_wait_ms (float): 첫 요청 도착 후 다른 요청을 기다리는 최대 시간(ms)
+    """
+
+    def __init__(self, model: Any, max_batch_pairs: int = 64, max_wait_ms: float = 10.0):
+        self.model = model
+        self.max_batch_pairs = max_batch_pairs
+        self.max_wait_ms = max_wait_ms
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+
+        self.batch_pairs_histogram = Histogram([1, 10, 20, 40, 80, 160, 320])
+        self.batch_requests_histogram = Histogram([1, 2, 4, 8, 16, 32])
+        self.queue_wait_ms_histogram = Histogram([1, 5, 10, 25, 50, 100, 250, 1000])
+        self.inference_ms_histogram = Histogram([10, 25, 50, 100, 250, 500, 1000, 2500])
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def rerank(self, query: str, documents: List[Any], top_n: int = 3) -> List[Any]:
+        """
+        문서 리스트를 query 기준으로 재정렬하여 상위 top_n개 반환
+        (다른 동시 요청과 함께 배치 처리됨)
+        """
+
+        if not documents:
+            return []
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put(_RerankRequest(query, documents, top_n, future))
+        return await future
+
+    async def rerank_many(self, requests: List[Tuple[str, List[Any]]], top_n: int = 3) -> List[List[Any]]:
+        """
+        여러 (query, documents) 요청을 한꺼번에 큐에 넣어 같은 배치로 재정렬
+        """
+
+        self._ensure_worker()
+        futures = []
+        for query, documents in requests:
+            future = self._loop.create_future()
+            if documents:
+                self._queue.put_nowait(_RerankRequest(query, documents, top_n, future))
+            else:
+                future.set_result([])
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    def rerank_sync(self, query: str, documents: List[Any], top_n: int = 3) -> List[Any]:
+        """
+        배치 없이 바로 재정렬 (워밍업 등 이벤트 루프 밖에서 사용)
+        """
+
+        if not documents:
+            return []
+        scores = self.model.score([(query, doc.page_content) for doc in documents])
+        return self._top_n(documents, scores, top_n)
+
+    @staticmethod
+    def _top_n(documents: List[Any], scores: List[float], top_n: int) -> List[Any]:
+        ranked = sorted(zip(documents, scores), key=lambda x: x[1], reverse=True)
+        results = []
+        for doc, score in ranked[:top_n]:
+            doc.metadata["relevance_score"] = float(score)
+            results.append(doc)
+        return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            num_pairs = len(first.documents)
+            deadline = loop.time() + self.max_wait_ms / 1000
+
+            # 대기 시간 또는 최대 쌍 수에 도달할 때까지 요청 수집
+            while num_pairs < self.max_batch_pairs:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(request)
+                num_pairs += len(request.documents)
+
+            await self._process(batch)
+
+    async def _process(self, batch: List[_RerankRequest]):
+        started = time.perf_counter()
+        pairs = []
+        for request in batch:
+            self.queue_wait_ms_histogram.observe((started - request.enqueued_at) * 1000)
+            pairs.extend((request.query, doc.page_content) for doc in request.documents)
+        self.batch_pairs_histogram.observe(len(pairs))
+        self.batch_requests_histogram.observe(len(batch))
+
+        try:
+            # CPU 추론은 이벤트 루프를 막지 않도록 별도 스레드에서 실행
+            scores = await asyncio.to_thread(self.model.score, pairs)
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        self.inference_ms_histogram.observe((time.perf_counter() - started) * 1000)
+
+        offset = 0
+        for request in batch:
+            n = len(request.documents)
+            request_scores = scores[offset:offset + n]
+            offset += n
+            if not request.future.done():
+                request.future.set_result(self._top_n(request.documents, request_scores, request.top_n))
+
+    def get_stats(self) -> dict:
+        """
+        배치 크기 / 대기 시간 히스토그램 반환
+        """
+
+        return {
+            "max_batch_pairs": self.max_batch_pairs,
+            "max_wait_ms": self.max_wait_ms,
+            "pending_requests": self._queue.qsize() if self._queue else 0,
+            "batch_pairs": self.batch_pairs_histogram.snapshot(),
+            "batch_requests": self.batch_requests_histogram.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms_histogram.snapshot(),
+            "inference_ms": self.inference_ms_histogram.snapshot(),
+        }
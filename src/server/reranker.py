@@ -0,0 +1,208 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import argparse
+import json
+import math
+import os
+import time
+
+MEDCPT_MODEL_NAME = "ncbi/MedCPT-Cross-Encoder"
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+
+
+class OnnxCrossEncoder:
+    """
+    ONNX Runtime 기반 CrossEncoder (HuggingFaceCrossEncoder와 같은 score 인터페이스 제공)
+    export_onnx_int8로 생성한 디렉토리(토크나이저 + int8 양자화 모델)를 로드
+
+    Args:
+        model_dir (str): 토크나이저와 ONNX 모델이 저장된 디렉토리
+        model_file (str): 로드할 ONNX 파일 이름. 기본값은 int8 양자화 모델
+        max_length (int): 토큰 최대 길이
+        num_threads (int): ONNX Runtime intra-op 스레드 수 (0이면 런타임 기본값)
+    """
+
+    def __init__(self, model_dir: str, model_file: str = ONNX_INT8_FILE, max_length: int = 512, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError(
+                """onnxruntime 또는 transformers를 import할 수 없습니다.
+                `pip install onnxruntime transformers`로 설치해주세요."""
+            )
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX 리랭커 모델을 찾을 수 없습니다: {model_path}\n"
+                f"`python -m src.server.reranker export --output-dir {model_dir}`로 먼저 생성해주세요."
+            )
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = max_length
+
+    def score(self, text_pairs: List[Tuple[str, str]]) -> List[float]:
+        if not text_pairs:
+            return []
+        queries = [q for q, _ in text_pairs]
+        passages = [p for _, p in text_pairs]
+        # 배치 내 최장 길이에 맞춰 padding
+        encoded = self.tokenizer(
+            queries,
+            passages,
+            padding=True,
+            truncation="longest_first",
+            max_length=self.max_length,
+            return_tensors="np",
+        )
+        feeds = {k: v.astype("int64") for k, v in encoded.items() if k in self.input_names}
+        logits = self.session.run(None, feeds)[0]
+        # sentence-transformers CrossEncoder(num_labels=1)와 동일하게 sigmoid 적용
+        return [1.0 / (1.0 + math.exp(-float(row[0]))) for row in logits]
+
+
+def load_reranker_model(backend: str = "torch", model_name: str = MEDCPT_MODEL_NAME, onnx_dir: str = "", num_threads: int = 0) -> Any:
+    """
+    설정값에 따라 리랭커 백엔드 로드
+      - torch: HuggingFaceCrossEncoder (fp32 PyTorch)
+      - onnx-int8: int8 양자화된 ONNX Runtime 모델
+    """
+
+    if backend == "torch":
+        from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+        return HuggingFaceCrossEncoder(model_name=model_name)
+    if backend == "onnx-int8":
+        return OnnxCrossEncoder(onnx_dir, model_file=ONNX_INT8_FILE, num_threads=num_threads)
+    raise ValueError(f"지원하지 않는 리랭커 백엔드입니다: {backend} (torch, onnx-int8 중 선택)")
+
+
+def export_onnx_int8(output_dir: str, model_name: str = MEDCPT_MODEL_NAME, opset: int = 17) -> str:
+    """
+    HuggingFace CrossEncoder를 ONNX로 export한 뒤 int8 dynamic quantization 적용
+    """
+
+    try:
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    except ImportError:
+        raise ImportError(
+            """ONNX export에 필요한 패키지를 import할 수 없습니다.
+            `pip install torch onnxruntime transformers`로 설치해주세요."""
+        )
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["query"], ["passage"], return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    fp32_path = os.path.join(output_dir, ONNX_FP32_FILE)
+    int8_path = os.path.join(output_dir, ONNX_INT8_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+
+    print(f"ONNX int8 리랭커 저장 완료: {int8_path}")
+    return int8_path
+
+
+def check_ranking_parity(reference_model: Any, candidate_model: Any, samples: List[Dict], top_n: int = 3) -> Dict:
+    """
+    기준(fp32) 모델과 후보 모델의 재정렬 결과 비교
+    samples: [{"query": str, "passages": [str, ...]}, ...]
+
+    Returns:
+        dict: 상위 top_n 집합 일치율, 순서까지 완전 일치율, 평균 top_n overlap, 평균 추론 시간
+    """
+
+    exact_match, set_match, overlaps = 0, 0, []
+    reference_time, candidate_time = 0.0, 0.0
+    mismatches = []
+
+    for sample in samples:
+        pairs = [(sample["query"], p) for p in sample["passages"]]
+
+        start = time.time()
+        reference_scores = reference_model.score(pairs)
+        reference_time += time.time() - start
+
+        start = time.time()
+        candidate_scores = candidate_model.score(pairs)
+        candidate_time += time.time() - start
+
+        reference_top = sorted(range(len(pairs)), key=lambda i: reference_scores[i], reverse=True)[:top_n]
+        candidate_top = sorted(range(len(pairs)), key=lambda i: candidate_scores[i], reverse=True)[:top_n]
+
+        overlaps.append(len(set(reference_top) & set(candidate_top)) / max(len(reference_top), 1))
+        if reference_top == candidate_top:
+            exact_match += 1
+        if set(reference_top) == set(candidate_top):
+            set_match += 1
+        else:
+            mismatches.append({"query": sample["query"], "reference": reference_top, "candidate": candidate_top})
+
+    n = max(len(samples), 1)
+    return {
+        "samples": len(samples),
+        "top_n": top_n,
+        "top_n_set_match_rate": set_match / n,
+        "top_n_exact_order_rate": exact_match / n,
+        "mean_top_n_overlap": sum(overlaps) / n,
+        "reference_mean_sec": reference_time / n,
+        "candidate_mean_sec": candidate_time / n,
+        "mismatches": mismatches,
+    }
+
+
+def _load_samples(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MedCPT 리랭커 ONNX int8 export 및 fp32 대비 랭킹 일치 검사")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="ONNX int8 모델 생성")
+    export_parser.add_argument("--output-dir", default=os.getenv("RERANKER_ONNX_DIR", "models/medcpt-onnx"))
+    export_parser.add_argument("--model-name", default=MEDCPT_MODEL_NAME)
+
+    parity_parser = subparsers.add_parser("parity", help="fp32 모델과 int8 모델의 랭킹 비교")
+    parity_parser.add_argument("--samples", required=True, help='JSONL 파일 ({"query": ..., "passages": [...]} 형식)')
+    parity_parser.add_argument("--onnx-dir", default=os.getenv("RERANKER_ONNX_DIR", "models/medcpt-onnx"))
+    parity_parser.add_argument("--top-n", type=int, default=3)
+    parity_parser.add_argument("--min-set-match", type=float, default=0.95, help="통과 기준 top_n 집합 일치율")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_onnx_int8(args.output_dir, model_name=args.model_name)
+    else:
+        report = check_ranking_parity(
+            load_reranker_model("torch"),
+            load_reranker_model("onnx-int8", onnx_dir=args.onnx_dir),
+            _load_samples(args.samples),
+            top_n=args.top_n,
+        )
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        if report["top_n_set_match_rate"] < args.min_set_match:
+            raise SystemExit(f"랭킹 일치율 미달: {report['top_n_set_match_rate']:.3f} < {args.min_set_match}")
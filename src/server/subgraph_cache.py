@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+import numpy as np
+import os
+import threading
+import time
+
+SUBGRAPH_CACHE_ENABLED = os.getenv("SUBGRAPH_CACHE_ENABLED", "true").lower() == "true"
+SUBGRAPH_CACHE_MAX_ITEMS = int(os.getenv("SUBGRAPH_CACHE_MAX_ITEMS", "2000"))
+SUBGRAPH_CACHE_TTL_SEC = float(os.getenv("SUBGRAPH_CACHE_TTL_SEC", "600"))
+
+
+def normalize_vector(vector: Optional[List[float]]) -> Optional[np.ndarray]:
+    """
+    이웃 임베딩을 L2 정규화된 float32 배열로 변환 (캐시 저장용, 없으면 None)
+    """
+
+    if not vector:
+        return None
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+def rank_neighbors(
+    neighbors: List[Dict[str, Any]],
+    query_vector: List[float],
+    max_per_relation: int,
+    max_per_label: int,
+    max_neighbors: int,
+    relation_fanout: Optional[Dict[str, int]] = None,
+    label_fanout: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    캐시에 저장된(쿼리와 무관한) 이웃 목록에 쿼리별 유사도 순위와 fan-out 제한 적용
+    neo4j_server.EXPANSION_SUBQUERY와 같은 규칙 (관계별 → 라벨별 → 전체 개수 제한),
+    유사도는 vector.similarity.cosine과 같은 (1 + cos) / 2, 임베딩이 없거나 차원이 다르면 0
+    각 이웃의 'vector'는 normalize_vector 결과 (반환 항목에서는 제외)
+    """
+
+    relation_fanout = relation_fanout or {}
+    label_fanout = label_fanout or {}
+    query = normalize_vector(query_vector)
+
+    scored = []
+    for neighbor in neighbors:
+        vector = neighbor.get('vector')
+        similarity = 0.0
+        if query is not None and vector is not None and len(vector) == len(query):
+            similarity = (1.0 + float(vector @ query)) / 2.0
+        item = {k: v for k, v in neighbor.items() if k != 'vector'}
+        item['similarity'] = similarity
+        scored.append(item)
+
+    def limit(items, group_key, fanout, default):
+        items = sorted(items, key=lambda n: n['similarity'], reverse=True)
+        counts = {}
+        kept = []
+        for item in items:
+            group = item.get(group_key)
+            counts[group] = counts.get(group, 0) + 1
+            if counts[group] <= fanout.get(group, default):
+                kept.append(item)
+        return kept
+
+    kept = limit(scored, 'relation', relation_fanout, max_per_relation)
+    kept = limit(kept, 'label_key', label_fanout, max_per_label)
+
+    results = []
+    seen = set()
+    for item in sorted(kept, key=lambda n: n['similarity'], reverse=True):
+        key = (item.get('neighbor_name'), item.get('text'), tuple(item.get('neighbor_labels') or ()), item.get('relation'), item.get('direction'))
+        if key not in seen:
+            seen.add(key)
+            results.append(item)
+    return results[:max_neighbors]
+
+
+class SubgraphCache:
+    """
+    Neo4j 시작 노드별 이웃 확장 결과 캐시 (TTL + LRU)
+    키는 (시작 노드 elementId, hop 수, 확장 제한 파라미터)이고 값은 쿼리와 무관한 이웃 목록이므로
+    다른 질문에서 같은 노드가 검색되어도 재사용 (쿼리별 유사도 순위/fan-out은 rank_neighbors로 조회 시 적용)
+    각 항목은 포함된 노드 elementId를 함께 저장하여 invalidate 시 해당 노드가 포함된 항목을 모두 제거
+    환자 기록이 갱신되면 invalidate로 해당 노드(및 이웃) 항목을 제거해야 함
+
+    Args:
+        max_items (int): 최대 항목 수, 초과 시 가장 오래 사용하지 않은 항목부터 제거
+        ttl_sec (float): 항목 유효 시간(초)
+    """
+
+    def __init__(self, max_items: int = SUBGRAPH_CACHE_MAX_ITEMS, ttl_sec: float = SUBGRAPH_CACHE_TTL_SEC):
+        self.max_items = max_items
+        self.ttl_sec = ttl_sec
+        self._items: "OrderedDict[Hashable, tuple[float, Any, frozenset]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def keys(self) -> List[Hashable]:
+        """
+        만료되지 않은 항목의 키 목록 (적중/미스 집계에는 포함하지 않음)
+        """
+
+        now = time.time()
+        with self._lock:
+            return [key for key, (stored_at, _, _) in self._items.items() if now - stored_at <= self.ttl_sec]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            stored_at, value, _ = item
+            if time.time() - stored_at > self.ttl_sec:
+                del self._items[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, element_ids: Iterable[str]):
+        """
+        element_ids: 항목에 포함된 시작 노드 elementId (invalidate 기준)
+        """
+
+        with self._lock:
+            self._items[key] = (time.time(), value, frozenset(element_ids))
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, element_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        지정한 elementId가 포함된 항목 제거 (None이면 전체 제거), 제거된 항목 수 반환
+        """
+
+        with self._lock:
+            if element_ids is None:
+                removed = len(self._items)
+                self._items.clear()
+            else:
+                targets = set(element_ids)
+                stale = [key for key, (_, _, ids) in self._items.items() if not ids.isdisjoint(targets)]
+                for key in stale:
+                    del self._items[key]
+                removed = len(stale)
+            self.invalidations += removed
+            return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
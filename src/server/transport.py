@@ -0,0 +1,52 @@
+from typing import Callable
+import os
+import sys
+
+# MCP 서버 실행 방식 (stdio: 클라이언트가 프로세스를 직접 실행, streamable-http: 별도 포트의 상시 HTTP 서비스)
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+MCP_HOST = os.getenv("MCP_HOST", "0.0.0.0")
+
+# HTTP 모드 uvicorn 설정 (workers: 프로세스 수, limit_concurrency: 프로세스당 동시 요청 상한, 0이면 제한 없음)
+MCP_HTTP_WORKERS = int(os.getenv("MCP_HTTP_WORKERS", "1"))
+MCP_HTTP_LIMIT_CONCURRENCY = int(os.getenv("MCP_HTTP_LIMIT_CONCURRENCY", "0"))
+MCP_HTTP_TIMEOUT_KEEP_ALIVE = int(os.getenv("MCP_HTTP_TIMEOUT_KEEP_ALIVE", "30"))
+
+# 워커가 여러 개면 요청이 어느 워커로 갈지 모르므로 세션 상태를 두지 않는 stateless 모드 사용
+MCP_STATELESS_HTTP = os.getenv("MCP_STATELESS_HTTP", str(MCP_HTTP_WORKERS > 1)).lower() == "true"
+
+MCP_TRANSPORTS = ("stdio", "streamable-http")
+
+
+def run_mcp_server(mcp, app_factory: str, create_app: Callable, port: int):
+    """
+    MCP_TRANSPORT에 맞춰 서버 실행
+
+    Args:
+        mcp: FastMCP 인스턴스
+        app_factory (str): 워커 프로세스가 import할 앱 생성 함수 경로 (예: "src.server.pinecone_server:create_http_app")
+        create_app (Callable): 단일 프로세스 실행 시 사용할 앱 생성 함수
+        port (int): HTTP 포트
+    """
+
+    if MCP_TRANSPORT not in MCP_TRANSPORTS:
+        raise ValueError(f"지원하지 않는 MCP_TRANSPORT입니다: {MCP_TRANSPORT} (사용 가능: {', '.join(MCP_TRANSPORTS)})")
+
+    if MCP_TRANSPORT == "stdio":
+        mcp.run(transport="stdio")
+        return
+
+    import uvicorn
+
+    options = dict(
+        host=MCP_HOST,
+        port=port,
+        limit_concurrency=MCP_HTTP_LIMIT_CONCURRENCY or None,
+        timeout_keep_alive=MCP_HTTP_TIMEOUT_KEEP_ALIVE,
+    )
+    print(f"{mcp.name} MCP server is running on http://{MCP_HOST}:{port}{mcp.settings.streamable_http_path} "
+          f"(workers={MCP_HTTP_WORKERS}, stateless={MCP_STATELESS_HTTP})", file=sys.stderr)
+    if MCP_HTTP_WORKERS > 1:
+        # 워커마다 모듈을 새로 import하여 앱 생성 (모델/커넥션 풀은 워커별로 로드됨)
+        uvicorn.run(app_factory, factory=True, workers=MCP_HTTP_WORKERS, **options)
+    else:
+        uvicorn.run(create_app(), **options)
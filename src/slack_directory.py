@@ -0,0 +1,218 @@
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+import asyncio
+import bisect
+import difflib
+import json
+import os
+import sys
+import threading
+import time
+import unicodedata
+
+load_dotenv()
+
+# 슬랙 사용자 목록 캐시 설정 (TTL: 이 시간이 지나면 조회 전에 다시 로드, REFRESH: 백그라운드 갱신 주기)
+SLACK_DIRECTORY_TTL_SEC = float(os.getenv("SLACK_DIRECTORY_TTL_SEC", "3600"))
+SLACK_DIRECTORY_REFRESH_SEC = float(os.getenv("SLACK_DIRECTORY_REFRESH_SEC", "600"))
+SLACK_DIRECTORY_FUZZY_CUTOFF = float(os.getenv("SLACK_DIRECTORY_FUZZY_CUTOFF", "0.8"))
+SLACK_DIRECTORY_PAGE_SIZE = 200
+
+
+def normalize_slack_name(text: str) -> str:
+    """
+    이름/핸들 매칭용 정규화 (유니코드 NFC, 공백/'@'/'.'/'_' 제거, 소문자)
+    """
+
+    normalized = unicodedata.normalize("NFC", text).lower()
+    return "".join(ch for ch in normalized if not ch.isspace() and ch not in "@._-")
+
+
+def _parse_tool_result(raw_result) -> Dict[str, Any]:
+    if isinstance(raw_result, (list, tuple)) and raw_result:
+        raw_result = raw_result[0]
+    return raw_result if isinstance(raw_result, dict) else json.loads(str(raw_result))
+
+
+class SlackRecipientError(Exception):
+    """
+    수신인을 한 명으로 특정할 수 없음 (없음 또는 여러 명), 메시지는 사용자에게 그대로 안내
+    """
+
+
+class SlackUserDirectory:
+    """
+    슬랙 워크스페이스 사용자 디렉터리 캐시
+    slack_get_users 결과를 정규화된 이름/핸들 인덱스로 만들어 두고 메모리에서 수신인을 조회
+    (정확 일치 → 접두어 순, 한 명으로 특정될 때만 반환하고 유사 이름은 안내에만 사용)
+
+    Args:
+        get_users_tool (Callable): slack_get_users tool을 반환하는 함수 (tools_dict 갱신에 대응)
+        ttl_sec (float): 캐시 유효 시간(초), 지나면 조회 시 다시 로드
+        refresh_sec (float): 백그라운드 갱신 주기(초)
+        fuzzy_cutoff (float): 찾지 못했을 때 안내할 유사 이름의 최소 비율 (difflib)
+    """
+
+    def __init__(
+        self,
+        get_users_tool: Callable[[], Any],
+        ttl_sec: float = SLACK_DIRECTORY_TTL_SEC,
+        refresh_sec: float = SLACK_DIRECTORY_REFRESH_SEC,
+        fuzzy_cutoff: float = SLACK_DIRECTORY_FUZZY_CUTOFF,
+    ):
+        self.get_users_tool = get_users_tool
+        self.ttl_sec = ttl_sec
+        self.refresh_sec = refresh_sec
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._index: Dict[str, List[str]] = {}
+        self._keys: List[str] = []
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self.loaded_at: Optional[float] = None
+
+        self.lookups = 0
+        self.misses = 0
+        self.ambiguous = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def fetch_members(self) -> List[Dict[str, Any]]:
+        """
+        slack_get_users를 cursor 기준으로 끝까지 호출하여 전체 사용자 목록 반환
+        """
+
+        users_tool = self.get_users_tool()
+        if users_tool is None:
+            raise ValueError("slack_get_users 도구를 찾을 수 없습니다.")
+
+        members, cursor = [], None
+        while True:
+            tool_input = {"limit": SLACK_DIRECTORY_PAGE_SIZE}
+            if cursor:
+                tool_input["cursor"] = cursor
+            response_data = _parse_tool_result(await users_tool.ainvoke(tool_input))
+            if not response_data.get("ok"):
+                raise ValueError(f"슬랙 사용자 목록을 가져오는 데 실패했습니다: {response_data.get('error', 'Unknown error')}")
+            members.extend(response_data.get("members", []))
+            cursor = (response_data.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                return members
+
+    def load(self, members: List[Dict[str, Any]]):
+        users, index = {}, {}
+        for member in members:
+            if member.get("deleted") or member.get("is_bot") or not member.get("id"):
+                continue
+            users[member["id"]] = member
+            profile = member.get("profile") or {}
+            names = [member.get("real_name"), member.get("name"), profile.get("real_name"), profile.get("display_name")]
+            for name in names:
+                key = normalize_slack_name(name or "")
+                if not key:
+                    continue
+                index.setdefault(key, [])
+                if member["id"] not in index[key]:
+                    index[key].append(member["id"])
+
+        with self._lock:
+            self._users = users
+            self._index = index
+            self._keys = sorted(index)
+            self.loaded_at = time.time()
+
+    async def refresh(self):
+        try:
+            self.load(await self.fetch_members())
+            self.refreshes += 1
+            print(f"슬랙 사용자 디렉터리 갱신: {len(self._users)}명", file=sys.stderr)
+        except Exception:
+            self.refresh_errors += 1
+            raise
+
+    def is_expired(self) -> bool:
+        return self.loaded_at is None or time.time() - self.loaded_at > self.ttl_sec
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_sec)
+            try:
+                asyncio.run(self.refresh())
+            except Exception as e:
+                print(f"슬랙 사용자 디렉터리 백그라운드 갱신 실패: {e}", file=sys.stderr)
+
+    def start_background_refresh(self):
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name="slack-user-directory", daemon=True)
+                self._refresher.start()
+
+    async def resolve(self, name: str) -> Dict[str, Any]:
+        """
+        수신인 이름/핸들에 해당하는 슬랙 사용자 반환 (한 명으로 특정되지 않으면 SlackRecipientError)
+        캐시가 비었거나 만료된 경우에만 slack_get_users를 호출
+        """
+
+        if self.is_expired():
+            await self.refresh()
+        self.start_background_refresh()
+        return self.lookup(name)
+
+    def lookup(self, name: str) -> Dict[str, Any]:
+        key = normalize_slack_name(name)
+        with self._lock:
+            self.lookups += 1
+            user_ids = self._match(key)
+            if len(user_ids) == 1:
+                return self._users[user_ids[0]]
+
+            self.misses += 1
+            if user_ids:
+                self.ambiguous += 1
+                candidates = ", ".join(self._describe(user_id) for user_id in user_ids[:5])
+                raise SlackRecipientError(
+                    f"'{name}'에 해당하는 슬랙 사용자가 여러 명입니다: {candidates}. 이름을 더 구체적으로 입력해주세요."
+                )
+            # 오타 등 유사 이름은 자동 선택하지 않고 안내만 함 (잘못된 사람에게 환자 정보가 전송되지 않도록)
+            close = difflib.get_close_matches(key, self._keys, n=3, cutoff=self.fuzzy_cutoff) if key else []
+            suggestions = list(dict.fromkeys(user_id for k in close for user_id in self._index[k]))
+            hint = f" 혹시 {', '.join(self._describe(user_id) for user_id in suggestions)}님인가요?" if suggestions else ""
+            raise SlackRecipientError(f"'{name}'님을 슬랙 사용자로 찾을 수 없습니다.{hint}")
+
+    def _describe(self, user_id: str) -> str:
+        user = self._users[user_id]
+        real_name = user.get("real_name") or (user.get("profile") or {}).get("real_name") or user.get("name") or user_id
+        return f"{real_name}(@{user.get('name', user_id)})"
+
+    def _match(self, key: str) -> List[str]:
+        """
+        정규화된 이름과 일치하는 사용자 ID 목록 (정확 일치 → 접두어 일치 순, 첫 단계 결과만 반환)
+        """
+
+        if not key:
+            return []
+
+        # 1. 정확 일치 (같은 이름의 사용자가 여러 명이면 모두 반환)
+        if key in self._index:
+            return list(self._index[key])
+
+        # 2. 접두어 일치 (예: '김민지' → '김민지간호사'), 정렬된 키에서 이진 탐색으로 범위만 확인
+        user_ids: List[str] = []
+        start = bisect.bisect_left(self._keys, key)
+        for candidate in self._keys[start:bisect.bisect_left(self._keys, key + "\uffff")]:
+            user_ids.extend(u for u in self._index[candidate] if u not in user_ids)
+        return user_ids
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "keys": len(self._keys),
+                "loaded_at": self.loaded_at,
+                "lookups": self.lookups,
+                "misses": self.misses,
+                "ambiguous": self.ambiguous,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+            }
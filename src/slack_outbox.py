@@ -0,0 +1,192 @@
+from typing import Any, Callable, Dict, Optional, Set
+from dotenv import load_dotenv
+from slack_directory import SlackRecipientError
+import asyncio
+import atexit
+import concurrent.futures
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+load_dotenv()
+
+# 슬랙 전송 재시도 설정 (지수 백오프) 및 전송 상태 보관 시간
+SLACK_OUTBOX_MAX_RETRIES = int(os.getenv("SLACK_OUTBOX_MAX_RETRIES", "5"))
+SLACK_OUTBOX_RETRY_BASE_SEC = float(os.getenv("SLACK_OUTBOX_RETRY_BASE_SEC", "1"))
+SLACK_OUTBOX_STATUS_TTL_SEC = float(os.getenv("SLACK_OUTBOX_STATUS_TTL_SEC", "3600"))
+# 프로세스 종료 시 남은 전송을 기다리는 최대 시간(초) (CLI 실행 직후 종료되어도 메시지가 유실되지 않도록)
+SLACK_OUTBOX_DRAIN_TIMEOUT_SEC = float(os.getenv("SLACK_OUTBOX_DRAIN_TIMEOUT_SEC", "30"))
+
+# 재시도해도 성공할 수 없는 슬랙 API 오류
+SLACK_PERMANENT_ERRORS = {
+    "channel_not_found", "not_in_channel", "is_archived", "invalid_auth",
+    "not_authed", "account_inactive", "no_text", "msg_too_long", "missing_scope",
+}
+
+# 수신인 멘션이 들어갈 자리 (메시지 본문의 다른 중괄호와 겹치지 않도록 format 대신 replace 사용)
+MENTION_PLACEHOLDER = "{mention}"
+
+
+class SlackDeliveryError(Exception):
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+class SlackOutbox:
+    """
+    슬랙 메시지 비동기 전송 큐 (답변 반환과 분리)
+    백그라운드 스레드의 이벤트 루프에서 수신인 조회 + slack_post_message 호출을 재시도/백오프와 함께 수행하고,
+    전송 상태(queued → sending → retrying → delivered | failed)를 delivery_id로 조회할 수 있게 보관
+
+    Args:
+        get_post_tool (Callable): slack_post_message tool을 반환하는 함수
+        directory: 수신인 이름 → 슬랙 사용자 조회용 SlackUserDirectory
+        max_retries (int): 최대 재시도 횟수
+        retry_base_sec (float): 재시도 기본 대기 시간(초), 시도마다 2배
+        status_ttl_sec (float): 완료된 전송 상태 보관 시간(초)
+        drain_timeout_sec (float): 프로세스 종료 시 남은 전송을 기다리는 최대 시간(초)
+    """
+
+    def __init__(
+        self,
+        get_post_tool: Callable[[], Any],
+        directory: Any,
+        max_retries: int = SLACK_OUTBOX_MAX_RETRIES,
+        retry_base_sec: float = SLACK_OUTBOX_RETRY_BASE_SEC,
+        status_ttl_sec: float = SLACK_OUTBOX_STATUS_TTL_SEC,
+        drain_timeout_sec: float = SLACK_OUTBOX_DRAIN_TIMEOUT_SEC,
+    ):
+        self.get_post_tool = get_post_tool
+        self.directory = directory
+        self.max_retries = max_retries
+        self.retry_base_sec = retry_base_sec
+        self.status_ttl_sec = status_ttl_sec
+        self.drain_timeout_sec = drain_timeout_sec
+
+        self._statuses: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._inflight: Set[concurrent.futures.Future] = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="slack-outbox", daemon=True)
+                self._thread.start()
+                # 전송 스레드는 daemon이므로 종료 전에 남은 전송을 처리
+                atexit.register(self.flush, self.drain_timeout_sec)
+            return self._loop
+
+    def enqueue(self, channel_id: str, recipient_name: str, text: str) -> str:
+        """
+        전송 작업을 큐에 넣고 바로 delivery_id 반환
+        text 안의 '{mention}'은 수신인 조회 후 <@USER_ID>로 치환
+        """
+
+        delivery_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._statuses[delivery_id] = {
+                "delivery_id": delivery_id,
+                "status": "queued",
+                "recipient": recipient_name,
+                "channel_id": channel_id,
+                "attempts": 0,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+        future = asyncio.run_coroutine_threadsafe(self._deliver(delivery_id, channel_id, recipient_name, text), self._ensure_loop())
+        with self._lock:
+            self._inflight.add(future)
+        future.add_done_callback(self._discard)
+        return delivery_id
+
+    def _discard(self, future: concurrent.futures.Future):
+        with self._lock:
+            self._inflight.discard(future)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        큐에 있는 전송이 모두 끝날 때까지 대기 (timeout 초과 시 False)
+        """
+
+        with self._lock:
+            pending = list(self._inflight)
+        if not pending:
+            return True
+        print(f"남은 슬랙 전송 {len(pending)}건 처리 대기", file=sys.stderr)
+        _, not_done = concurrent.futures.wait(pending, timeout=timeout)
+        if not_done:
+            print(f"슬랙 전송 {len(not_done)}건이 {timeout}초 안에 끝나지 않았습니다.", file=sys.stderr)
+        return not not_done
+
+    def get_status(self, delivery_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            status = self._statuses.get(delivery_id)
+            return dict(status) if status else None
+
+    def _update(self, delivery_id: str, **fields):
+        with self._lock:
+            self._statuses[delivery_id].update(fields, updated_at=time.time())
+
+    def _prune(self, now: float):
+        expired = [
+            delivery_id for delivery_id, status in self._statuses.items()
+            if status["status"] in ("delivered", "failed") and now - status["updated_at"] > self.status_ttl_sec
+        ]
+        for delivery_id in expired:
+            del self._statuses[delivery_id]
+
+    async def _post(self, channel_id: str, text: str) -> Dict[str, Any]:
+        slack_tool = self.get_post_tool()
+        if slack_tool is None:
+            raise SlackDeliveryError("slack_post_message 도구를 찾을 수 없습니다.", permanent=True)
+
+        raw_result = await slack_tool.ainvoke({"channel_id": channel_id, "text": text})
+        result_text = str(raw_result[0]) if isinstance(raw_result, tuple) else str(raw_result)
+        try:
+            response_data = json.loads(result_text)
+        except json.JSONDecodeError:
+            raise SlackDeliveryError(f"슬랙 응답을 해석할 수 없습니다: {result_text[:200]}")
+        if not response_data.get("ok"):
+            error = response_data.get("error", "unknown_error")
+            raise SlackDeliveryError(f"슬랙 전송 실패: {error}", permanent=error in SLACK_PERMANENT_ERRORS)
+        return response_data
+
+    async def _deliver(self, delivery_id: str, channel_id: str, recipient_name: str, text: str):
+        user_id = None
+        for attempt in range(self.max_retries + 1):
+            self._update(delivery_id, status="sending", attempts=attempt + 1)
+            try:
+                if user_id is None:
+                    try:
+                        user = await self.directory.resolve(recipient_name)
+                    except SlackRecipientError as e:
+                        # 수신인이 없거나 여러 명이면 재시도하지 않고 실패 사유를 그대로 안내
+                        raise SlackDeliveryError(str(e), permanent=True)
+                    user_id = user.get("id")
+                response_data = await self._post(channel_id, text.replace(MENTION_PLACEHOLDER, f"<@{user_id}>"))
+            except Exception as e:
+                permanent = isinstance(e, SlackDeliveryError) and e.permanent
+                if permanent or attempt == self.max_retries:
+                    print(f"슬랙 전송 실패 ({delivery_id}): {e}", file=sys.stderr)
+                    self._update(delivery_id, status="failed", error=str(e))
+                    return
+                delay = self.retry_base_sec * (2 ** attempt) * (0.5 + random.random())
+                print(f"슬랙 전송 오류, {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries}): {e}", file=sys.stderr)
+                self._update(delivery_id, status="retrying", error=str(e))
+                await asyncio.sleep(delay)
+                continue
+
+            print(f"슬랙 전송 완료 ({delivery_id}): {recipient_name}", file=sys.stderr)
+            self._update(delivery_id, status="delivered", error=None, user_id=user_id, ts=response_data.get("ts"))
+            return
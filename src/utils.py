@@ -1,4 +1,7 @@
 from src.langgraph.state import *
+from typing import Dict, List, Optional
+import json
+import re
 
 max_attempts = 3
 
@@ -39,6 +42,9 @@ def route_after_router(state: ChatbotState) -> str:
 
     flow_type = state['flow_type']
     print(f"--- 라우팅 결정: {flow_type} ---")
+    if flow_type == 'parallel':
+        # Neo4j 검색 노드와 VectorDB 최적화/검색/평가 서브그래프 노드를 같은 단계에서 동시에 실행
+        return ["parallel_neo4j", "parallel_vector"]
     return flow_type
 
 def route_after_neo4j(state: ChatbotState) -> str:
@@ -49,8 +55,6 @@ def route_after_neo4j(state: ChatbotState) -> str:
     flow_type = state['flow_type']
     if flow_type == 'sequential':
         return "generate_vector_query"  
-    elif flow_type == 'parallel':
-        return "start_vector_db_flow"  
     else: # neo4j_only
         return "go_to_merge"           
 
@@ -80,3 +84,92 @@ def route_after_evaluation(state: ChatbotState) -> str:
         return "generate_answer"
 
 
+
+
+def extract_current_question(question: str) -> str:
+    """
+    UI에서 이전 대화 내역과 함께 전달된 질문이면 마지막 '현재 질문:' 이후의 최근 질문만 반환
+    """
+
+    marker = "현재 질문:"
+    if marker in question:
+        return question.rsplit(marker, 1)[1].strip()
+    return question.strip()
+
+
+def is_same_query(a: str, b: str) -> bool:
+    """
+    대소문자/공백/문장부호를 무시했을 때 두 검색 쿼리가 같은지 여부
+    """
+
+    def normalize(text):
+        return re.sub(r"[\W_]+", "", text or "").lower()
+
+    return bool(normalize(a)) and normalize(a) == normalize(b)
+
+
+def parse_vector_documents(raw_result) -> List[Dict]:
+    """
+    VectorDB_retriever 결과(JSON 문자열 또는 MCP (content, artifact) 튜플)를 문서 리스트로 변환
+    각 문서는 {"id", "score", "text", "source"} 형태
+    """
+
+    if isinstance(raw_result, (list, tuple)) and raw_result and not isinstance(raw_result[0], dict):
+        raw_result = raw_result[0]
+    if isinstance(raw_result, list):
+        return raw_result
+    try:
+        documents = json.loads(str(raw_result))
+    except json.JSONDecodeError:
+        return []
+    return documents if isinstance(documents, list) else []
+
+
+def format_vector_documents(documents: List[Dict], max_chars: Optional[int] = None) -> str:
+    """
+    문서 리스트를 프롬프트용 텍스트로 변환 (id 기준 중복 제거, 점수 내림차순, 선택적 길이 제한)
+    """
+
+    if not documents:
+        return ""
+    seen = set()
+    unique_docs = []
+    for doc in documents:
+        key = doc.get("id") or doc.get("text")
+        if key in seen:
+            continue
+        seen.add(key)
+        unique_docs.append(doc)
+    unique_docs.sort(key=lambda d: d.get("score") if d.get("score") is not None else float("-inf"), reverse=True)
+
+    lines = []
+    for i, doc in enumerate(unique_docs, 1):
+        text = doc.get("text", "")
+        if max_chars is not None:
+            text = text[:max_chars]
+        title = (doc.get("source") or {}).get("title")
+        header = f"[{i}]" + (f" {title}" if title else "")
+        lines.append(f"{header}\n{text}")
+    return "\n\n".join(lines)
+
+
+def format_graph_context(raw_result) -> str:
+    """
+    get_graph_context 결과({nodes, triples, chunks})를 프롬프트용 텍스트로 변환
+    """
+
+    if isinstance(raw_result, (list, tuple)) and raw_result:
+        raw_result = raw_result[0]
+    try:
+        payload = json.loads(str(raw_result)) if not isinstance(raw_result, dict) else raw_result
+    except json.JSONDecodeError:
+        return str(raw_result)
+    if payload.get("error"):
+        return payload["error"]
+
+    lines = [*payload.get("nodes", []), *payload.get("triples", [])]
+    for chunk in payload.get("chunks", []):
+        lines.append(f"[Chunk] {chunk}")
+    if payload.get("truncated"):
+        lines.append("(토큰 예산으로 일부 컨텍스트 생략)")
+    return "\n".join(lines)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 저장소 루트(src.server.*)와 src(mcp_client, slack_directory 등 최상위 import) 경로 추가
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,40 @@
+"""
+MCP 클라이언트 테스트용 stdio 서버 (프로세스 ID를 돌려주어 세션 재시작 여부 확인)
+"""
+
+from mcp.server.fastmcp import FastMCP
+from pydantic import BaseModel
+import json
+import os
+
+mcp = FastMCP("echo")
+
+
+@mcp.tool()
+async def echo(text: str) -> str:
+    return f"{os.getpid()}:{text}"
+
+
+@mcp.tool()
+async def search(query: str) -> str:
+    # 리트리버 tool처럼 직접 JSON 문자열을 반환
+    return json.dumps([{"id": "doc-1", "text": f"{query} 결과"}], ensure_ascii=False)
+
+
+class Answer(BaseModel):
+    content: str
+
+
+@mcp.tool()
+async def answer(query: str) -> Answer:
+    # run_contextual_rag처럼 pydantic 객체를 반환
+    return Answer(content=f"{query}에 대한 답변")
+
+
+@mcp.tool()
+async def stats() -> dict:
+    return {"calls": 3, "name": "통계"}
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
@@ -0,0 +1,111 @@
+from langchain_core.embeddings import Embeddings
+from src.server.embedding_cache import CachedEmbeddings, EmbeddingCache
+import asyncio
+import pytest
+
+
+class CountingEmbeddings(Embeddings):
+    """
+    텍스트 길이로 벡터를 만드는 임베딩 대역 (실제 API 호출 횟수 기록)
+    """
+
+    def __init__(self, dimensions: int = 8):
+        self.dimensions = dimensions
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t))] * self.dimensions for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_memory_hit_and_miss():
+    cache = EmbeddingCache(path=None)
+    assert cache.get("m", None, "query") is None
+    cache.put("m", None, "query", [1.0, 2.0])
+
+    # 공백/유니코드 정규화 후 같은 텍스트는 같은 키
+    assert cache.get("m", None, "  query ") == [1.0, 2.0]
+    assert cache.get("m", 256, "query") is None
+    assert cache.get("other", None, "query") is None
+
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 0, 3)
+    assert stats["disk_bytes"] == 0
+
+
+def test_disk_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    writer = EmbeddingCache(path=path)
+    writer.put_many("m", None, [("a", [0.5, 1.5]), ("b", [2.5, 3.5])])
+
+    reader = EmbeddingCache(path=path)
+    assert reader.get("m", None, "b") == [2.5, 3.5]
+    assert reader.get("m", None, "b") == [2.5, 3.5]
+    stats = reader.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+    # 크기는 프로세스별 집계가 아니라 파일 기준이므로 쓰지 않은 인스턴스에서도 보임
+    assert stats["disk_bytes"] > 0
+    assert stats["disk_bytes"] == writer.get_stats()["disk_bytes"]
+
+
+def test_overwrite_replaces_memory_and_disk(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(path=path)
+    cache.put("m", None, "a", [1.0])
+    cache.put("m", None, "a", [2.0])
+    assert cache.get("m", None, "a") == [2.0]
+    assert EmbeddingCache(path=path).get("m", None, "a") == [2.0]
+
+
+def test_memory_lru_keeps_recent_items():
+    cache = EmbeddingCache(path=None, memory_max_items=2)
+    cache.put("m", None, "a", [1.0])
+    cache.put("m", None, "b", [2.0])
+    cache.get("m", None, "a")
+    cache.put("m", None, "c", [3.0])
+
+    assert cache.get("m", None, "b") is None
+    assert cache.get("m", None, "a") == [1.0]
+    assert cache.get_stats()["memory_items"] == 2
+
+
+def test_disk_eviction_removes_least_recently_used(tmp_path):
+    max_bytes = 256 * 1024
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite"), memory_max_items=1, disk_max_bytes=max_bytes)
+    vector = [0.1] * 1536  # 항목당 약 6KB
+    for i in range(100):
+        cache.put("m", None, f"text-{i}", vector)
+
+    stats = cache.get_stats()
+    assert stats["evictions"] > 0
+    assert stats["disk_bytes"] <= max_bytes
+    assert cache.get("m", None, "text-0") is None
+    assert cache.get("m", None, "text-98") is not None
+
+
+def test_cached_embeddings_async_paths_skip_cached_texts(tmp_path):
+    base = CountingEmbeddings()
+    embeddings = CachedEmbeddings(base, model="m", cache=EmbeddingCache(path=str(tmp_path / "embeddings.sqlite")))
+
+    async def run():
+        first = await embeddings.aembed_documents(["aa", "bbb"])
+        second = await embeddings.aembed_documents(["bbb", "cccc"])
+        query = await embeddings.aembed_query("aa")
+        return first, second, query
+
+    first, second, query = asyncio.run(run())
+    assert first == [[2.0] * 8, [3.0] * 8]
+    assert second == [[3.0] * 8, [4.0] * 8]
+    assert query == [2.0] * 8
+    assert base.calls == [["aa", "bbb"], ["cccc"]]
+
+
+def test_cached_embeddings_sync_path(tmp_path):
+    base = CountingEmbeddings()
+    embeddings = CachedEmbeddings(base, model="m", cache=EmbeddingCache(path=None))
+    assert embeddings.embed_query("abc") == pytest.approx([3.0] * 8)
+    assert embeddings.embed_documents(["abc", "de"]) == [[3.0] * 8, [2.0] * 8]
+    assert base.calls == [["abc"], ["de"]]
@@ -0,0 +1,79 @@
+from src.server.local_embeddings import HashingEmbeddings
+from src.server.local_vectorstore import EMBEDDINGS_FILE, LocalVectorStore, build_local_index
+import numpy as np
+import pytest
+
+TEXTS = [
+    "pediatric anesthesia induction with sevoflurane",
+    "neonatal cardiac surgery postoperative care",
+    "propofol dosing for children under five",
+    "airway management in infants with croup",
+    "caudal block for pediatric hernia repair",
+    "fentanyl analgesia after tonsillectomy",
+]
+
+
+@pytest.fixture
+def embeddings():
+    return HashingEmbeddings(dimensions=64)
+
+
+@pytest.fixture
+def store(tmp_path, embeddings):
+    ids = [f"doc-{i}" for i in range(len(TEXTS))]
+    vectors = np.asarray(embeddings.embed_documents(TEXTS), dtype=np.float32)
+    metadatas = [{"source": f"book-{i}"} for i in range(len(TEXTS))]
+    build_local_index(str(tmp_path), ids, vectors, TEXTS, metadatas, nlist=2, dtype="float32")
+    # 모든 리스트를 탐색하면 IVF 검색이 전수 검색과 같아야 함
+    return LocalVectorStore(str(tmp_path), embeddings, nprobe=2)
+
+
+def test_hashing_embeddings_are_deterministic_and_normalized(embeddings):
+    first = embeddings.embed_query("Pediatric  Anesthesia")
+    second = HashingEmbeddings(dimensions=64).embed_query("pediatric anesthesia")
+    assert first == second
+    assert len(first) == 64
+    assert np.linalg.norm(first) == pytest.approx(1.0)
+
+
+def test_search_returns_exact_text_first_with_metadata(store):
+    docs = store.similarity_search(TEXTS[2], k=3)
+    assert len(docs) == 3
+    assert docs[0].id == "doc-2"
+    assert docs[0].page_content == TEXTS[2]
+    assert docs[0].metadata == {"source": "book-2", "id": "doc-2"}
+
+
+def test_search_scores_match_brute_force(store, embeddings):
+    query = embeddings.embed_query("anesthesia for children")
+    results = store.similarity_search_by_vector_with_score(query, k=len(TEXTS))
+
+    matrix = np.asarray(embeddings.embed_documents(TEXTS), dtype=np.float32)
+    expected = matrix @ np.asarray(query, dtype=np.float32)
+    assert [doc.id for doc, _ in results] == [f"doc-{i}" for i in np.argsort(-expected)]
+    assert [score for _, score in results] == pytest.approx(sorted(expected, reverse=True), abs=1e-5)
+
+
+def test_index_is_memory_mapped_and_reloads(store, tmp_path, embeddings):
+    assert isinstance(store.vectors, np.memmap)
+    assert store.meta["count"] == len(TEXTS)
+
+    reloaded = LocalVectorStore(str(tmp_path), embeddings, nprobe=2)
+    assert (tmp_path / EMBEDDINGS_FILE).exists()
+    assert [d.id for d in reloaded.similarity_search(TEXTS[4], k=2)] == [d.id for d in store.similarity_search(TEXTS[4], k=2)]
+
+
+def test_add_texts_updates_index_on_disk(store, tmp_path, embeddings):
+    ids = store.add_texts(["ketamine sedation for pediatric MRI"], [{"source": "new"}], ids=["doc-new"])
+    assert ids == ["doc-new"]
+    assert store.similarity_search("ketamine sedation for pediatric MRI", k=1)[0].id == "doc-new"
+
+    reloaded = LocalVectorStore(str(tmp_path), embeddings, nprobe=2)
+    assert reloaded.meta["count"] == len(TEXTS) + 1
+    assert reloaded.similarity_search("ketamine sedation for pediatric MRI", k=1)[0].metadata["source"] == "new"
+
+
+def test_add_texts_rejects_other_dimensions(store):
+    store.embedding = HashingEmbeddings(dimensions=32)
+    with pytest.raises(ValueError):
+        store.add_texts(["mismatched"])
@@ -0,0 +1,61 @@
+from src.mcp_client import InProcessToolAdapter, MCPSessionManager
+import asyncio
+import json
+import os
+import signal
+import sys
+
+ECHO_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_echo_server.py")
+
+
+def test_dead_stdio_session_is_restarted_and_call_retried():
+    manager = MCPSessionManager({"echo": {"command": sys.executable, "args": [ECHO_SERVER], "transport": "stdio"}})
+    tools = manager.start(timeout=60)
+    try:
+        async def run():
+            first = await tools["echo"].ainvoke({"text": "first"})
+            os.kill(int(first.split(":")[0]), signal.SIGKILL)
+            await asyncio.sleep(0.2)
+            second = await tools["echo"].ainvoke({"text": "second"})
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first.endswith(":first")
+        assert second.endswith(":second")
+        assert first.split(":")[0] != second.split(":")[0]
+
+        stats = manager.get_stats()["echo"]
+        assert stats["restart_count"] == 1
+        assert stats["ready"]
+    finally:
+        manager.close()
+
+
+def test_inprocess_output_matches_mcp_output():
+    sys.path.insert(0, os.path.dirname(ECHO_SERVER))
+    import mcp_echo_server
+
+    manager = MCPSessionManager({"echo": {"command": sys.executable, "args": [ECHO_SERVER], "transport": "stdio"}})
+    mcp_tools = manager.start(timeout=60)
+    adapter = InProcessToolAdapter()
+    try:
+        async def run():
+            results = []
+            for name, arguments in (("search", {"query": "마취"}), ("answer", {"query": "마취"}), ("stats", {})):
+                inprocess_tool = adapter._wrap(getattr(mcp_echo_server, name))
+                results.append((
+                    name,
+                    await mcp_tools[name].ainvoke(arguments),
+                    await inprocess_tool.ainvoke(arguments),
+                ))
+            return results
+
+        for name, mcp_result, inprocess_result in asyncio.run(run()):
+            assert isinstance(inprocess_result, str), name
+            assert isinstance(mcp_result, str), name
+            # str 결과는 그대로, 객체 결과는 같은 JSON 값 (들여쓰기 등 서식만 다를 수 있음)
+            if name == "search":
+                assert inprocess_result == mcp_result
+            assert json.loads(inprocess_result) == json.loads(mcp_result)
+    finally:
+        manager.close()
@@ -0,0 +1,71 @@
+from src.server.patient_directory import PatientDirectory, normalize_name, tokenize
+
+
+def make_directory():
+    directory = PatientDirectory(min_key_length=2)
+    directory.load([
+        ("e-kim", ["김민수", "10"]),
+        ("e-lee", ["이서연", "2024001"]),
+        ("e-park1", ["박지훈", None]),
+        ("e-park2", ["박지훈", "33"]),
+        ("e-en", ["Kim Min Su", None]),
+        ("e-short", ["민", "7"]),
+    ])
+    return directory
+
+
+def test_tokenize_and_normalize():
+    assert tokenize("Kim, Min-Su 환자!") == ["kim", "min", "su", "환자"]
+    assert normalize_name(" Kim  Min Su ") == "kimminsu"
+
+
+def test_name_matches_on_token_boundaries_with_particles():
+    directory = make_directory()
+    assert directory.match("김민수 환자의 마취 기록 알려줘") == (["e-kim"], False)
+    assert directory.match("김민수의 수술 이력") == (["e-kim"], False)
+    assert directory.match("이서연님에게 처방된 약") == (["e-lee"], False)
+
+
+def test_name_inside_other_word_is_not_matched():
+    directory = make_directory()
+    # 다른 단어 안에 포함된 이름/한 글자 이름은 매칭하지 않음
+    assert directory.match("김민수정 환자") == ([], False)
+    assert directory.match("민감한 환자") == ([], False)
+
+
+def test_multi_token_name_prefers_longest_window():
+    directory = make_directory()
+    assert directory.match("records for kim min su please") == (["e-en"], False)
+    assert directory.match("kim min only") == ([], False)
+
+
+def test_numeric_id_requires_id_context():
+    directory = make_directory()
+    assert directory.match("환자번호 10 기록") == (["e-kim"], False)
+    assert directory.match("ID 2024001 patient") == (["e-lee"], False)
+    assert directory.match("등록번호: 33") == (["e-park2"], False)
+    # 용량/나이 등 일반 숫자는 ID로 보지 않음
+    assert directory.match("propofol 10 mg 투여") == ([], False)
+    assert directory.match("7세 환아") == ([], False)
+
+
+def test_shared_name_is_ambiguous():
+    directory = make_directory()
+    element_ids, ambiguous = directory.match("박지훈 환자 수술 일정")
+    assert ambiguous
+    assert element_ids == ["e-park1", "e-park2"]
+
+
+def test_multiple_patients_in_one_question():
+    directory = make_directory()
+    assert directory.match("김민수와 이서연 비교") == (["e-kim", "e-lee"], False)
+
+
+def test_staleness():
+    directory = PatientDirectory(refresh_sec=600)
+    assert directory.is_stale()
+    directory.load([("e-kim", ["김민수"])])
+    assert not directory.is_stale()
+    assert len(directory) == 1
+    directory.mark_stale()
+    assert directory.is_stale()
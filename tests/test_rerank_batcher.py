@@ -0,0 +1,86 @@
+from langchain_core.documents import Document
+from src.server.rerank_batcher import RerankBatcher
+import asyncio
+
+
+class FakeCrossEncoder:
+    """
+    passage 끝의 숫자를 점수로 사용하는 CrossEncoder 대역 (호출별 쌍 수 기록)
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def score(self, pairs):
+        self.calls.append(list(pairs))
+        return [float(passage.rsplit("-", 1)[1]) for _, passage in pairs]
+
+
+def make_docs(prefix, scores):
+    return [Document(page_content=f"{prefix}-{score}") for score in scores]
+
+
+def test_concurrent_requests_share_one_batch():
+    model = FakeCrossEncoder()
+    batcher = RerankBatcher(model, max_batch_pairs=64, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.rerank("q1", make_docs("a", [1, 3, 2]), top_n=2),
+            batcher.rerank("q2", make_docs("b", [5, 4]), top_n=1),
+            batcher.rerank("q3", make_docs("c", [7, 9, 8]), top_n=3),
+        )
+
+    results = asyncio.run(run())
+
+    assert len(model.calls) == 1
+    assert len(model.calls[0]) == 8
+    assert [d.page_content for d in results[0]] == ["a-3", "a-2"]
+    assert [d.page_content for d in results[1]] == ["b-5"]
+    assert [d.page_content for d in results[2]] == ["c-9", "c-8", "c-7"]
+    assert results[0][0].metadata["relevance_score"] == 3.0
+    assert batcher.get_stats()["batch_requests"]["count"] == 1
+
+
+def test_rerank_many_keeps_request_order_and_empty_requests():
+    model = FakeCrossEncoder()
+    batcher = RerankBatcher(model, max_batch_pairs=64, max_wait_ms=20)
+
+    results = asyncio.run(batcher.rerank_many(
+        [("q1", make_docs("a", [2, 1])), ("q2", []), ("q3", make_docs("c", [4, 6]))],
+        top_n=1,
+    ))
+
+    assert len(model.calls) == 1
+    assert [[d.page_content for d in docs] for docs in results] == [["a-2"], [], ["c-6"]]
+
+
+def test_batch_is_split_at_max_batch_pairs():
+    model = FakeCrossEncoder()
+    batcher = RerankBatcher(model, max_batch_pairs=4, max_wait_ms=50)
+
+    results = asyncio.run(batcher.rerank_many(
+        [("q1", make_docs("a", [1, 2, 3])), ("q2", make_docs("b", [4, 5])), ("q3", make_docs("c", [6]))],
+        top_n=1,
+    ))
+
+    assert [len(call) for call in model.calls] == [5, 1]
+    assert [docs[0].page_content for docs in results] == ["a-3", "b-5", "c-6"]
+
+
+def test_model_error_is_raised_to_every_request():
+    class FailingModel:
+        def score(self, pairs):
+            raise RuntimeError("inference failed")
+
+    batcher = RerankBatcher(FailingModel(), max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.rerank("q1", make_docs("a", [1])),
+            batcher.rerank("q2", make_docs("b", [2])),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,60 @@
+from langchain_core.documents import Document
+from src.server.local_embeddings import HashingEmbeddings
+from src.server.local_vectorstore import LocalVectorStore
+from src.server.pinecone_server import RerankingRetriever
+from src.server.rerank_batcher import RerankBatcher
+import asyncio
+
+
+class ScoreOnlyVectorStore:
+    """
+    PineconeVectorStore처럼 비동기 by-vector 검색은 점수 포함 API만 제공하는 벡터스토어 대역
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.searches = []
+
+    def as_retriever(self, **kwargs):
+        return None
+
+    async def asimilarity_search_by_vector_with_score(self, embedding, *, k=4):
+        self.searches.append(k)
+        # 쿼리 벡터의 첫 값(텍스트 길이)을 문서 본문에 넣어 쿼리별 결과를 구분
+        size = int(embedding[0])
+        return [(Document(page_content=f"len{size}-{i}"), 1.0 - i / 10) for i in range(k)]
+
+
+class LengthEmbeddings:
+    async def aembed_documents(self, texts):
+        return [[float(len(t))] for t in texts]
+
+
+class SuffixCrossEncoder:
+    def score(self, pairs):
+        return [float(passage.rsplit("-", 1)[1]) for _, passage in pairs]
+
+
+def test_abatch_invoke_uses_with_score_search():
+    store = ScoreOnlyVectorStore(LengthEmbeddings())
+    retriever = RerankingRetriever(store, RerankBatcher(SuffixCrossEncoder(), max_wait_ms=5), k=4, top_n=2)
+
+    results = asyncio.run(retriever.abatch_invoke(["ab", "abcde"]))
+
+    assert store.searches == [4, 4]
+    assert [[d.page_content for d in docs] for docs in results] == [["len2-3", "len2-2"], ["len5-3", "len5-2"]]
+    assert asyncio.run(retriever.abatch_invoke([])) == []
+
+
+class ExactMatchCrossEncoder:
+    def score(self, pairs):
+        return [1.0 if query == passage else 0.0 for query, passage in pairs]
+
+
+def test_abatch_invoke_with_local_vector_store(tmp_path):
+    texts = ["sevoflurane induction", "propofol infusion", "caudal block"]
+    store = LocalVectorStore.from_texts(texts, HashingEmbeddings(dimensions=32), index_dir=str(tmp_path), nprobe=4)
+    retriever = RerankingRetriever(store, RerankBatcher(ExactMatchCrossEncoder(), max_wait_ms=5), k=3, top_n=1)
+
+    results = asyncio.run(retriever.abatch_invoke(["propofol infusion", "caudal block"]))
+    assert [docs[0].page_content for docs in results] == ["propofol infusion", "caudal block"]
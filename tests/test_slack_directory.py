@@ -0,0 +1,97 @@
+from src.slack_directory import SlackRecipientError, SlackUserDirectory, normalize_slack_name
+import asyncio
+import json
+
+import pytest
+
+MEMBERS = [
+    {"id": "U1", "name": "minji.kim", "real_name": "김민지", "profile": {"display_name": "김민지 간호사"}},
+    {"id": "U2", "name": "seoyeon", "real_name": "이서연", "profile": {}},
+    {"id": "U3", "name": "jihoon1", "real_name": "박지훈", "profile": {}},
+    {"id": "U4", "name": "jihoon2", "real_name": "박지훈", "profile": {}},
+    {"id": "U5", "name": "old.user", "real_name": "최하늘", "deleted": True},
+    {"id": "B1", "name": "bot", "real_name": "알림봇", "is_bot": True},
+]
+
+
+class FakeUsersTool:
+    # slack_get_users처럼 cursor 단위로 JSON 문자열을 반환
+    def __init__(self, members, page_size=2):
+        self.pages = [members[i:i + page_size] for i in range(0, len(members), page_size)]
+        self.calls = []
+
+    async def ainvoke(self, tool_input):
+        self.calls.append(tool_input)
+        page = int(tool_input.get("cursor") or 0)
+        next_cursor = str(page + 1) if page + 1 < len(self.pages) else ""
+        return json.dumps({"ok": True, "members": self.pages[page], "response_metadata": {"next_cursor": next_cursor}})
+
+
+def make_directory(tool=None):
+    tool = tool or FakeUsersTool(MEMBERS)
+    return SlackUserDirectory(lambda: tool, refresh_sec=3600), tool
+
+
+def test_normalize_slack_name():
+    assert normalize_slack_name(" @Minji.Kim ") == "minjikim"
+    assert normalize_slack_name("김민지 간호사") == "김민지간호사"
+
+
+def test_unique_recipient_resolves_from_all_pages_once():
+    directory, tool = make_directory()
+
+    async def run():
+        return [await directory.resolve(name) for name in ("김민지", "@minji.kim", "이서연")]
+
+    users = asyncio.run(run())
+    assert [user["id"] for user in users] == ["U1", "U1", "U2"]
+    # 전체 페이지를 한 번만 가져오고 이후 조회는 메모리에서 처리
+    assert len(tool.calls) == 3
+    assert directory.get_stats()["users"] == 4
+
+
+def test_prefix_match_when_unique():
+    directory, _ = make_directory()
+    directory.load(MEMBERS)
+    assert directory.lookup("seo")["id"] == "U2"
+
+
+def test_ambiguous_recipient_raises_with_candidates():
+    directory, _ = make_directory()
+    directory.load(MEMBERS)
+    with pytest.raises(SlackRecipientError) as excinfo:
+        directory.lookup("박지훈")
+    assert "여러 명" in str(excinfo.value)
+    assert "@jihoon1" in str(excinfo.value) and "@jihoon2" in str(excinfo.value)
+    # 접두어가 여러 명에 걸치는 경우도 자동 선택하지 않음
+    with pytest.raises(SlackRecipientError):
+        directory.lookup("jihoon")
+    assert directory.get_stats()["ambiguous"] == 2
+
+
+def test_missing_recipient_suggests_but_does_not_pick_similar_name():
+    directory, _ = make_directory()
+    directory.load(MEMBERS)
+    with pytest.raises(SlackRecipientError) as excinfo:
+        directory.lookup("minji.kin")
+    assert "찾을 수 없습니다" in str(excinfo.value)
+    assert "@minji.kim" in str(excinfo.value)
+
+
+def test_deleted_and_bot_users_are_not_recipients():
+    directory, _ = make_directory()
+    directory.load(MEMBERS)
+    for name in ("최하늘", "알림봇"):
+        with pytest.raises(SlackRecipientError):
+            directory.lookup(name)
+
+
+def test_failed_fetch_raises_and_counts_error():
+    class FailingTool:
+        async def ainvoke(self, tool_input):
+            return json.dumps({"ok": False, "error": "invalid_auth"})
+
+    directory, _ = make_directory(FailingTool())
+    with pytest.raises(ValueError, match="invalid_auth"):
+        asyncio.run(directory.resolve("김민지"))
+    assert directory.get_stats()["refresh_errors"] == 1
@@ -0,0 +1,93 @@
+from src.server.subgraph_cache import SubgraphCache, normalize_vector, rank_neighbors
+import pytest
+
+
+def neighbor(name, relation, label, vector):
+    return {
+        "neighbor_name": name,
+        "text": None,
+        "neighbor_labels": [label],
+        "label_key": label,
+        "relation": relation,
+        "direction": "out",
+        "vector": normalize_vector(vector),
+    }
+
+
+NEIGHBORS = [
+    neighbor("propofol", "TAKES", "Drug", [1.0, 0.0]),
+    neighbor("fentanyl", "TAKES", "Drug", [0.8, 0.2]),
+    neighbor("ketamine", "TAKES", "Drug", [0.0, 1.0]),
+    neighbor("tonsillectomy", "UNDERWENT", "Surgery", [0.6, 0.4]),
+    neighbor("note", "HAS_NOTE", "Chunk", None),
+]
+
+
+def names(neighbors):
+    return [n["neighbor_name"] for n in neighbors]
+
+
+def test_rank_neighbors_orders_by_query_similarity():
+    first = rank_neighbors(NEIGHBORS, [1.0, 0.0], max_per_relation=10, max_per_label=10, max_neighbors=10)
+    second = rank_neighbors(NEIGHBORS, [0.0, 1.0], max_per_relation=10, max_per_label=10, max_neighbors=10)
+
+    assert names(first) == ["propofol", "fentanyl", "tonsillectomy", "ketamine", "note"]
+    assert names(second)[0] == "ketamine"
+    # vector.similarity.cosine과 같은 (1 + cos) / 2, 임베딩이 없으면 0
+    assert first[0]["similarity"] == pytest.approx(1.0)
+    assert first[3]["similarity"] == pytest.approx(0.5)
+    assert first[4]["similarity"] == 0.0
+    assert "vector" not in first[0]
+
+
+def test_rank_neighbors_applies_fanout_limits():
+    ranked = rank_neighbors(
+        NEIGHBORS, [1.0, 0.0],
+        max_per_relation=10, max_per_label=10, max_neighbors=10,
+        relation_fanout={"TAKES": 2},
+    )
+    assert names(ranked) == ["propofol", "fentanyl", "tonsillectomy", "note"]
+
+    ranked = rank_neighbors(NEIGHBORS, [1.0, 0.0], max_per_relation=10, max_per_label=1, max_neighbors=10)
+    assert names(ranked) == ["propofol", "tonsillectomy", "note"]
+
+    ranked = rank_neighbors(NEIGHBORS, [1.0, 0.0], max_per_relation=10, max_per_label=10, max_neighbors=2)
+    assert names(ranked) == ["propofol", "fentanyl"]
+
+
+def test_rank_neighbors_without_query_keeps_stored_order():
+    ranked = rank_neighbors(NEIGHBORS, [], max_per_relation=10, max_per_label=10, max_neighbors=10)
+    assert names(ranked) == names(NEIGHBORS)
+    assert all(n["similarity"] == 0.0 for n in ranked)
+
+
+def test_cache_hit_miss_and_lru():
+    cache = SubgraphCache(max_items=2, ttl_sec=60)
+    assert cache.get(("a", 1)) is None
+    cache.put(("a", 1), "A", ["a"])
+    cache.put(("b", 1), "B", ["b"])
+    assert cache.get(("a", 1)) == "A"
+    cache.put(("c", 1), "C", ["c"])
+
+    assert cache.get(("b", 1)) is None
+    assert sorted(cache.keys()) == [("a", 1), ("c", 1)]
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 2, 1)
+
+
+def test_cache_expiry_and_invalidation(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.server.subgraph_cache.time.time", lambda: now[0])
+    cache = SubgraphCache(max_items=10, ttl_sec=60)
+    cache.put(("a", 1), "A", ["a"])
+    cache.put(("b", 1), "B", ["b"])
+    cache.put(("c", 1), "C", ["c"])
+
+    assert cache.invalidate(["b", "unknown"]) == 1
+    assert cache.get(("b", 1)) is None
+
+    now[0] += 61
+    assert cache.keys() == []
+    assert cache.get(("a", 1)) is None
+    assert cache.get_stats()["expirations"] == 1
+    assert cache.invalidate() == 1